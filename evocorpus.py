@@ -0,0 +1,568 @@
+#!/usr/bin/python3
+
+"""
+evocorpus.py
+
+A store of generator output, written once and read by every test that
+wants it : dieharder, sort_binary_integer_file.py, test_evocprngs.py.
+
+At a few KB/second for the crypto PRNGs, tens of MB is hours, and each
+of those regenerated the same stream every run. Here a stream is named
+by everything it depends on, the generator, its integer width, vector
+depth, paranoia level, number of PRNGs, bit width, password and the
+hash of the program, so the same request is the same file.
+
+Each corpus is three files in the corpus directory, named by a digest
+of those, which reveals nothing about the password :
+    <key>.bin    the output, raw binary, read through mmap
+    <key>.json   what it is, and how many bytes there are
+    <key>.state  the generator's state, its integers and the like, and
+                 the byte count it is at, with an HMAC keyed by the
+                 password
+
+Asking for more bytes than are there resumes the generator from its
+state and appends, the file only grows. The state is written after the
+bytes, write then rename, so an interrupted run loses at most the bytes
+since the last checkpoint and those are regenerated.
+
+The output and state are the equivalent of the password, so the
+directory and files are owner-only and a directory anyone else can read
+is refused.
+
+Current limitations of the code :
+    One writer per corpus at a time, two processes appending to the same
+    corpus would interleave.
+
+"""
+__version__   = "0.1"
+__revision__  = "$Id$"
+__date__      = "2026-10-18"
+__author__    = "nobody@nowhere.com"
+__copyright__ = "None"
+__license__   = "None"
+__filename__  = "evocorpus.py"
+__history__   = """
+0.1 - 20261018 - started this file.
+"""
+
+import os
+import sys
+import getopt
+import json
+import mmap
+import hmac
+import struct
+import hashlib
+import types
+from evornt       import make_rnt, is_private, pack_rnt_values, \
+                         unpack_rnt_values
+from evoemit      import make_generator, emit, GENERATOR_NAMES, \
+                         CRYPTO_GENERATORS, EMIT_BLOCK_SIZE
+
+CORPUS_VERSION          = 1
+
+# bytes generated between saves of the generator's state
+CORPUS_CHECKPOINT_BYTES = 4 * 1024 * 1024
+
+# default directory, EVOCORPUS_DIR overrides it
+CORPUS_DIRECTORY        = 'evocorpus'
+
+# .state files, a magic string, the values packed as the RNT snapshots
+# are, an HMAC-SHA256 of both keyed from the password.  No pickle, a
+# state file must not be able to run code.
+CORPUS_STATE_MAGIC      = b'EVOCST01'
+
+def corpus_directory( corpus_dir=None ) :
+    """
+    corpus_dir, or $EVOCORPUS_DIR, or CORPUS_DIRECTORY.
+    """
+    if corpus_dir :
+        return corpus_dir
+
+    return os.environ.get( 'EVOCORPUS_DIR', CORPUS_DIRECTORY )
+
+def corpus_program_hash() :
+    """
+    A hash of the source of the generators, so a change to any of them
+    is a new corpus. '0x' and 16 hex digits, like the program hashes
+    in evocrypt's file names.
+    """
+    source_files = set()
+    for module_name in [ 'evornt', 'evofolds', 'evohashes', 'evoprimes',
+                         'evoprngutils', 'evoprngs', 'evocprngs',
+                         'evoemit' ] :
+        the_file = getattr( sys.modules.get( module_name ), '__file__', None )
+        if the_file :
+            source_files.add( the_file )
+
+    the_hash = hashlib.sha512()
+    for the_file in sorted( source_files ) :
+        with open( the_file, 'rb' ) as source_fd :
+            the_hash.update( source_fd.read() )
+
+    return '0x' + the_hash.hexdigest()[ : 16 ]
+
+def corpus_bit_width( generator_name, bit_width ) :
+    """
+    bit_width, or evoemit's default for the generator, 8 (the keystream)
+    for the crypto PRNGs, 64 for the others.
+    """
+    if bit_width is not None :
+        return bit_width
+
+    return 8 if generator_name in CRYPTO_GENERATORS else 64
+
+def corpus_parameters( generator_name, integer_width=128, vector_depth=31,
+                       paranoia_level=1, n_prngs=9, bit_width=None,
+                       program_hash=None ) :
+    """
+    The description of a corpus in its .json, everything but the
+    password.
+    """
+    if program_hash is None :
+        program_hash = corpus_program_hash()
+
+    return { 'version'        : CORPUS_VERSION,
+             'generator'      : generator_name,
+             'integer_width'  : integer_width,
+             'vector_depth'   : vector_depth,
+             'paranoia_level' : paranoia_level,
+             'n_prngs'        : n_prngs,
+             'bit_width'      : corpus_bit_width( generator_name,
+                                                  bit_width ),
+             'program_hash'   : program_hash }
+
+def corpus_base_name( corpus_dir, parameters, password ) :
+    """
+    The corpus's file name without the suffix, a digest of the
+    parameters and the password.
+    """
+    the_hash = hashlib.sha512( password.encode( 'utf8' ) )
+    the_hash.update( json.dumps( parameters,
+                                 sort_keys=True ).encode( 'utf8' ) )
+
+    return os.path.join( corpus_dir, the_hash.hexdigest()[ : 64 ] )
+
+def corpus_file_name( generator_name, password, integer_width=128,
+                      vector_depth=31, paranoia_level=1, n_prngs=9,
+                      bit_width=None, program_hash=None, corpus_dir=None ) :
+    """
+    The .bin file of a corpus, whether or not it exists yet.
+    """
+    parameters = corpus_parameters( generator_name, integer_width,
+                                    vector_depth, paranoia_level, n_prngs,
+                                    bit_width, program_hash )
+
+    return corpus_base_name( corpus_directory( corpus_dir ), parameters,
+                             password ) + '.bin'
+
+def write_private_file( the_file_name, the_bytes ) :
+    """
+    Writes an owner-only file, write then rename so a reader never sees
+    half a file.
+    """
+    temp_file_name = the_file_name + '.' + str( os.getpid() )
+    the_fd = os.open( temp_file_name,
+                      os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600 )
+    with os.fdopen( the_fd, 'wb' ) as the_file :
+        the_file.write( the_bytes )
+    os.replace( temp_file_name, the_file_name )
+
+def walk_state( the_object, slots, descriptions, seen ) :
+    """
+    Appends to slots ( kind, holder, key, value ) for every value in
+    the_object's attributes, and in the objects and lists they hold,
+    that running a generator can change.  holder is an object and key
+    an attribute name, or a list and an index, or for a list of plain
+    values the list itself and None.  kind is 'l' for those lists, for
+    the rest the type of the value, which can change, a digest that is
+    None until the first one.  Appends to descriptions a line per
+    object or list of objects, its class and what each attribute or
+    element is, so a generator built differently doesn't match.
+    Objects and lists held twice are walked once.
+    """
+    seen.add( id( the_object ) )
+    if isinstance( the_object, list ) :
+        the_items   = list( enumerate( the_object ) )
+        description = [ 'list' ]
+    else :
+        # sorted, a restored RNT sets them in another order
+        the_items   = sorted( vars( the_object ).items() )
+        description = [ type( the_object ).__name__ ]
+
+    for key, the_value in the_items :
+        if isinstance( the_value, ( types.MethodType, types.FunctionType,
+                                    types.BuiltinFunctionType, type ) ) :
+            kind = 'm' # methods, chosen when it was built
+        elif the_value is None :
+            kind = 'v'
+            slots.append( ( 'n', the_object, key, 0 ) )
+        elif isinstance( the_value, bool ) :
+            kind = 'v'
+            slots.append( ( 'b', the_object, key, int( the_value ) ) )
+        elif isinstance( the_value, ( int, float, str ) ) :
+            kind = 'v'
+            slots.append( ( type( the_value ).__name__[ 0 ], the_object, key,
+                            the_value ) )
+        elif isinstance( the_value, bytes ) :
+            kind = 'v'
+            slots.append( ( 'y', the_object, key, the_value.hex() ) )
+        elif id( the_value ) in seen :
+            kind = 'r'
+        elif isinstance( the_value, list ) and \
+             all( isinstance( element, ( int, float, str ) ) and
+                  not isinstance( element, bool )
+                  for element in the_value ) :
+            kind = 'l'
+            seen.add( id( the_value ) )
+            slots.append( ( kind, the_value, None, list( the_value ) ) )
+        elif isinstance( the_value, list ) or \
+             hasattr( the_value, '__dict__' ) :
+            kind = 'o'
+            walk_state( the_value, slots, descriptions, seen )
+        else :
+            raise ValueError( "can't save a " + type( the_value ).__name__ )
+
+        description.append( str( key ) + '=' + kind )
+
+    descriptions.append( ' '.join( description ) )
+
+def generator_state( the_generator ) :
+    """
+    ( descriptions, slots ) of the_generator, see walk_state().
+    """
+    slots        = []
+    descriptions = []
+    walk_state( the_generator, slots, descriptions, set() )
+
+    return descriptions, slots
+
+def corpus_state_key( password ) :
+    """
+    The HMAC key of the .state files, only the password gives it.
+    """
+    return hashlib.sha512( b'evocorpus.state\0' +
+                           password.encode( 'utf8' ) ).digest()
+
+def read_corpus_state( base_name, password ) :
+    """
+    ( n_bytes, descriptions, kinds, values ) from the .state file, the
+    byte count and the generator's state at it, None if there is no
+    good one.  set_generator_state() puts the state in a generator.
+    """
+    state_name = base_name + '.state'
+    if not os.path.isfile( state_name ) or not is_private( state_name ) :
+        return None
+
+    with open( state_name, 'rb' ) as state_fd :
+        the_bytes = state_fd.read()
+
+    the_body = the_bytes[ : -32 ]
+    the_hmac = hmac.new( corpus_state_key( password ), the_body,
+                         hashlib.sha256 ).digest()
+    if not hmac.compare_digest( the_hmac, the_bytes[ -32 : ] ) or \
+       not the_body.startswith( CORPUS_STATE_MAGIC ) :
+        return None
+
+    try :
+        the_state, offset = unpack_rnt_values( the_body,
+                                               len( CORPUS_STATE_MAGIC ), 4 )
+    except ( ValueError, struct.error ) :
+        return None
+
+    if offset != len( the_body ) :
+        return None
+
+    return the_state
+
+def set_generator_state( the_generator, descriptions, the_kinds,
+                         the_values ) :
+    """
+    Sets the_generator, built from the password and the corpus's
+    parameters, to a state from read_corpus_state().
+
+    Returns False, and the_generator is as it was, if the state isn't
+    one of a generator like it.
+    """
+    the_descriptions, slots = generator_state( the_generator )
+    if descriptions != the_descriptions or \
+       not len( the_kinds ) == len( the_values ) == len( slots ) :
+        return False
+
+    # everything is checked before anything is set
+    new_values = []
+    try :
+        for ( kind, _, _, _ ), saved_kind, the_value in \
+                zip( slots, the_kinds, the_values ) :
+            if ( kind == 'l' ) != ( saved_kind == 'l' ) :
+                return False
+            if saved_kind == 'n' :
+                the_value = None
+            elif saved_kind == 'b' :
+                the_value = bool( the_value )
+            elif saved_kind == 'y' :
+                the_value = bytes.fromhex( the_value )
+            new_values.append( the_value )
+    except ( ValueError, TypeError ) :
+        return False
+
+    for ( kind, holder, key, _ ), the_value in zip( slots, new_values ) :
+        if kind == 'l' :
+            holder[ : ] = the_value
+        elif isinstance( holder, list ) :
+            holder[ key ] = the_value
+        else :
+            setattr( holder, key, the_value )
+
+    return True
+
+def write_corpus_state( base_name, parameters, n_bytes, the_generator,
+                        password ) :
+    """
+    The generator's state and n_bytes to the .state file, then the
+    .json.  The .state is what counts, the .json is for people and
+    read_corpus_metadata().
+    """
+    descriptions, slots = generator_state( the_generator )
+    the_body = CORPUS_STATE_MAGIC + pack_rnt_values(
+                   [ n_bytes, descriptions,
+                     [ kind for kind, _, _, _ in slots ],
+                     [ the_value for _, _, _, the_value in slots ] ] )
+    the_hmac = hmac.new( corpus_state_key( password ), the_body,
+                         hashlib.sha256 ).digest()
+    write_private_file( base_name + '.state', the_body + the_hmac )
+
+    metadata = dict( parameters, n_bytes=n_bytes )
+    write_private_file( base_name + '.json',
+                        json.dumps( metadata, indent=1,
+                                    sort_keys=True ).encode( 'utf8' ) )
+
+def read_corpus_metadata( file_name ) :
+    """
+    The .json of the corpus whose .bin is file_name, None if it isn't
+    there.
+    """
+    metadata_name = file_name[ : -len( '.bin' ) ] + '.json'
+    if not os.path.isfile( metadata_name ) :
+        return None
+
+    with open( metadata_name, 'r' ) as metadata_file :
+        return json.load( metadata_file )
+
+def make_corpus( generator_name, password, n_bytes, integer_width=128,
+                 vector_depth=31, paranoia_level=1, n_prngs=9,
+                 bit_width=None, program_hash=None, corpus_dir=None,
+                 report_seconds=10, report_file=None ) :
+    """
+    The .bin file of the corpus, with at least n_bytes in it.
+
+    Whatever is already there is used. If there are fewer bytes, the
+    generator resumes from its saved state and the rest is appended, a
+    corpus is only generated once however it grows. Progress goes to
+    report_file, as for evoemit.emit().
+
+    Returns the file name.
+    """
+    corpus_dir = corpus_directory( corpus_dir )
+    os.makedirs( corpus_dir, mode=0o700, exist_ok=True )
+    if not is_private( corpus_dir ) :
+        print( "corpus directory ", corpus_dir, " is readable by others, "
+               "chmod 700 it" )
+        sys.exit( 0 )
+
+    parameters = corpus_parameters( generator_name, integer_width,
+                                    vector_depth, paranoia_level, n_prngs,
+                                    bit_width, program_hash )
+    bit_width  = parameters[ 'bit_width' ]
+    base_name  = corpus_base_name( corpus_dir, parameters, password )
+    file_name  = base_name + '.bin'
+
+    the_state = None
+    if os.path.isfile( file_name ) :
+        the_state = read_corpus_state( base_name, password )
+
+    if the_state is not None and the_state[ 0 ] >= n_bytes :
+        return file_name
+
+    # built from the password every time, the state only resumes it
+    the_rnt       = make_rnt( 4096, password, 'desktop', paranoia_level )
+    the_generator = make_generator( generator_name, the_rnt, integer_width,
+                                    vector_depth, paranoia_level, n_prngs )
+
+    bytes_written = 0
+    if the_state is not None and \
+       set_generator_state( the_generator, *the_state[ 1 : ] ) :
+        bytes_written = the_state[ 0 ]
+
+    # 64-bit corpora are whole values, the generator's state is between
+    # two of them
+    if bit_width == 64 :
+        n_bytes = ( n_bytes + 7 ) & ~7
+
+    the_fd = os.open( file_name, os.O_RDWR | os.O_CREAT, 0o600 )
+    with os.fdopen( the_fd, 'r+b' ) as corpus_file :
+        # anything past the state is from an interrupted run
+        corpus_file.truncate( bytes_written )
+        corpus_file.seek( bytes_written )
+
+        while bytes_written < n_bytes :
+            this_size = min( CORPUS_CHECKPOINT_BYTES, n_bytes - bytes_written )
+            emit( the_generator, corpus_file, this_size, bit_width,
+                  EMIT_BLOCK_SIZE, report_seconds, report_file )
+            os.fsync( corpus_file.fileno() )
+
+            bytes_written += this_size
+            write_corpus_state( base_name, parameters, bytes_written,
+                                the_generator, password )
+
+    return file_name
+
+def open_corpus( file_name, n_bytes=None, typecode='B' ) :
+    """
+    The first n_bytes of a corpus file, all of it if None, through a
+    read-only mmap, as a memoryview of typecode values, 'B' bytes or
+    'Q' 64-bit values in native byte order, as evoemit writes them.
+    Nothing is read until it is used.
+    """
+    file_size = os.path.getsize( file_name )
+    if n_bytes is None :
+        n_bytes = file_size
+    if n_bytes > file_size :
+        print( "open_corpus : ", file_name, " has ", file_size,
+               " bytes, not ", n_bytes )
+        sys.exit( 0 )
+
+    item_size = memoryview( b'' ).cast( typecode ).itemsize
+    n_bytes  -= n_bytes % item_size
+    if n_bytes == 0 :
+        return memoryview( b'' ).cast( typecode )
+
+    with open( file_name, 'rb' ) as corpus_file :
+        the_map = mmap.mmap( corpus_file.fileno(), 0, access=mmap.ACCESS_READ )
+
+    return memoryview( the_map )[ : n_bytes ].cast( typecode )
+
+def usage() :
+    """
+    This provides 'help' and other usage information.
+    """
+    usage_info = """
+        Generates or extends a corpus and prints the name of its file.
+
+        --generator <name>
+        -g          <name>
+            One of """ + ', '.join( GENERATOR_NAMES ) + """
+
+        --password <password>
+        -p         <password>
+
+        --bytes <n>
+        -n      <n>
+            Bytes wanted in the corpus, it is extended if it has fewer.
+
+        --int_width <bits>     integer width of the generator, 128
+        --vec_depth <n>        vector depth of the generator, 31
+        --paranoia  <level>    paranoia level, 1
+        --n_prngs   <n>        PRNGs in a crypto PRNG, 9
+        --bits <8 or 64>       as evoemit.py
+
+        --program_hash <hash>
+            Default is the hash of the generators' source.
+
+        --directory <name>
+            Corpus directory, default $EVOCORPUS_DIR or ./evocorpus
+
+        --report <seconds>
+            Seconds between progress lines on stderr, default 10.
+
+        For example :
+            dieharder -a -g 201 -f $(./evocorpus.py -g lcg_crypto \\
+                                     -p umberalertness -n 100000000)
+    """
+    print( usage_info )
+
+#
+# main begins here
+#
+if __name__ == "__main__" :
+
+# stderr because stdout is the file name
+    sys.stderr.write( '# ' + __filename__ + ' : ' + __version__ + ' : ' +
+                      str( sys.argv[ 1 : ] ) + '\n' )
+
+    SHORT_ARGS = "g:hn:p:"
+    LONG_ARGS  = [ 'bits=', 'bytes=', 'directory=', 'generator=', 'help',
+                   'int_width=', 'n_prngs=', 'paranoia=', 'password=',
+                   'program_hash=', 'report=', 'vec_depth=' ]
+
+    GENERATOR_NAME = None
+    PASSWORD       = ''
+    N_BYTES        = 0
+    INTEGER_WIDTH  = 128
+    VECTOR_DEPTH   = 31
+    PARANOIA_LEVEL = 1
+    N_PRNGS        = 9
+    BIT_WIDTH      = None
+    PROGRAM_HASH   = None
+    CORPUS_DIR     = None
+    REPORT_SECONDS = 10
+
+    try :
+        OPTS, ARGS = getopt.getopt( sys.argv[ 1 : ], SHORT_ARGS, LONG_ARGS )
+
+    except getopt.GetoptError as err :
+        sys.stderr.write( "getopt.GetoptError = " + str( err ) + '\n' )
+        sys.exit( -2 )
+
+    for o, a in OPTS :
+        if o in ( "--help", "-h" ) :
+            usage()
+            sys.exit( -2 )
+
+        if o in ( "--generator", "-g" ) :
+            GENERATOR_NAME = a
+
+        if o in ( "--password", "-p" ) :
+            PASSWORD = a
+
+        if o in ( "--bytes", "-n" ) :
+            N_BYTES = int( a )
+
+        if o == "--int_width" :
+            INTEGER_WIDTH = int( a )
+
+        if o == "--vec_depth" :
+            VECTOR_DEPTH = int( a )
+
+        if o == "--paranoia" :
+            PARANOIA_LEVEL = int( a )
+
+        if o == "--n_prngs" :
+            N_PRNGS = int( a )
+
+        if o == "--bits" :
+            BIT_WIDTH = int( a )
+
+        if o == "--program_hash" :
+            PROGRAM_HASH = a
+
+        if o == "--directory" :
+            CORPUS_DIR = a
+
+        if o == "--report" :
+            REPORT_SECONDS = float( a )
+
+    if GENERATOR_NAME not in GENERATOR_NAMES :
+        sys.stderr.write( "--generator is one of " +
+                          ', '.join( GENERATOR_NAMES ) + '\n' )
+        sys.exit( 0 )
+
+    if not PASSWORD :
+        # a random password would be a corpus nobody could find again
+        sys.stderr.write( "--password is required\n" )
+        sys.exit( 0 )
+
+    print( make_corpus( GENERATOR_NAME, PASSWORD, N_BYTES, INTEGER_WIDTH,
+                        VECTOR_DEPTH, PARANOIA_LEVEL, N_PRNGS, BIT_WIDTH,
+                        PROGRAM_HASH, CORPUS_DIR, REPORT_SECONDS ) )
+    sys.exit( 0 )
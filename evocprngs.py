@@ -31,22 +31,62 @@ import getopt
 import random
 import struct
 import array
+import time
 import evoutils
 from evofolds     import FoldInteger
 from evohashes    import HASHES
-from evoprngutils import generate_constants
-from evornt       import RNT
+from evoprngutils import generate_constants, constant_table, rnt_advance, \
+                         CONSTANTS_CACHE, DRAWS_CACHE
+from evornt       import RNT, make_rnt
 from evoprimes    import get_next_higher_prime
-from evoprngs     import PRNGs, LCG, byte_rate
+from evoprngs     import PRNGs, LCG, byte_rate, set_lcg_seeding, \
+                         lcg_seeding, LCG_SEEDING_LEGACY, LCG_SEEDING_CHAINED
 from evoutils     import VERBOSITY_LEVEL, DEBUG_FD, debug, \
                          close_files_and_exit, print_stacktrace, \
-                         print_stacktrace_exit
+                         print_stacktrace_exit, xor_combine
 
 
 #from evochat   import LOG_FD
 
 #SINGLE_PROGRAM_FROM_HERE
 
+# How HashCrypto and PrngCrypto are built.  LEGACY leaves the RNT where
+# building LcgCrypto's vector of LCGs would have, they used to build it
+# and throw it away, and their keystreams depend on the RNT's state.  LEAN
+# builds only what each uses, a different keystream for both.
+#
+# Where the RNT ends up depends on every value in the vector, the hash
+# seeding each LCG draws from the RNT at every update and the LCG's last
+# value picks its next draw, so LEGACY still has to build it.  Only
+# rnt_advance()'s cache of where an RNT state leads saves that, on disk
+# when set_constants_cache() is on, otherwise a second build from the
+# same state in the same process.  By default, a fresh process, LEGACY
+# saves nothing.
+CRYPTO_CONSTRUCTION_LEGACY = 0
+CRYPTO_CONSTRUCTION_LEAN   = 1
+
+CRYPTO_CONSTRUCTION = CRYPTO_CONSTRUCTION_LEGACY
+
+def set_crypto_construction( construction_version ) :
+    """
+    Selects the construction of every HashCrypto and PrngCrypto built from
+    now on. Both ends have to use the same one, like the password.
+    """
+    global CRYPTO_CONSTRUCTION
+
+    if construction_version not in [ CRYPTO_CONSTRUCTION_LEGACY,
+                                     CRYPTO_CONSTRUCTION_LEAN ] :
+        print( "unknown crypto construction version", construction_version )
+        sys.exit( 0 )
+
+    CRYPTO_CONSTRUCTION = construction_version
+
+def crypto_construction() :
+    """
+    The construction version crypto PRNGs built now get.
+    """
+    return CRYPTO_CONSTRUCTION
+
 #
 # Classes of CRYPTO-QUALITY-PRNGS
 #
@@ -133,8 +173,8 @@ class CRYPTO :
         # hard code desired RNT bytes and paranoia level for now
         # because it is passed everywhere, I am using it to pass the
         # paranoia_level and sysem type
-        self.the_rnt           = RNT( 4096, passphrase, system_type,
-                                      paranoia_level )
+        self.the_rnt           = make_rnt( 4096, passphrase, system_type,
+                                           paranoia_level )
 
         self.entropy           = self.the_rnt.password_hash
         self.the_rnt.paranoia_level = paranoia_level
@@ -196,7 +236,22 @@ class LcgCrypto() :
         15738.476547842401 bytes/second.  Slow, but how many of your
         messages are 15K bytes?
         """
+        self.init_state( the_rnt, n_prngs, prng_bit_width, vector_depth,
+                         paranoia_level )
+
+        self.prng_vector = self.build_lcg_vector()
 
+        for i in range( self.n_prngs ) :  
+            # steps should be dependent on pw
+            steps = self.the_rnt.password_hash & 0x2F
+            self.prng_vector[ i ].next( 8, steps )
+
+    def init_state( self, the_rnt, n_prngs, prng_bit_width, vector_depth,
+                    paranoia_level ) :
+        """
+        The attributes every crypto PRNG has, nothing is drawn from the
+        RNT.
+        """
         self.the_rnt             = the_rnt
         self.integer_width       = prng_bit_width
         # 64 bits is the least I think is reliably random, are now prohibited
@@ -217,6 +272,14 @@ class LcgCrypto() :
         self.the_fold            = FoldInteger( )
         self.entropy_bits        = the_rnt.password_hash
 
+        self.construction_version = CRYPTO_CONSTRUCTION
+
+    def build_lcg_vector( self ) :
+        """
+        Returns the n_prngs LCGs, their constants and seeds drawn from the
+        RNT.
+        """
+        prng_vector = []
 
         # hash_depth should be differently different than vector_depth
         # good enough for now.
@@ -241,22 +304,33 @@ class LcgCrypto() :
         # return multiplier, constant, lag, increment
         
 #        entropy_bits = folded_hash_of_state ^ self.entropy_bits
-        constant_generator = generate_constants( self.the_rnt,
-                                                 self.integer_width,
-                                                 self.n_prngs )
+        the_constants = constant_table( self.the_rnt, self.integer_width,
+                                        self.n_prngs )
         for i in range( self.n_prngs ) :
-            multiplier, constant, lag, _ = next( constant_generator )
+            multiplier, constant, lag, _ = the_constants[ i ]
 
             # seed, rnt, integer_width, n_integers, multiplier, constant, lag 
-            self.prng_vector.append( LCG( self.the_rnt,
-                                          self.integer_width, self.vector_depth,
-                                          self.paranoia_level,
-                                          multiplier, constant, lag ) )
+            prng_vector.append( LCG( self.the_rnt,
+                                     self.integer_width, self.vector_depth,
+                                     self.paranoia_level,
+                                     multiplier, constant, lag ) )
 
-        for i in range( self.n_prngs ) :  
-            # steps should be dependent on pw
-            steps = self.the_rnt.password_hash & 0x2F
-            self.prng_vector[ i ].next( 8, steps )
+        return prng_vector
+
+    def skip_lcg_vector( self ) :
+        """
+        For the subclasses, which have no use for the LCGs.  LEGACY
+        leaves the RNT as build_lcg_vector() would, through rnt_advance(),
+        which only builds them when it has not seen this RNT state
+        before, so without the disk cache a fresh process builds them
+        every time.  LEAN leaves the RNT alone.
+        """
+        if self.construction_version == CRYPTO_CONSTRUCTION_LEGACY :
+            rnt_advance( self.the_rnt,
+                         ( 'LcgCrypto', self.n_prngs, self.integer_width,
+                           self.vector_depth, self.paranoia_level,
+                           lcg_seeding() ),
+                         self.build_lcg_vector )
 
     def next( self, bit_width, steps ) :
         """
@@ -317,6 +391,55 @@ class LcgCrypto() :
         # At this point, the return integer is bit_width * steps wide
         return ( self.the_fold.fold_it( return_integer, bit_width ) )
 
+    def next_bytes( self, n_bytes, steps ) :
+        """
+        Returns a bytearray of n_bytes of keystream, exactly the bytes
+        that n_bytes calls of next( 8, steps ) would have returned.
+
+        Callers wanting bytes should use this or keystream_into(), a
+        Python call and a fold per byte is most of what next( 8, ... )
+        costs beyond the underlying PRNGs.
+        """
+        the_bytes = bytearray( n_bytes )
+        self.keystream_into( the_bytes, steps )
+
+        return the_bytes
+
+    def keystream_into( self, buffer, steps ) :
+        """
+        Fills a preallocated, writable buffer ( bytearray, memoryview of
+        bytes, array( 'B' ) ) with keystream bytes, the same sequence as
+        len( buffer ) calls of next( 8, steps ).
+
+        This is next() with bit_width fixed at 8 and everything looked up
+        once per block instead of once per bit.  The bit lands at
+        bit_index whichever way it was shifted, and the xor of 8-bit
+        values is never wider than 8 bits, so the fold at the end of
+        next() never does anything for bytes and is skipped here.
+        """
+        prng_vector   = self.prng_vector
+        selector_next = prng_vector[ self.n_prngs - 1 ].next
+        n_selected    = self.n_prngs - 1
+        next_prng     = self.next_prng % n_selected
+        for byte_index in range( len( buffer ) ) :
+            return_integer = 0
+            for _ in range( steps ) :
+                for bit_index in range( 8 ) :
+                    selected_bit_index = selector_next( 8, 1 ) % 8
+
+                    lcg_value = prng_vector[ next_prng ].next( 8, steps )
+                    next_prng = ( next_prng + 1 ) % n_selected
+
+                    return_integer ^= \
+                        ( ( lcg_value >> selected_bit_index ) & 1 ) << bit_index
+
+            buffer[ byte_index ] = return_integer
+
+        self.next_prng     = next_prng
+        self.total_cycles += steps * len( buffer )
+
+        return buffer
+
 
     def dump_state( self ) :
         """
@@ -340,60 +463,45 @@ class LcgCrypto() :
         assert isinstance( plain_text, type( 'a' ) ) or \
                isinstance( plain_text, type( [] ) )
         
-        cipher_text = bytearray( b'' )
-        if   isinstance( plain_text, type( b'' ) )  or \
-             isinstance( plain_text, bytearray ) :
-            for plain_byte in plain_text :
-                rand_byte = self.next( 8, steps )
-
-                cipher_byte  = rand_byte ^ ord( plain_byte )
-                cipher_text.append( cipher_byte & 0xff )
-
-        elif isinstance( plain_text, type( 'a' ) ) :
-            for plain_byte in plain_text :
-                rand_byte = self.next( 8, steps )
-
-                cipher_byte  = rand_byte ^ ord( plain_byte )
-                cipher_text.append( cipher_byte & 0xff )
-
-        elif isinstance( plain_text, type( [] ) ) :
+        if isinstance( plain_text, type( [] ) ) :
             for plain_line in plain_text :
-                for plain_byte in plain_line :
-                    assert isinstance( plain_byte, type( 'a' ) )
-                    cipher_text.append( ord( self.next( 8, steps ) ) ^ \
-                                          ord( plain_byte ) & 0xFF )
+                assert isinstance( plain_line, type( 'a' ) )
+            plain_text = ''.join( plain_text )
+
+        # only the low byte of a character ever survived the encryption
+        plain_bytes = bytes( [ ord( plain_byte ) & 0xFF
+                               for plain_byte in plain_text ] )
 
-        return cipher_text
+        return bytearray( xor_combine( plain_bytes,
+                                       self.next_bytes( len( plain_bytes ),
+                                                        steps ) ) )
 
     def decrypt( self, cipher_text, steps ) :
         """
         decrypts a message string and returns the encrypted string.
         """
 
-        plain_text = ''
         if   isinstance( cipher_text, type( b'' ) )  or \
              isinstance( cipher_text, bytearray ) :
-            for ciph_byte in cipher_text :
-                rand_byte = self.next( 8, steps )
-
-                plain_byte = chr( rand_byte ^ ciph_byte )
-                plain_text += plain_byte
+            cipher_bytes = cipher_text
 
         elif isinstance( cipher_text, type( 'a' ) ) :
-            for ciph_byte in cipher_text :
-                rand_byte = self.next( 8, steps )
-
-                plain_byte = chr( rand_byte ^ ord( ciph_byte ) )
-                plain_text += plain_byte
-
-        elif isinstance( plain_text, type( [] ) ) :
-            for ciph_line in cipher_text :
-                for ciph_byte in ciph_line :
-                    assert isinstance( ciph_byte,  type( 'a' ) )
-                    plain_text += chr( ( ord( self.next( 8, steps ) ) ^ \
-                                         ord( ciph_byte ) ) & 0xFF )
-        
-        return plain_text
+            cipher_bytes = bytes( [ ord( ciph_byte ) & 0xFF
+                                    for ciph_byte in cipher_text ] )
+
+        elif isinstance( cipher_text, type( [] ) ) :
+            cipher_bytes = bytes( [ ord( ciph_byte ) & 0xFF
+                                    for ciph_line in cipher_text
+                                    for ciph_byte in ciph_line ] )
+        else :
+            return ''
+
+        plain_bytes = xor_combine( cipher_bytes,
+                                   self.next_bytes( len( cipher_bytes ),
+                                                    steps ) )
+
+        # latin-1 is chr() of every byte
+        return plain_bytes.decode( 'latin-1' )
 
 
 class HashCrypto( LcgCrypto ) :
@@ -421,8 +529,10 @@ class HashCrypto( LcgCrypto ) :
         initializes n_prngs with integers, then another n_prngs with
         hashes?
         """
-        LcgCrypto.__init__( self, the_rnt, n_prngs, integer_width,
-                            vector_depth, paranoia_level )
+        self.init_state( the_rnt, n_prngs, integer_width, vector_depth,
+                         paranoia_level )
+        self.skip_lcg_vector()
+
         self.bit_selection_mask   = integer_width - 1
         self.next_hash            = 0
 
@@ -485,6 +595,20 @@ class HashCrypto( LcgCrypto ) :
         # final fold for the generated return value
         return self.the_fold.fold_it( return_value, bit_width )
 
+    def keystream_into( self, buffer, steps ) :
+        """
+        Fills buffer with the same bytes as len( buffer ) calls of
+        next( 8, steps ).
+
+        The folds in next() are not no-ops here, they advance the
+        FoldInteger round-robin, so every byte goes through next().
+        """
+        next_value = self.next
+        for byte_index in range( len( buffer ) ) :
+            buffer[ byte_index ] = next_value( 8, steps )
+
+        return buffer
+
 #    def next1( self, bit_width, steps ) :
 #        """
 #        Returns the xors of steps random numbers in the next_integer
@@ -707,8 +831,9 @@ class PrngCrypto( LcgCrypto ) :
 
         """
 
-        LcgCrypto.__init__( self, the_rnt, n_prngs, integer_width,
-                            vector_depth, paranoia_level )
+        self.init_state( the_rnt, n_prngs, integer_width, vector_depth,
+                         paranoia_level )
+        self.skip_lcg_vector()
 
         self.vector_depth        = vector_depth
 
@@ -745,12 +870,11 @@ class PrngCrypto( LcgCrypto ) :
         # enough for the mod to do something.
         # current_max steps from high to low, current_min the reverse
 #        entropy_bits = folded_hash_of_state ^ self.entropy_bits
-        constant_generator = generate_constants( self.the_rnt,
-                                                 self.integer_width,
-                                                 self.n_prngs )
+        the_constants = constant_table( self.the_rnt, self.integer_width,
+                                        self.n_prngs )
         prngs = PRNGs()
         for i in range( self.n_prngs ) :
-            multiplier, addition, lag, _ = next( constant_generator )
+            multiplier, addition, lag, _ = the_constants[ i ]
             # this loop instantiates the prngs
             # seed, rnt, integer_width, hash_depth, multiplier, constant, lag 
             # prng_set size, vector_depth,  should be differently different than
@@ -829,6 +953,40 @@ class PrngCrypto( LcgCrypto ) :
 
         return self.the_fold.fold_it( return_value, bit_width )
 
+    def keystream_into( self, buffer, steps ) :
+        """
+        Fills buffer with the same bytes as len( buffer ) calls of
+        next( 8, steps ).
+
+        As in LcgCrypto, the fold is a no-op for 8-bit values. Only
+        bits selected from above bit_index are used, next() drops the
+        others.
+        """
+        prng_set      = self.prng_set
+        selector_next = prng_set[ self.n_prngs - 1 ].next
+        n_selected    = self.n_prngs - 1
+        next_prng     = self.next_prng % n_selected
+        for byte_index in range( len( buffer ) ) :
+            return_value = 0
+            for _ in range( steps ) :
+                for bit_index in range( 8 ) :
+                    selected_bit_index = selector_next( 8, 1 ) % 8
+
+                    random_value = prng_set[ next_prng ].next( 8, 1 )
+                    next_prng = ( next_prng + 1 ) % n_selected
+
+                    if selected_bit_index > bit_index :
+                        return_value ^= \
+                            ( ( random_value >> selected_bit_index ) & 1 ) \
+                                                              << bit_index
+
+            buffer[ byte_index ] = return_value
+
+        self.next_prng     = next_prng
+        self.total_cycles += steps * len( buffer )
+
+        return buffer
+
 def dump_state( self ) :
     """ Debug code """
     for element in self.prng_vector :
@@ -860,6 +1018,54 @@ def generate_random_table( the_rnt, n_bytes, bitwidth ) :
 
 #SINGLE_PROGRAM_TO_HERE
 
+def construction_times( passphrase, seeding_version,
+                        construction_version=CRYPTO_CONSTRUCTION_LEGACY ) :
+    """
+    Benchmark of building the crypto PRNGs, every system type and
+    paranoia level in CRYPTO.system_paranoia, with the LCGs seeded by
+    seeding_version and HashCrypto and PrngCrypto built by
+    construction_version.
+
+    Returns a list of ( system_type, paranoia_level, crypto name,
+    seconds ), CRYPTO() itself, the RNT, is 'CRYPTO'.
+
+    HashCrypto can't be built with 64-bit integers, its first next()
+    needs to add up 128 bits from 64-bit digests, so those are None.
+
+    The LCG seeding and the construction are left at the defaults,
+    LEGACY.
+    """
+    set_lcg_seeding( seeding_version )
+    set_crypto_construction( construction_version )
+
+    times = []
+    for system_type in CRYPTO.system_paranoia :
+        for paranoia_level in sorted( CRYPTO.system_paranoia[ system_type ] ) :
+            beginning_time = time.perf_counter()
+            the_crypto = CRYPTO( passphrase, system_type, paranoia_level )
+            times.append( ( system_type, paranoia_level, 'CRYPTO',
+                            time.perf_counter() - beginning_time ) )
+
+            for crypto_function in list( the_crypto.crypto_functions ) :
+                if crypto_function == HashCrypto and \
+                   the_crypto.integer_width <= 64 :
+                    times.append( ( system_type, paranoia_level,
+                                    crypto_function.__name__, None ) )
+                    continue
+
+                beginning_time = time.perf_counter()
+                crypto_function( the_crypto.the_rnt, the_crypto.n_prngs,
+                                 the_crypto.integer_width,
+                                 the_crypto.vector_depth, paranoia_level )
+                times.append( ( system_type, paranoia_level,
+                                crypto_function.__name__,
+                                time.perf_counter() - beginning_time ) )
+
+    set_lcg_seeding( LCG_SEEDING_LEGACY )
+    set_crypto_construction( CRYPTO_CONSTRUCTION_LEGACY )
+
+    return times
+
 def usage() :
     """
     This provides 'help' and other usage information.
@@ -873,6 +1079,12 @@ def usage() :
             'medium_distribution' prints 16M prn bytes to std out
             'small_distribution'  prints 4096 prn bytes to std out
             'code'  encodes, then decodes plain text
+            'construction' times building each crypto PRNG for every
+                           system type and paranoia level, both LCG
+                           seedings. The legacy 'big' ones take a while.
+            'construction_versions' the same for the LEGACY construction,
+                           LEGACY again with the RNT states it has
+                           seen memoized, and LEAN.
     """
     print( usage_info )
 
@@ -1066,6 +1278,38 @@ if __name__ == "__main__" :
 #            print( hex( THE_RANDOM_NUMBER ) )
 
 
+    if 'construction' in TEST_LIST :
+        for SEEDING_VERSION in [ LCG_SEEDING_LEGACY, LCG_SEEDING_CHAINED ] :
+            for SYSTEM_TYPE, PARANOIA_LEVEL, CRYPTO_NAME, SECONDS in \
+                construction_times( PASSPHRASE, SEEDING_VERSION ) :
+                if SECONDS is None :
+                    SECONDS = "doesn't finish"
+                else :
+                    SECONDS = "%.2f" % SECONDS
+                print( "LCG seeding", SEEDING_VERSION, SYSTEM_TYPE,
+                       PARANOIA_LEVEL, CRYPTO_NAME, SECONDS )
+                sys.stdout.flush()
+
+    if 'construction_versions' in TEST_LIST :
+        for LABEL, CONSTRUCTION_VERSION in \
+            [ ( 'legacy', CRYPTO_CONSTRUCTION_LEGACY ),
+              ( 'legacy again', CRYPTO_CONSTRUCTION_LEGACY ),
+              ( 'lean', CRYPTO_CONSTRUCTION_LEAN ) ] :
+            if LABEL != 'legacy again' :
+                CONSTANTS_CACHE.clear()
+                DRAWS_CACHE.clear()
+
+            for SYSTEM_TYPE, PARANOIA_LEVEL, CRYPTO_NAME, SECONDS in \
+                construction_times( PASSPHRASE, LCG_SEEDING_LEGACY,
+                                    CONSTRUCTION_VERSION ) :
+                if SECONDS is None :
+                    SECONDS = "doesn't finish"
+                else :
+                    SECONDS = "%.2f" % SECONDS
+                print( LABEL, SYSTEM_TYPE, PARANOIA_LEVEL, CRYPTO_NAME,
+                       SECONDS )
+                sys.stdout.flush()
+
     if 'hash_crypto_rate' in TEST_LIST :
         N_HASHES       = 19
         INTEGER_WIDTH  = 128
@@ -64,6 +64,7 @@ parent program using the same password.
 Current limitations of the code :
 
 """
+#SINGLE_PROGRAM_FROM_HERE
 __version__   = "0.1"
 __revision__  = "$Id$"
 __date__      = "2017-04-02"
@@ -78,17 +79,30 @@ TODO :
 0) 
 
 """
+#SINGLE_PROGRAM_TO_HERE
 
 import sys
 import os
+import io
 import getopt
+import contextlib
 import hashlib
+import hmac
 import shutil
+import struct
+import time
+import multiprocessing
 from array     import array
-from evocprngs import LcgCrypto, CRYPTO, PrngCrypto, HashCrypto
+from evocprngs import LcgCrypto, CRYPTO, PrngCrypto, HashCrypto, \
+                      set_crypto_construction, crypto_construction, \
+                      CRYPTO_CONSTRUCTION_LEGACY, CRYPTO_CONSTRUCTION_LEAN
+from evoprngs  import set_lcg_seeding, lcg_seeding, LCG_SEEDING_LEGACY, \
+                      LCG_SEEDING_CHAINED
 from evohashes import HASHES
-from evornt    import RNT
+from evornt    import RNT, make_rnt, set_rnt_cache
+from evoprngutils import set_constants_cache
 from evofolds  import FoldInteger
+from evoutils  import xor_combine
 from binascii  import unhexlify
 
 
@@ -107,7 +121,8 @@ def assemble_program_from_dev_files() :
     This worked, the resulting program executes.
     """
     dev_files = [ 'evoutils.py', 'evofolds.py', 'evoprimes.py', 'evohashes.py',
-                  'evornt.py',   'evoprngs.py', 'evocprngs.py', 'evocrypt.py' ]
+                  'evornt.py',   'evoprngutils.py', 'evoprngs.py',
+                  'evocprngs.py', 'evocrypt.py' ]
 
     the_program = \
 """#!/usr/bin/python3
@@ -126,6 +141,7 @@ import curses
 import traceback
 import math
 import hashlib
+import hmac
 import random
 import binascii
 import struct
@@ -134,8 +150,11 @@ import time
 import copy
 import getopt
 from contextlib import contextmanager
+import contextlib
+import io
 from array import array
 import shutil
+import multiprocessing
 from binascii  import unhexlify
 
 \n
@@ -400,53 +419,73 @@ def bytes_to_int( byte_sequence ) :
     return the_integer
 
 
-def encrypt_file( to_be_encrypted_file_name, password, system_type,
-                  paranoia_level ) :
-    """
-    Uses the standard hash sha512 to produce a check for the
-    decode. The hash is always the first 64 bits in the file to be decoded.
+# Files are encrypted and decrypted a chunk at a time, so memory use is
+# the same for a 1K file and a 10G one.
+CRYPT_CHUNK_SIZE = 1024 * 1024
 
-    Format of the file name : < original name >  + '_" +
-                              < paranoia level > + '_' +
-                              < 64-bit folded sha512 hash in hex > +
-                              ".evocrypt"
+# The v2 container is in segments, and building each one's CRYPTO is
+# about a second and a half of the laptop's time, so segments are large
+# enough to make that small.
+CRYPT_SEGMENT_SIZE = 256 * 1024
 
-    Format of the file : 64-bytes of hash of the plaintext file,
-                         the encrypted file data
-                         64-bytes of hash of the cryptotext file,
-                         including the plaintext file hash, but
-                         necessairly excluding the encrypted text hash itself.
+def crypt_stream( in_file, out_file, the_crypto, n_bytes, out_hash,
+                  chunk_size, steps=1 ) :
+    """
+    XORs n_bytes of in_file with the_crypto's keystream and writes the
+    result to out_file, a chunk at a time.  n_bytes of None means to the
+    end of in_file.
 
-    There are 2 stages of encryption : the first is with the password
-    as the only key.
-    The 2nd is a new RNT with the integer value of the 512-bit hash
-    added to the password.
+    Whatever is written is also added to out_hash, the cipher text when
+    encrypting and the plain text when decrypting, so neither needs to
+    be read back to be hashed.  out_hash of None for no hash.
 
-    23May 2018 encrypt-decrypt tested via ./crypt_test.bash works again.
-    Now to take all the debug stuff back out, 2 steps.
+    steps is passed to the keystream, next( 8, steps ) for every byte.
 
+    Returns the number of bytes written.
     """
-    # sha512 is used to test whether the encryption worked or not
-    byte_plain_text_digest, int_plain_text_digest, hex_plain_text_digest, \
-        short_plain_text_digest = hash_file( to_be_encrypted_file_name )
+    keystream     = bytearray( chunk_size )
+    bytes_written = 0
+    while n_bytes is None or bytes_written < n_bytes :
+        read_size = chunk_size
+        if n_bytes is not None :
+            read_size = min( chunk_size, n_bytes - bytes_written )
+
+        in_chunk = in_file.read( read_size )
+        if not in_chunk :
+            break
 
-    # the file needs connected with the hash of the encrypting program,
-    # contained in its file name. That is another thing to check before
-    # encrypting, of course.
+        this_keystream = memoryview( keystream )[ : len( in_chunk ) ]
+        the_crypto.keystream_into( this_keystream, steps )
+
+        out_chunk = xor_combine( in_chunk, this_keystream )
+        out_file.write( out_chunk )
+        if out_hash is not None :
+            out_hash.update( out_chunk )
+
+        bytes_written += len( out_chunk )
+
+    return bytes_written
 
+def verify_program_hash( program_name ) :
+    """
+    The running program's name has to carry the folded hash of its own
+    text, the hash that goes into every encrypted file's name.
+
+    Returns that folded hash.
+    """
     # get a 512-bit hash of the program, used to make the new file name
     # this is both a part of decoding files and a self-check for the
     # program's integrity ?
-    this_file_folded_hash = hash_file( sys.argv[ 0 ] )[ 3 ]
+    this_file_folded_hash = hash_file( program_name )[ 3 ]
 #    print( "this_file_folded_hash = ", this_file_folded_hash )
 
     # Generate the new name
-    if sys.argv[ 0 ][ -3 : ] != '.py' :
-        print( "Program name = ", sys.argv[ 0 ] )
+    if program_name[ -3 : ] != '.py' :
+        print( "Program name = ", program_name )
         print( "Not a python program? Dangerous to rename your program" )
         sys.exit( 0 )
 
-    this_file_name_hash = sys.argv[ 0 ]
+    this_file_name_hash = program_name
     hash_index = this_file_name_hash.index( '_0x' )
     this_file_name_hash = this_file_name_hash[ hash_index + 1 : -3 ]
 
@@ -456,48 +495,51 @@ def encrypt_file( to_be_encrypted_file_name, password, system_type,
         print( "this_file_folded_hash = ", this_file_folded_hash )
         sys.exit( 0 )
 
-    encrypted_file_name  = to_be_encrypted_file_name
-    encrypted_file_name  += '_' + str( paranoia_level ) 
-    encrypted_file_name  += '_' + this_file_folded_hash + ".evocrypt"
-
-    encrypted_fd = open( encrypted_file_name, 'wb')
+    return this_file_folded_hash
 
-    # first 64 bytes in the file are the sha512 hash of the original file
-    encrypted_fd.write( byte_plain_text_digest )
-
-    # This is what makes every different file have a different
-    # encryption key despite using the same password.
-    total_password = password + hex_plain_text_digest
+def encrypt_file( to_be_encrypted_file_name, password, system_type,
+                  paranoia_level, segment_size=CRYPT_SEGMENT_SIZE,
+                  n_workers=1, this_file_folded_hash=None ) :
+    """
+    Uses the standard hash sha512 to produce a check for the
+    decode. The hash is always the first 64 bits in the file to be decoded.
 
-    the_rnt        = RNT( 4096, paranoia_level, system_type, total_password )
+    Format of the file name : < original name >  + '_" +
+                              < paranoia level > + '_' +
+                              < 64-bit folded sha512 hash in hex > +
+                              ".evocrypt"
 
-    the_crypto     = CRYPTO( password, system_type, paranoia_level )
-    encode         = the_crypto.next()
+    Format of the file is the segmented v2 container, see
+    encrypt_segments(). n_workers processes encrypt the segments.
+    this_file_folded_hash is from verify_program_hash(), None to do it
+    here.
 
-    # read the to-be-encrypted file
-    plain_file_data = open( to_be_encrypted_file_name, 'rb').read()
+    There are 2 stages of encryption : the first is with the password
+    as the only key.
+    The 2nd is a new RNT with the integer value of the 512-bit hash
+    added to the password.
 
-    encrypted_bytes = bytearray( len( plain_file_data ) )
-    for i in range( len( plain_file_data ) ) :
-        # horribly inefficient, but avoids the byte problem
-        encrypted_bytes[ i ] = plain_file_data[ i ] ^ encode.next( 8, 1 )
+    23May 2018 encrypt-decrypt tested via ./crypt_test.bash works again.
+    Now to take all the debug stuff back out, 2 steps.
 
-    encrypted_fd.write( encrypted_bytes )
-    encrypted_fd.close()
+    """
+    # sha512 is used to test whether the encryption worked or not
+    byte_plain_text_digest, int_plain_text_digest, hex_plain_text_digest, \
+        short_plain_text_digest = hash_file( to_be_encrypted_file_name )
 
-    # To ensure file integrity, the contents are hashed and added to the
-    # end of the file.
-    byte_cipher_text_digest, int_cipher_text_digest, hex_cipher_text_digest, \
-        short_cipher_text_digest = hash_file( encrypted_file_name )
+    # the file needs connected with the hash of the encrypting program,
+    # contained in its file name. That is another thing to check before
+    # encrypting, of course.
+    if this_file_folded_hash is None :
+        this_file_folded_hash = verify_program_hash( sys.argv[ 0 ] )
 
-    encrypted_fd = open( encrypted_file_name, 'ab')
-    encrypted_fd.write( byte_cipher_text_digest )
-    encrypted_fd.close()
+    encrypted_file_name  = to_be_encrypted_file_name
+    encrypted_file_name  += '_' + str( paranoia_level ) 
+    encrypted_file_name  += '_' + this_file_folded_hash + ".evocrypt"
 
-    # a test
-    cipher_file_data = open( encrypted_file_name, 'rb').read()
-    bytes_cipher_text_digest, int_cipher_text_digest, hex_cipher_text_digest, \
-        short_cipher_text_digest = hash_text( cipher_file_data[ 0 : 64 ] )
+    encrypt_segments( to_be_encrypted_file_name, encrypted_file_name,
+                      byte_plain_text_digest, password, system_type,
+                      paranoia_level, segment_size, n_workers )
 
     return encrypted_file_name
 
@@ -525,118 +567,620 @@ def verify_evocrypt_file_name( to_be_decrypted_file_name ) :
 
     return original_file_name
 
-def verify_cipher_text_digest( cipher_file_data ) :
+def verify_cipher_file_digest( cipher_file_name, chunk_size ) :
     """
-    Checks the digest.
+    Checks the digest of a v1 file, everything but the trailing 64-byte
+    digest hashed a chunk at a time and compared to that digest.
+
+    Returns the 64-byte plain text digest from the head of the file.
     """
-    # As a check on file integrity, hash the initial plain_text hash and
-    # the encrypted data, but not the trailing cipher_text hash
-    bytes_cipher_text_digest, int_cipher_text_digest, hex_cipher_text_digest, \
-        short_cipher_text_digest = hash_text( cipher_file_data[ 0 : -64 ] )
+    cipher_byte_count = os.path.getsize( cipher_file_name ) - 64
+    if cipher_byte_count < 64 :
+        print( "file is too short to be an evocrypt file" )
+        sys.exit( 0 )
 
-    # compare it to the value in the file
-    file_bytes_cipher_text_digest = cipher_file_data[ -64 : ]
+    the_hash  = hashlib.sha512()
+    cipher_fd = open( cipher_file_name, 'rb' )
 
-    if file_bytes_cipher_text_digest != bytes_cipher_text_digest :
+    byte_plain_text_digest = cipher_fd.read( 64 )
+    the_hash.update( byte_plain_text_digest )
+
+    bytes_left = cipher_byte_count - 64
+    while bytes_left > 0 :
+        the_chunk = cipher_fd.read( min( chunk_size, bytes_left ) )
+        if not the_chunk :
+            break
+        the_hash.update( the_chunk )
+        bytes_left -= len( the_chunk )
+
+    file_bytes_cipher_text_digest = cipher_fd.read( 64 )
+    cipher_fd.close()
+
+    if file_bytes_cipher_text_digest != the_hash.digest() :
         print( "calculated bytes_cipher_text_digest = ",
-               bytes_cipher_text_digest, '\n' )
+               the_hash.digest(), '\n' )
         print( "file_bytes_cipher_text_digest = ",
                file_bytes_cipher_text_digest, '\n' )
         print( "file has been corrupted" )
         sys.exit( 0 )
 
+    return byte_plain_text_digest
+
 # file operations can check names and hashes to ensure valid oprations.
 
-def verify_decrypted_bytes( decrypted_bytes, byte_plain_text_digest ) :
+def unused_file_name( original_file_name ) :
     """
-    Checks
+    original_file_name, or with the first free '.v<i>' added.
     """
-#    print( "len decrypted_bytes = ", len( decrypted_bytes ) )
-#    print( bytes( decrypted_bytes ) )
+    # this should check candidate names, recursively. Wiping out files
+    # by decoding is a real no-no.
+    decrypted_file_name = original_file_name
+    for i in range( 1000 ) : # vast overkill, necessary for testing
+        if not os.path.exists( decrypted_file_name ) :
+            return decrypted_file_name
+        decrypted_file_name = original_file_name + '.v' + str( i )
+
+    print( "no unused name for the decrypted file ", original_file_name )
+    sys.exit( 0 )
+
+def decrypt_file( to_be_decrypted_file_name, password, system_type,
+                  paranoia_level, chunk_size=CRYPT_CHUNK_SIZE,
+                  n_workers=1 ) :
+    """
+    Decrypts a file, with appropriate checks for integrity.
+
+    Password AND paranoia_level both need to be correct for a v1 file,
+    a v2 segmented file has them in its header and n_workers processes
+    decrypt its segments.
+
+    24 April, 2018, this works again using the crypt_test.bash.
+
+    This streams the file, so memory is the same for any size of file.
+    The plain text is written to a new file name, never over an
+    existing file, and removed again if it does not hash to the digest
+    at the head of the cipher file.
+    """
+    original_file_name = verify_evocrypt_file_name( to_be_decrypted_file_name )
+    decrypted_file_name = unused_file_name( original_file_name )
+
+    if is_segmented_file( to_be_decrypted_file_name ) :
+        # v2 carries its own paranoia level and system type
+        return decrypt_segments( to_be_decrypted_file_name,
+                                 decrypted_file_name, password, n_workers )
+
+    # first 64 bytes in the file are the sha512 hash of the original file
+    byte_plain_text_digest = \
+        verify_cipher_file_digest( to_be_decrypted_file_name, chunk_size )
+
+    the_crypto = CRYPTO( password, system_type, paranoia_level )
+    decode     = the_crypto.next()
+
+    # at this point, decode is in the same state as encode, so 
+    # we can decipher with the prng stream.
+
+    # 512 bits in each of 2 hashes is added by encrypt()
+    cipher_byte_count = os.path.getsize( to_be_decrypted_file_name ) - 128
+
+    plain_hash = hashlib.sha512()
+    cipher_fd  = open( to_be_decrypted_file_name, 'rb' )
+    cipher_fd.seek( 64 )
+    output_file = open( decrypted_file_name, 'wb' )
+    crypt_stream( cipher_fd, output_file, decode, cipher_byte_count,
+                  plain_hash, chunk_size )
+    output_file.close()
+    cipher_fd.close()
 
     #
     # Hash the plain text and compare to the original hash in the file.
     #
-    bytes_plain_digest, int_plain_digest, hex_plain_digest, \
-        short_plain_digest = hash_text( decrypted_bytes )
-
-    if byte_plain_text_digest != bytes_plain_digest :
+    if plain_hash.digest() != byte_plain_text_digest :
+        os.remove( decrypted_file_name )
         print( "!!!Error, the decryption is invalid!!!" )
-        print( '\nhash_text() of plaintext ',
-               '\nbytes plain digest = ', bytes_plain_digest,
-               '\nint   plain digest = ', hex( int_plain_digest ), \
-               '\nhex   plain digest = ', hex_plain_digest ,
-               '\nshort plain digest = ', short_plain_digest, '\n\n' )
-
-#        decode_file = open( "evocrypt_decoded_file.tmp", 'wb' )
-#        decode_file.write( bytes( decrypted_bytes ) )
+        print( '\nhash of plaintext ',
+               '\nbytes plain digest = ', plain_hash.digest(),
+               '\nhex   plain digest = ', plain_hash.hexdigest(), '\n\n' )
         sys.exit( 0 )
 
+    return decrypted_file_name
+
+# The v2 .evocrypt container. v1 is one keystream from the start of the
+# file to the end, so it takes one core and the whole prefix to get at
+# any byte of it. v2 cuts the plain text into fixed size segments, each
+# with its own keystream keyed by the password, the plain text digest and
+# the segment's index, and each with its own digest. Segments can be
+# encrypted and decrypted in any order, by any number of processes, and
+# a byte range only needs the segments it falls in.
+#
+# Every segment is a whole CRYPTO, from a passphrase of all three, so
+# nothing of one segment's key schedule tells anything about another's.
+#
+# header  : 'EVOCRYPT', version, paranoia level, crypto construction,
+#           LCG seeding, system type, segment size, plain text size,
+#           64-byte plain text sha512, 64-byte sha512 of all of that
+#
+# The construction and seeding are set_crypto_construction()'s and
+# set_lcg_seeding()'s when the file was written, and the segments are
+# decrypted with them whatever is set then.
+# segment : cipher text, segment_size bytes except for the last one,
+#           64-byte HMAC-SHA512 of the header digest, index and cipher
+#           text, keyed by the first 64 bytes of the segment's keystream
+#
+# Only the password gives the key, so a segment and its digest can't be
+# rewritten together, and a wrong password is caught by the first
+# segment rather than giving garbage. The data is xored with the
+# keystream after the key.
 #
+# Segment i is at a fixed offset, so nothing has to be read to find it.
 
-def decrypt_file( to_be_decrypted_file_name, password, system_type,
-                  paranoia_level ) :
+# the names --construction takes
+CRYPTO_CONSTRUCTIONS = { 'legacy' : CRYPTO_CONSTRUCTION_LEGACY,
+                         'lean'   : CRYPTO_CONSTRUCTION_LEAN }
+
+# the names --seeding takes
+LCG_SEEDINGS = { 'legacy'  : LCG_SEEDING_LEGACY,
+                 'chained' : LCG_SEEDING_CHAINED }
+
+CONTAINER_MAGIC         = b'EVOCRYPT'
+CONTAINER_VERSION       = 2
+CONTAINER_HEADER_FORMAT = '>8sBBBB16sQQ64s'
+CONTAINER_HEADER_SIZE   = struct.calcsize( CONTAINER_HEADER_FORMAT ) + 64
+SEGMENT_KEY_SIZE        = 64
+
+def segment_passphrase( password, byte_plain_text_digest, segment_index ) :
     """
-    Decrypts a file, with appropriate checks for integrity.
+    The passphrase for one segment's CRYPTO. The plain text digest makes
+    the keystreams different for every file, the index for every segment.
+    """
+    return password + ':' + byte_plain_text_digest.hex() + ':' + \
+           str( segment_index )
 
-    Password AND paranoia_level both need to be correct.
+def segment_offset( header, segment_index ) :
+    """
+    The file offset of segment segment_index.
+    """
+    return CONTAINER_HEADER_SIZE + \
+           segment_index * ( header[ 'segment_size' ] + 64 )
 
-    24 April, 2018, this works again using the crypt_test.bash.
+def segment_digest( digest_key, header_digest, segment_index, cipher_text ) :
     """
-    original_file_name = verify_evocrypt_file_name( to_be_decrypted_file_name )
+    The digest that follows each segment's cipher text, keyed by
+    digest_key from the segment's keystream. The header digest and index
+    keep segments from being moved between files or positions.
+    """
+    the_hmac = hmac.new( digest_key, header_digest, hashlib.sha512 )
+    the_hmac.update( segment_index.to_bytes( 8, 'big' ) )
+    the_hmac.update( cipher_text )
+    return the_hmac.digest()
+
+def pack_container_header( paranoia_level, system_type, segment_size,
+                           plain_size, byte_plain_text_digest,
+                           construction_version, seeding_version ) :
+    """
+    The bytes of a v2 header, its digest is the last 64 bytes.
+    """
+    the_header = struct.pack( CONTAINER_HEADER_FORMAT, CONTAINER_MAGIC,
+                              CONTAINER_VERSION, paranoia_level,
+                              construction_version, seeding_version,
+                              system_type.encode( 'ascii' ),
+                              segment_size, plain_size,
+                              byte_plain_text_digest )
 
-    cipher_file_data = open( to_be_decrypted_file_name, 'rb').read()
+    return the_header + hashlib.sha512( the_header ).digest()
 
-    verify_cipher_text_digest( cipher_file_data )
+def is_segmented_file( cipher_file_name ) :
+    """
+    Whether cipher_file_name is a v2 container rather than v1.
+    """
+    with open( cipher_file_name, 'rb' ) as cipher_fd :
+        return cipher_fd.read( len( CONTAINER_MAGIC ) ) == CONTAINER_MAGIC
 
-    # first 64 bytes in the file are the sha512 hash of the original file
-    byte_plain_text_digest = cipher_file_data[ 0 : 64 ]
+def read_container_header( cipher_file_name ) :
+    """
+    Reads and checks the v2 header.
 
-    total_password = password + byte_plain_text_digest.hex()
+    Returns a dictionary of its fields, 'digest' is the header digest.
+    """
+    with open( cipher_file_name, 'rb' ) as cipher_fd :
+        header_bytes = cipher_fd.read( CONTAINER_HEADER_SIZE )
 
-    the_rnt       = RNT( 4096, total_password,  'desktop', paranoia_level )
+    if len( header_bytes ) != CONTAINER_HEADER_SIZE or \
+       hashlib.sha512( header_bytes[ : -64 ] ).digest() != \
+           header_bytes[ -64 : ] :
+        print( "the header of ", cipher_file_name, " has been corrupted" )
+        sys.exit( 0 )
 
-    the_crypto = CRYPTO( password, system_type, paranoia_level )
-    decode     = the_crypto.next()
+    magic, version, paranoia_level, construction_version, seeding_version, \
+        system_type, segment_size, plain_size, byte_plain_text_digest = \
+        struct.unpack( CONTAINER_HEADER_FORMAT, header_bytes[ : -64 ] )
 
-    # at this point, decode is in the same state as encode, so 
-    # we can decipher with the prng stream.
+    if version != CONTAINER_VERSION :
+        print( "unknown evocrypt container version ", version )
+        sys.exit( 0 )
 
-    # temp code to test that assertion.
-    samint = 0
-    for _ in range( 16 ) :
-        samint  = samint << 8 
-        samint += decode.next( 8, 1 )
+    if construction_version not in ( CRYPTO_CONSTRUCTION_LEGACY,
+                                     CRYPTO_CONSTRUCTION_LEAN ) :
+        print( "unknown crypto construction ", construction_version,
+               " in ", cipher_file_name )
+        sys.exit( 0 )
 
-    # 512 bits in each of 2 hashes is added by encrypt()
-    cipher_byte_count = ( len( cipher_file_data ) - 128 )
+    if seeding_version not in ( LCG_SEEDING_LEGACY, LCG_SEEDING_CHAINED ) :
+        print( "unknown LCG seeding ", seeding_version,
+               " in ", cipher_file_name )
+        sys.exit( 0 )
 
-    decrypted_bytes = bytearray( cipher_byte_count )
-    for i in range( cipher_byte_count ) :
-        # horribly inefficient, but simple, avoids the byte problem
-        decrypted_bytes[ i ] = cipher_file_data[ i + 64 ] ^ decode.next( 8, 1 )
+    header = { 'version'        : version,
+               'paranoia_level' : paranoia_level,
+               'construction'   : construction_version,
+               'seeding'        : seeding_version,
+               'system_type'    : system_type.rstrip( b'\0' ).decode(),
+               'segment_size'   : segment_size,
+               'plain_size'     : plain_size,
+               'plain_digest'   : byte_plain_text_digest,
+               'digest'         : header_bytes[ -64 : ] }
+
+    header[ 'n_segments' ] = ( plain_size + segment_size - 1 ) // segment_size
+
+    expected_size = CONTAINER_HEADER_SIZE + 64 * header[ 'n_segments' ] + \
+                    plain_size
+    if os.path.getsize( cipher_file_name ) != expected_size :
+        print( "the size of ", cipher_file_name, " is wrong, it has been",
+               "truncated or corrupted" )
+        sys.exit( 0 )
 
-    verify_decrypted_bytes( decrypted_bytes, byte_plain_text_digest )
+    return header
 
-    # this should check candidate names, recursively. Wiping out files
-    # by decoding is a real no-no.
-    while i in range( 1000 ) : # vast overkill, necessary for testing
-        candidate_file_name = original_file_name + '.v' + chr( i )
-        if os.path.isfile( candidate_file_name ) :
-            new_file_name = candidate_file_name 
-            break
+def segment_keystream( password, header, segment_index ) :
+    """
+    The crypto PRNG for segment segment_index, built with the header's
+    construction and seeding, whatever this process has set.
+    """
+    construction_version = crypto_construction()
+    seeding_version      = lcg_seeding()
+    set_crypto_construction( header[ 'construction' ] )
+    set_lcg_seeding( header[ 'seeding' ] )
+    try :
+        return CRYPTO( segment_passphrase( password, header[ 'plain_digest' ],
+                                           segment_index ),
+                       header[ 'system_type' ],
+                       header[ 'paranoia_level' ] ).next()
+    finally :
+        set_crypto_construction( construction_version )
+        set_lcg_seeding( seeding_version )
+
+def segment_crypt( password, header, segment_index, in_text ) :
+    """
+    XORs in_text with segment segment_index's keystream, one way
+    is encryption, the other decryption.
+
+    Returns the digest key, the keystream's first SEGMENT_KEY_SIZE
+    bytes, and the xored text.
+    """
+    keystream = bytearray( SEGMENT_KEY_SIZE + len( in_text ) )
+    segment_keystream( password, header, segment_index ).keystream_into(
+        memoryview( keystream ), 1 )
+
+    return bytes( keystream[ : SEGMENT_KEY_SIZE ] ), \
+           xor_combine( in_text, memoryview( keystream )[ SEGMENT_KEY_SIZE : ] )
+
+def encrypt_segment( job ) :
+    """
+    The pool's encryption worker, job is ( plain file name, password,
+    header, segment index ). It reads its own segment, so only the
+    result goes back through the pipe.
+
+    Returns the segment's cipher text and digest.
+    """
+    plain_file_name, password, header, segment_index = job
+
+    segment_size = header[ 'segment_size' ]
+    with open( plain_file_name, 'rb' ) as plain_fd :
+        plain_fd.seek( segment_index * segment_size )
+        plain_text = plain_fd.read( segment_size )
+
+    digest_key, cipher_text = segment_crypt( password, header, segment_index,
+                                             plain_text )
+
+    return cipher_text + segment_digest( digest_key, header[ 'digest' ],
+                                         segment_index, cipher_text )
+
+def decrypt_segment( job ) :
+    """
+    The pool's decryption worker, job is ( cipher file name, password,
+    header, segment index ).
+
+    Returns the plain text, or None if the segment's digest is wrong,
+    the segment was changed or the password is wrong.
+    """
+    cipher_file_name, password, header, segment_index = job
+
+    segment_size = min( header[ 'segment_size' ], header[ 'plain_size' ] -
+                        segment_index * header[ 'segment_size' ] )
+    with open( cipher_file_name, 'rb' ) as cipher_fd :
+        cipher_fd.seek( segment_offset( header, segment_index ) )
+        cipher_text = cipher_fd.read( segment_size )
+        file_digest = cipher_fd.read( 64 )
+
+    digest_key, plain_text = segment_crypt( password, header, segment_index,
+                                            cipher_text )
+    if not hmac.compare_digest( file_digest,
+                                segment_digest( digest_key, header[ 'digest' ],
+                                                segment_index,
+                                                cipher_text ) ) :
+        return None
+
+    return plain_text
+
+def map_in_pool( worker, jobs, n_workers, initializer=None, initargs=() ) :
+    """
+    worker() over jobs, in order, n_workers processes at a time, each
+    one first running initializer( *initargs ). One worker is done in
+    this process, there is nothing to gain from a pool.
+    """
+    if n_workers <= 1 :
+        if initializer is not None :
+            initializer( *initargs )
+        for job in jobs :
+            yield worker( job )
+        return
+
+    with multiprocessing.Pool( n_workers, initializer, initargs ) as the_pool :
+        for result in the_pool.imap( worker, jobs ) :
+            yield result
+
+def encrypt_segments( to_be_encrypted_file_name, encrypted_file_name,
+                      byte_plain_text_digest, password, system_type,
+                      paranoia_level, segment_size=CRYPT_SEGMENT_SIZE,
+                      n_workers=1 ) :
+    """
+    Writes the v2 .evocrypt container, n_workers processes encrypting
+    segments while this one writes them out in order. The segments are
+    built with the crypto construction and LCG seeding set now, and the
+    header says which.
+    """
+    if segment_size < 1 :
+        print( "the segment size must be at least 1 byte" )
+        sys.exit( 0 )
+
+    plain_size   = os.path.getsize( to_be_encrypted_file_name )
+    header_bytes = pack_container_header( paranoia_level, system_type,
+                                          segment_size, plain_size,
+                                          byte_plain_text_digest,
+                                          crypto_construction(),
+                                          lcg_seeding() )
+    header = { 'version'        : CONTAINER_VERSION,
+               'paranoia_level' : paranoia_level,
+               'construction'   : crypto_construction(),
+               'seeding'        : lcg_seeding(),
+               'system_type'    : system_type,
+               'segment_size'   : segment_size,
+               'plain_size'     : plain_size,
+               'plain_digest'   : byte_plain_text_digest,
+               'digest'         : header_bytes[ -64 : ] }
+
+    n_segments = ( plain_size + segment_size - 1 ) // segment_size
+    jobs = [ ( to_be_encrypted_file_name, password, header, segment_index )
+             for segment_index in range( n_segments ) ]
+
+    with open( encrypted_file_name, 'wb' ) as encrypted_fd :
+        encrypted_fd.write( header_bytes )
+        for the_segment in map_in_pool( encrypt_segment, jobs, n_workers ) :
+            encrypted_fd.write( the_segment )
+
+def decrypt_segments( to_be_decrypted_file_name, decrypted_file_name,
+                      password, n_workers=1 ) :
+    """
+    Decrypts a v2 container to decrypted_file_name. Any segment with a
+    bad digest, or plain text that doesn't hash to the header's digest,
+    removes decrypted_file_name again.
+    """
+    header = read_container_header( to_be_decrypted_file_name )
+    jobs   = [ ( to_be_decrypted_file_name, password, header, segment_index )
+               for segment_index in range( header[ 'n_segments' ] ) ]
+
+    plain_hash  = hashlib.sha512()
+    output_file = open( decrypted_file_name, 'wb' )
+    for segment_index, plain_text in \
+        enumerate( map_in_pool( decrypt_segment, jobs, n_workers ) ) :
+        if plain_text is None :
+            output_file.close()
+            os.remove( decrypted_file_name )
+            print( "segment ", segment_index, " has been corrupted, or the "
+                   "password is wrong" )
+            sys.exit( 0 )
+
+        output_file.write( plain_text )
+        plain_hash.update( plain_text )
 
-    output_file = open( new_file_name, 'wb' )
-    output_file.write( decrypted_bytes )
     output_file.close()
 
+    if plain_hash.digest() != header[ 'plain_digest' ] :
+        os.remove( decrypted_file_name )
+        print( "!!!Error, the decryption is invalid!!!" )
+        print( '\nhash of plaintext ',
+               '\nhex   plain digest = ', plain_hash.hexdigest(), '\n\n' )
+        sys.exit( 0 )
+
     return decrypted_file_name
 
+def decrypt_range( to_be_decrypted_file_name, password, first_byte,
+                   n_bytes, n_workers=1 ) :
+    """
+    n_bytes of the plain text from first_byte on, out of a v2 container,
+    without decrypting anything before the segment first_byte is in.
+
+    Each segment's digest is checked, keyed by the password, so a
+    changed segment or a wrong password is caught there.  The plain text
+    digest covers the whole file, so it can't be checked here.
+
+    Returns the bytes, short if the range runs past the end.
+    """
+    if not is_segmented_file( to_be_decrypted_file_name ) :
+        print( "only v2 evocrypt files can be decrypted by range" )
+        sys.exit( 0 )
+
+    header = read_container_header( to_be_decrypted_file_name )
+
+    last_byte    = min( first_byte + n_bytes, header[ 'plain_size' ] )
+    segment_size = header[ 'segment_size' ]
+    if first_byte < 0 or first_byte >= last_byte :
+        return b''
+
+    first_segment = first_byte // segment_size
+    last_segment  = ( last_byte - 1 ) // segment_size
+    jobs = [ ( to_be_decrypted_file_name, password, header, segment_index )
+             for segment_index in range( first_segment, last_segment + 1 ) ]
+
+    plain_text = bytearray()
+    for segment_index, segment_text in \
+        zip( range( first_segment, last_segment + 1 ),
+             map_in_pool( decrypt_segment, jobs, n_workers ) ) :
+        if segment_text is None :
+            print( "segment ", segment_index, " has been corrupted, or the "
+                   "password is wrong" )
+            sys.exit( 0 )
+        plain_text += segment_text
+
+    start = first_byte - first_segment * segment_size
+    return bytes( plain_text[ start : start + last_byte - first_byte ] )
+
+# Batch mode, every file under a directory. Files are spread over a
+# pool of workers, each of which gets the settings and the already
+# checked program hash once, when it starts, instead of every file
+# paying for interpreter startup and the program hash. A file's
+# segments are done in the worker that has the file.
+
+BATCH_SETTINGS = None
+
+def init_batch_worker( password, system_type, paranoia_level, segment_size,
+                       this_file_folded_hash, construction_version,
+                       seeding_version ) :
+    """
+    The pool's initializer, run once in each worker.
+    """
+    global BATCH_SETTINGS
+
+    # a forked worker has it already, a spawned one doesn't
+    set_crypto_construction( construction_version )
+    set_lcg_seeding( seeding_version )
+
+    BATCH_SETTINGS = { 'password'              : password,
+                       'system_type'           : system_type,
+                       'paranoia_level'        : paranoia_level,
+                       'segment_size'          : segment_size,
+                       'this_file_folded_hash' : this_file_folded_hash }
+
+def batch_file( job ) :
+    """
+    The pool's worker, job is ( 'encrypt' or 'decrypt', file name ).
+    Everything a failure prints is kept as its error, rather than being
+    interleaved with the other workers' output.
+
+    Returns ( file name, output file name or None, error or None ).
+    """
+    operation, file_name = job
+
+    messages = io.StringIO()
+    try :
+        with contextlib.redirect_stdout( messages ) :
+            if operation == 'encrypt' :
+                output_name = encrypt_file(
+                    file_name, BATCH_SETTINGS[ 'password' ],
+                    BATCH_SETTINGS[ 'system_type' ],
+                    BATCH_SETTINGS[ 'paranoia_level' ],
+                    segment_size=BATCH_SETTINGS[ 'segment_size' ],
+                    this_file_folded_hash=
+                        BATCH_SETTINGS[ 'this_file_folded_hash' ] )
+            else :
+                output_name = decrypt_file(
+                    file_name, BATCH_SETTINGS[ 'password' ],
+                    BATCH_SETTINGS[ 'system_type' ],
+                    BATCH_SETTINGS[ 'paranoia_level' ] )
+    except SystemExit :
+        return ( file_name, None, messages.getvalue().strip() or 'failed' )
+    except Exception as msg :
+        return ( file_name, None, repr( msg ) )
+
+    return ( file_name, output_name, None )
+
+def batch_file_names( directory_name, operation ) :
+    """
+    The files under directory_name, sorted so every run does them in
+    the same order : .evocrypt files to decrypt, everything else to
+    encrypt.
+    """
+    file_names = []
+    for dir_path, dir_names, names in os.walk( directory_name ) :
+        dir_names.sort()
+        for name in sorted( names ) :
+            full_name = os.path.join( dir_path, name )
+            if not os.path.isfile( full_name ) :
+                continue
+            if name.endswith( '.evocrypt' ) == ( operation == 'decrypt' ) :
+                file_names.append( full_name )
+
+    return file_names
+
+def crypt_directory( operation, directory_name, password, system_type,
+                     paranoia_level, segment_size=CRYPT_SEGMENT_SIZE,
+                     n_workers=1, this_file_folded_hash=None ) :
+    """
+    Encrypts or decrypts, operation 'encrypt' or 'decrypt', every file
+    under directory_name with n_workers processes. A file that fails
+    doesn't stop the others.
+
+    Returns a list of ( file name, output file name, error ) in file
+    name order, see batch_file().
+    """
+    if operation not in ( 'encrypt', 'decrypt' ) :
+        print( "crypt_directory : unknown operation ", operation )
+        sys.exit( 0 )
+
+    if not os.path.isdir( directory_name ) :
+        print( directory_name, " is not a directory" )
+        sys.exit( 0 )
+
+    # checked once here, not once per file
+    if operation == 'encrypt' and this_file_folded_hash is None :
+        this_file_folded_hash = verify_program_hash( sys.argv[ 0 ] )
+
+    jobs = [ ( operation, file_name ) for file_name in
+             batch_file_names( directory_name, operation ) ]
+
+    return list( map_in_pool( batch_file, jobs, n_workers, init_batch_worker,
+                              ( password, system_type, paranoia_level,
+                                segment_size, this_file_folded_hash,
+                                crypto_construction(), lcg_seeding() ) ) )
+
+def report_batch( results ) :
+    """
+    Prints what crypt_directory() did, one line per file and the errors
+    after.
+
+    Returns the number of files that failed.
+    """
+    n_failed = 0
+    for file_name, output_name, error in results :
+        if error is None :
+            print( "ok     ", file_name, " -> ", output_name )
+        else :
+            print( "FAILED ", file_name )
+            n_failed += 1
+
+    for file_name, output_name, error in results :
+        if error is not None :
+            print( "\n", file_name, " :\n", error )
+
+    print( "\n", len( results ) - n_failed, " files done, ", n_failed,
+           " failed" )
+
+    return n_failed
+
 # Unix utility mode can have no checks done, so the burden of making
 # sure operations are correct and files correctly named rests entirely
 # on the user.
 
-def crypt( password, system_type, paranoia_level ) :
+def crypt( password, system_type, paranoia_level,
+           buffer_size=CRYPT_CHUNK_SIZE ) :
     """
     the encryption/decryption function using stdio.
 
@@ -644,10 +1188,13 @@ def crypt( password, system_type, paranoia_level ) :
     sure operations are correct and files correctly named rests entirely
     on the person typing commands.
 
-    This works.
+    This is a binary filter, stdin to stdout buffer_size bytes at a
+    time, so any data works and it runs at about the speed of the
+    keystream. The byte at a time, text layer version was syscall
+    bound and mangled anything not ascii.
     """ 
 
-    the_rnt       = RNT( 4096, password, system_type, paranoia_level )
+    the_rnt       = make_rnt( 4096, password, system_type, paranoia_level )
     sys.stderr.write( "password hash = " + hex( the_rnt.password_hash ) + '\n' )
 
     the_crypto    = CRYPTO( password, system_type, paranoia_level )
@@ -656,29 +1203,17 @@ def crypt( password, system_type, paranoia_level ) :
     # at this point, code_it is in a state entirely determined from the
     # password and RNT.
 
-    bin_vector = array( 'B' )
-    bin_vector.append( 0 )
-             
-    while True:
-        try :
-            in_byte = sys.stdin.read( 1 )
-        except IOError as msg :
-            break
-
-        if len( in_byte ) == 0 :
-            break
+    # the binary layer underneath, unless stdin/stdout are already binary
+    in_file  = getattr( sys.stdin,  'buffer', sys.stdin  )
+    out_file = getattr( sys.stdout, 'buffer', sys.stdout )
 
-        if type( in_byte ) == type( 'a' ) :
-            the_byte = ord( in_byte )
-        else :
-            the_byte = int.from_bytes( in_byte, 'big' )
+    try :
+        crypt_stream( in_file, out_file, crypt_it, None, None, buffer_size,
+                      paranoia_level )
+    except IOError as msg :
+        sys.stderr.write( "crypt : " + str( msg ) + '\n' )
 
-        # horribly inefficient, but simple, avoids the byte problem
-        bin_vector[ 0 ] = the_byte ^ crypt_it.next( 8, paranoia_level )
-        if type( in_byte ) == type( 'a' ) :
-            sys.stdout.write( chr( bin_vector[ 0 ] ) )
-        else :
-            bin_vector.tofile( sys.stdout )
+    out_file.flush()
 
 
 def usage() :
@@ -717,6 +1252,13 @@ def usage() :
         --decrypt <name>
         -d <name>
 
+        --encrypt_dir <directory>
+        --decrypt_dir <directory>
+            Every file under <directory>, .evocrypt files for
+            --decrypt_dir and all the others for --encrypt_dir, one
+            file per --workers process. Each file's result, and the
+            errors of those that failed, are printed at the end.
+
         If neither --encrypt or --decrypt, evocrypt assumes it is being
         used as a standard Unix utility, input via stdin and output via
         stdout. !!!Warning!!! This assumes you know what you are doing,
@@ -732,6 +1274,47 @@ def usage() :
         --paranoia <paranoia_level>
             1, 2, or 3, 3 being maximum paranoia
 
+        --buffer <bytes>
+        -b       <bytes>
+            Unix utility mode reads and writes this many bytes at a
+            time, default 1M.
+
+        --segment_size <bytes>
+            --encrypt writes the file in independently keyed segments of
+            this many bytes, default 256K. Each one costs building a
+            CRYPTO, smaller segments spread better over --workers.
+            Has to come before --encrypt.
+
+        --workers <n>
+            Number of processes encrypting or decrypting segments, or
+            files for --encrypt_dir and --decrypt_dir, default the
+            number of cpus. Has to come before those and --encrypt or
+            --decrypt.
+
+        --construction <legacy or lean>
+            How HashCrypto and PrngCrypto are built. lean skips the
+            vector of LCGs legacy builds and throws away, a different
+            keystream. legacy only skips it with --rnt_cache, when the
+            cache has seen the same password before. --encrypt records
+            it in the file, so decrypting those needs nothing, v1 files
+            and Unix utility mode need the one they were encrypted with.
+            Default legacy. Has to come before --encrypt or --decrypt.
+
+        --seeding <legacy or chained>
+            How every LCG's vector is seeded. chained adds each entry
+            to the hash once rather than hashing all the ones before it
+            again, faster, and a different keystream. --encrypt records
+            it in the file like --construction, v1 files and Unix
+            utility mode need the one they were encrypted with. Default
+            legacy. Has to come before --encrypt or --decrypt.
+
+        --rnt_cache <directory>
+            Keep initialized random number tables and the PRNG constants
+            in <directory>, owner only, so the next run with the same
+            password and settings skips building them. Those files are
+            as good as the password, don't use this where anyone else
+            can get at them. Has to come before --encrypt or --decrypt.
+
         --system_type
         -s           'big', 'desktop', 'laptop', 'cellphone' 
             Any Unix laptop can handle 'big' and maximum_paranoia, it
@@ -783,15 +1366,21 @@ if __name__ == "__main__" :
                       str( sys.argv[ 1 : ] ) + '\n' )
 
     # which ones need an '=' ?
-    SHORT_ARGS     = "a=d=e=g=hn=s=t="
-    LONG_ARGS      = [  'assemble=', 'decrypt=', 'encrypt=', 'generate=',
-                        'help', 'new=', 'paranoia=','password=', 'test=' ]
+    SHORT_ARGS     = "a=b=d=e=g=hn=s=t="
+    LONG_ARGS      = [  'assemble=', 'buffer=', 'construction=', 'decrypt=',
+                        'decrypt_dir=', 'encrypt=', 'encrypt_dir=',
+                        'generate=', 'help', 'new=', 'paranoia=',
+                        'password=', 'rnt_cache=', 'seeding=', 'segment_size=',
+                        'test=', 'workers=' ]
 
     TEST_LIST      = []        # list of tests to execute
     PASSWORD       = ''
     SYSTEM_TYPE    = 'laptop'   # default
     PARANOIA_LEVEL = 1          # default
     FILE_NAME      = ''
+    BUFFER_SIZE    = CRYPT_CHUNK_SIZE
+    SEGMENT_SIZE   = CRYPT_SEGMENT_SIZE
+    N_WORKERS      = os.cpu_count() or 1
 
     try :
         OPTS, ARGS = getopt.getopt( sys.argv[ 1 : ], SHORT_ARGS, LONG_ARGS )
@@ -816,6 +1405,42 @@ if __name__ == "__main__" :
         if o in ( "--paranoia" ) :
             PARANOIA_LEVEL = int( a )
 
+        if o in ( "--buffer" ) or o in ( "-b" ) :
+            BUFFER_SIZE = int( a )
+            if BUFFER_SIZE < 1 :
+                print( "the buffer size must be at least 1 byte" )
+                sys.exit( 0 )
+
+        if o in ( "--segment_size" ) :
+            SEGMENT_SIZE = int( a )
+            if SEGMENT_SIZE < 1 :
+                print( "the segment size must be at least 1 byte" )
+                sys.exit( 0 )
+
+        if o in ( "--workers" ) :
+            N_WORKERS = int( a )
+            if N_WORKERS < 1 :
+                print( "there must be at least 1 worker" )
+                sys.exit( 0 )
+
+        if o in ( "--construction" ) :
+            if a not in CRYPTO_CONSTRUCTIONS :
+                print( "--construction is one of ",
+                       ', '.join( sorted( CRYPTO_CONSTRUCTIONS ) ) )
+                sys.exit( 0 )
+            set_crypto_construction( CRYPTO_CONSTRUCTIONS[ a ] )
+
+        if o in ( "--seeding" ) :
+            if a not in LCG_SEEDINGS :
+                print( "--seeding is one of ",
+                       ', '.join( sorted( LCG_SEEDINGS ) ) )
+                sys.exit( 0 )
+            set_lcg_seeding( LCG_SEEDINGS[ a ] )
+
+        if o in ( "--rnt_cache" ) :
+            set_rnt_cache( a )
+            set_constants_cache( a )
+
         # note these options are sensitive to order, so new has to come
         # after password and paranoia level
 
@@ -848,7 +1473,20 @@ if __name__ == "__main__" :
             if not PASSWORD :
                 print( "you must specify the password before decryption")
                 sys.exit( 0 )
-            decrypt_file( FILE_NAME, PASSWORD, SYSTEM_TYPE, PARANOIA_LEVEL )
+            decrypt_file( FILE_NAME, PASSWORD, SYSTEM_TYPE, PARANOIA_LEVEL,
+                          n_workers=N_WORKERS )
+            sys.exit( 0 )
+
+        if o in ( "--encrypt_dir", "--decrypt_dir" ) :
+            if not PASSWORD :
+                print( "you must specify the password before", o )
+                sys.exit( 0 )
+            OPERATION = 'encrypt' if o == "--encrypt_dir" else 'decrypt'
+            RESULTS   = crypt_directory( OPERATION, a, PASSWORD, SYSTEM_TYPE,
+                                         PARANOIA_LEVEL, SEGMENT_SIZE,
+                                         N_WORKERS )
+            if report_batch( RESULTS ) :
+                sys.exit( -1 )
             sys.exit( 0 )
 
         if o in ( "--encrypt" ) or o in ( "-e" ) :
@@ -856,7 +1494,8 @@ if __name__ == "__main__" :
             if not PASSWORD :
                 print( "you must specify the password before encryption")
                 sys.exit( 0 )
-            encrypt_file( FILE_NAME, PASSWORD, SYSTEM_TYPE, PARANOIA_LEVEL )
+            encrypt_file( FILE_NAME, PASSWORD, SYSTEM_TYPE, PARANOIA_LEVEL,
+                          segment_size=SEGMENT_SIZE, n_workers=N_WORKERS )
             sys.exit( 0 )
 
 #SINGLE_PROGRAM_TO_HERE
@@ -913,7 +1552,7 @@ if __name__ == "__main__" :
     # ./evocrypt.py --password umberalertness < TODO.crypt > TODO.new \
     # 2> TD.stderr
 
-    crypt( PASSWORD, SYSTEM_TYPE, PARANOIA_LEVEL )
+    crypt( PASSWORD, SYSTEM_TYPE, PARANOIA_LEVEL, BUFFER_SIZE )
 
     sys.exit( 0 )
 #SINGLE_PROGRAM_TO_HERE
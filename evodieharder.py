@@ -4,14 +4,28 @@
 """
 evodieharder.py
 
-This controls dieharder to manage long-running tests.  
+This controls dieharder to manage long-running tests.
 
 It is part of a final acceptance test.
 
 This design runs evocrypt and dieharder as subprocesses.
 
+Every generator's output is written to a file once, and every dieharder
+test reads that file, '-g 201 -f <file>', instead of each one running
+its own generator into a pipe. Those are all jobs for a small
+scheduler, which keeps --cores of them running, starts a dieharder
+job as soon as its file is there, kills jobs that run past --timeout
+and runs failed ones again up to --retries times.
+
+With --corpus <directory>, the evoemit.py generators' files are kept
+in an evocorpus.py store instead, generated once for any number of
+runs and extended when more --bytes are wanted.
+
+The results, the p-value and PASSED/WEAK/FAILED of every test, are
+written to <summary>.json and <summary>.csv.
+
 """
-__version__   = "0.1"
+__version__   = "0.3"
 __revision__  = "$Id$"
 __date__      = "2018-04-27"
 __author__    = "nobody@nowhere.com"
@@ -20,125 +34,456 @@ __license__   = "None"
 __filename__  = "evodieharder.py"
 __history__   = """
 0.1 - 20180427 - started this file
+0.2 - 20261018 - a scheduler over generator files and dieharder jobs
+0.3 - 20261018 - --corpus, generator files from the evocorpus.py store
 """
 
 import os
 import sys
 import getopt
 import time
-import multiprocessing as mp
+import json
+import csv
+import queue
+import threading
+import subprocess
+from evocorpus import corpus_file_name
 
 #
 
+GROUP_TO_FILE_NAMES = { 'fold'     : 'evofolds' ,
+                        'hash'     : 'evohashes',
+                        'rtn'      : 'evornt'   ,
+                        'prime'    : 'evoprimes',
+                        'prng'     : 'evoprngs' ,
+                        'cprng'    : 'evocprngs',
+                        'utils'    : 'evoutils' ,
+                        'evocrypt' : 'evocrypt' ,
+                       }
+EVOCRYPT_GROUPS     = {
+                        'fold'     : [ 'xor0', 'xor1', 'xadd0', 'xadd1' ],
+                        'hash'     : [ 'hash0', 'hash1', 'next' ],
+                        'rtn'      : [ 'wichman', 'randint', 'randint1',
+                                       'randint2', 'next_random_value' ],
+                        'prime'    : [],
+                        'prng'     : [ 'lcg', 'well512', 'newlib', 'knuth',
+                                       'lp5', 'lp256', 'cmwc4096', 'lfsr' ],
+                        'cprng'    : [ 'lcg_crypto', 'prng_crypto',
+                                       'hash_crypto', 'encode2'],
+                        'utils'    : [],
+                        'evocrypt' : [],
+                       }
+
+# tests evoemit.py has a generator for, the others are the module's own
+# '--test <name>' and the first bytes of what it writes
+EMIT_GENERATORS = [ 'lcg', 'newlib', 'knuth', 'lp5', 'lp256', 'cmwc4096',
+                    'lcg_crypto', 'prng_crypto', 'hash_crypto' ]
+
+DIEHARDER_ASSESSMENTS = [ 'PASSED', 'WEAK', 'FAILED' ]
+
+# the generators are found next to this file, wherever it is run from
+PROGRAM_DIRECTORY = os.path.dirname( os.path.abspath( __file__ ) )
 
-def construct_dieharder_command( dtest_list, the_group, the_test ) :
+def test_to_group( groups, the_test ) :
     """
-    Constructs the diehardervocrypt component of the total command
-    dieharder -d x -d y -d z -g 200 -p <p_samples> -t <t_samples> >
-    <group>_<test>.stdout 2> <group>_<test>.stderr
+    Searches the EVOCRYPT_GROUP dictonary for the tests.
+    Inefficent, but who cares?
     """
-    the_command = 'dieharder '
-    if 'all' in dtest_list : # ignore any other dieharder test numbers
-        the_command += '-a -g 200 ' 
-    else :
-        the_command += '-g 200 ' 
-        for the_dtest in dtest_list :
-            the_command += ' -d ' + the_dtest
 
-    # Dieharder man page warns against changing these unless you know
-    # what you are doing. I don't.
-#    the_command += ' -p '     + str( p_samples ) + ' -t ' + str( t_samples )
-    the_command += ' >> '     + the_group + '_' + the_test + '.stdout'
-    the_command += ' 2> '     + the_group + '_' + the_test + '.stderr;'
-    the_command += 'date >> ' + the_group + '_' + the_test + '.stdout' 
-
-    return the_command
+    for the_group in groups :
+        if the_test in groups[ the_group ] :
+            return the_group # == the base file name
+    return None
 
-def construct_command( the_test ) :
+class Job() :
     """
-    Constructs the evocrypt component of the total command
-    ./<name>.py --password umberalertness --test <the_test>
+    One command for the scheduler, a generator or a dieharder test.
 
-    The global variables are semi-permissible in a small program.
+    stdout_name and stderr_name are files for the command's output.
+    With stdout_limit, the command is stopped once that many bytes of
+    stdout are written, a generator that would go forever, and that is
+    success. Fewer bytes than that is a failure, whatever the exit
+    status, as is an output_name file shorter than output_size bytes
+    for a command that writes its own file.
+
+    state is 'waiting', 'running', 'passed', 'failed' or 'skipped',
+    skipped when a job it depends on failed.
     """
-    the_command = ''
-    the_group = test_to_group( EVOCRYPT_GROUPS, the_test )
-    stdout_file_name = the_group + '_' + the_test + '.stdout'
-    the_command += 'date >> ' + stdout_file_name + ';./' 
-    the_command += GROUP_TO_FILE_NAMES[ the_group ] + '.py '
-    the_arguments = '--password umberallert --test ' + the_test
+    def __init__( self, name, command, depends=(), timeout=None, retries=0,
+                  stdout_name=None, stderr_name=None, stdout_limit=None,
+                  output_name=None, output_size=None ) :
+        self.name         = name
+        self.command      = command
+        self.depends      = list( depends )
+        self.timeout      = timeout
+        self.retries      = retries
+        self.stdout_name  = stdout_name
+        self.stderr_name  = stderr_name
+        self.stdout_limit = stdout_limit
+        self.output_name  = output_name
+        self.output_size  = output_size
+
+        self.state        = 'waiting'
+        self.attempts     = 0
+        self.returncode   = None
+        self.message      = ''
+        self.process      = None
+        self.deadline     = None
+        self.timed_out    = False
+        self.seconds      = 0.0
+
+def short_output( n_bytes, expected_bytes ) :
+    """
+    The message for a job that wrote less than expected_bytes.
+    """
+    return 'short output, ' + str( n_bytes ) + ' of ' + \
+           str( expected_bytes ) + ' bytes'
 
-    the_arguments += ' 2> ' + GROUP_TO_FILE_NAMES[ the_group ]
-    the_arguments += '_' + the_test + '.stderr'
-    the_arguments += ' | ' + construct_dieharder_command( DIEHARDER_TEST_LIST,
-                                        the_group, the_test )
-        
+def wait_for_job( job, events ) :
+    """
+    The thread watching one job's process, which tells the scheduler
+    when it ends with ( job, returncode ) on events. The scheduler
+    blocks on events instead of polling the processes.
+    """
+    process    = job.process
+    returncode = None
+    if job.stdout_limit is not None :
+        bytes_left = job.stdout_limit
+        with open( job.stdout_name, 'wb' ) as stdout_file :
+            while bytes_left > 0 :
+                the_chunk = process.stdout.read( min( bytes_left, 1 << 20 ) )
+                if not the_chunk :
+                    break
+                stdout_file.write( the_chunk )
+                bytes_left -= len( the_chunk )
+
+        if bytes_left == 0 :
+            # it would write forever, this was all that was wanted
+            process.kill()
+            returncode = 0
+        process.stdout.close()
+
+    process_returncode = process.wait()
+    if returncode is None :
+        returncode = process_returncode
+
+    # dieharder would run on whatever there is, argument echo or a
+    # part of a file, and pass
+    if returncode == 0 and job.stdout_limit is not None and bytes_left > 0 :
+        job.message = short_output( job.stdout_limit - bytes_left,
+                                    job.stdout_limit )
+        returncode  = -1
+    elif returncode == 0 and job.output_size is not None :
+        n_bytes = 0
+        if os.path.exists( job.output_name ) :
+            n_bytes = os.path.getsize( job.output_name )
+        if n_bytes < job.output_size :
+            job.message = short_output( n_bytes, job.output_size )
+            returncode  = -1
+
+    events.put( ( job, returncode ) )
+
+def start_job( job, events ) :
+    """
+    Starts job's command and the thread waiting for it.
+    """
+    job.attempts += 1
+    job.state     = 'running'
+    job.timed_out = False
+    job.message   = ''
+
+    if job.stdout_limit is not None :
+        stdout_file = subprocess.PIPE
+    elif job.stdout_name :
+        stdout_file = open( job.stdout_name, 'wb' )
+    else :
+        stdout_file = subprocess.DEVNULL
 
-    return the_command + the_arguments, stdout_file_name
+    stderr_file = subprocess.DEVNULL
+    if job.stderr_name :
+        stderr_file = open( job.stderr_name, 'ab' )
 
-def test_to_group( groups, the_test ) :
+    job.seconds = time.time()
+    try :
+        job.process = subprocess.Popen( job.command, stdout=stdout_file,
+                                        stderr=stderr_file )
+    except OSError as msg :
+        job.message = str( msg )
+        events.put( ( job, -1 ) )
+        return
+    finally :
+        # the child has its own copies
+        if stdout_file not in ( subprocess.PIPE, subprocess.DEVNULL ) :
+            stdout_file.close()
+        if stderr_file is not subprocess.DEVNULL :
+            stderr_file.close()
+
+    job.deadline = None
+    if job.timeout :
+        job.deadline = time.time() + job.timeout
+
+    threading.Thread( target=wait_for_job, args=( job, events ),
+                      daemon=True ).start()
+
+def run_jobs( jobs, n_cores, report_file=None ) :
     """
-    Searches the EVOCRYPT_GROUP dictonary for the tests.
-    Inefficent, but who cares?
+    Runs jobs, n_cores at a time, in the order given except that a job
+    waits for the jobs it depends on. Every job ends 'passed',
+    'failed' or 'skipped'.
+
+    Returns jobs.
     """
+    if report_file is None :
+        report_file = sys.stderr
+
+    jobs_by_name = { job.name : job for job in jobs }
+    waiting      = list( jobs )
+    running      = []
+    events       = queue.Queue()
+
+    while waiting or running :
+        # start whatever is ready, as long as there are free cores
+        for job in list( waiting ) :
+            dependencies = [ jobs_by_name[ name ] for name in job.depends ]
+            if any( dependency.state in ( 'failed', 'skipped' )
+                    for dependency in dependencies ) :
+                job.state   = 'skipped'
+                job.message = 'a job it depends on failed'
+                waiting.remove( job )
+                continue
+
+            if len( running ) >= n_cores :
+                continue
+
+            if all( dependency.state == 'passed'
+                    for dependency in dependencies ) :
+                waiting.remove( job )
+                running.append( job )
+                start_job( job, events )
+                report_file.write( "started  " + job.name + " attempt " +
+                                   str( job.attempts ) + '\n' )
+
+        if not running :
+            # only jobs waiting on jobs that aren't there
+            for job in waiting :
+                job.state   = 'skipped'
+                job.message = 'depends on a job that never ran'
+            break
+
+        deadlines = [ job.deadline for job in running if job.deadline ]
+        wait_time = None
+        if deadlines :
+            wait_time = max( 0.0, min( deadlines ) - time.time() )
 
-    for the_group in groups :
-        if the_test in groups[ the_group ] :
-            return the_group # == the base file name
-    return None
+        try :
+            job, returncode = events.get( timeout=wait_time )
+        except queue.Empty :
+            now = time.time()
+            for job in running :
+                if job.deadline and job.deadline <= now and \
+                   not job.timed_out :
+                    job.timed_out = True
+                    job.deadline  = None
+                    job.process.kill()
+            continue
+
+        running.remove( job )
+        job.returncode = returncode
+        job.seconds    = time.time() - job.seconds
+        if returncode == 0 and not job.timed_out :
+            job.state = 'passed'
+        else :
+            if job.timed_out :
+                job.message = 'timed out after ' + str( job.timeout ) + \
+                              ' seconds'
+            elif not job.message :
+                job.message = 'exit status ' + str( returncode )
+
+            if job.attempts <= job.retries :
+                job.state = 'waiting'
+                waiting.insert( 0, job )
+            else :
+                job.state = 'failed'
+
+        report_file.write( ' '.join( [ job.state.ljust( 8 ), job.name,
+                                       job.message ] ).rstrip() + '\n' )
+        report_file.flush()
+
+    return jobs
 
-def execute_command_in_forked_process( the_command_and_arguments, the_queue  ) :
+def generator_command( the_test, password, n_bytes, file_name,
+                       corpus_dir=None ) :
     """
-    No comment needed with an excellent name like that!
+    The command writing the_test's output, and the number of bytes to
+    take from its stdout, None if it writes file_name itself.
+    With corpus_dir, file_name is the corpus's and the command only
+    generates what isn't there already.
+    """
+    if the_test in EMIT_GENERATORS and corpus_dir :
+        return ( [ sys.executable,
+                   os.path.join( PROGRAM_DIRECTORY, 'evocorpus.py' ),
+                   '--directory', corpus_dir, '-g', the_test,
+                   '-p', password, '-n', str( n_bytes ) ],
+                 None )
+
+    if the_test in EMIT_GENERATORS :
+        return ( [ sys.executable,
+                   os.path.join( PROGRAM_DIRECTORY, 'evoemit.py' ),
+                   '-g', the_test, '-p', password, '-n', str( n_bytes ),
+                   '-o', file_name ],
+                 None )
 
-    Too bad pylint doesn't like it.
+    the_group = test_to_group( EVOCRYPT_GROUPS, the_test )
+    return ( [ sys.executable,
+               os.path.join( PROGRAM_DIRECTORY,
+                             GROUP_TO_FILE_NAMES[ the_group ] + '.py' ),
+               '--password', password, '--test', the_test ],
+             n_bytes )
 
-    This begins the forked process. Os.System executes the command. This
-    does not need the capabilities of subprocess.
+def construct_dieharder_command( dieharder_command, the_dtest, file_name ) :
+    """
+    dieharder reading file_name as raw binary, -g 201, one test or,
+    for 'all', every one.
     """
+    the_command = list( dieharder_command )
+    if the_dtest == 'all' :
+        the_command += [ '-a' ]
+    else :
+        the_command += [ '-d', the_dtest ]
 
-    try :
-        os.system( the_command_and_arguments )
+    return the_command + [ '-g', '201', '-f', file_name ]
 
-    except : # catch *all* exceptions
-        the_error = sys.exc_info()[ 0 ]
-        sys.stderr.write( "os.system() failed", str( the_error ) )
-        the_queue.put( the_error )
+def make_jobs( test_list, dtest_list, password, n_bytes, directory,
+               dieharder_command=( 'dieharder', ), timeout=None,
+               retries=0, corpus_dir=None ) :
+    """
+    The generator job for each test, then the dieharder job for each
+    test and dieharder test, which waits for its generator.
 
-    sys.stderr.write( "execution is DONE\n\n" + the_command_and_arguments \
-                    + '\n\n' )
-    the_queue.put( "execution is DONE : " + the_command_and_arguments + '\n\n' )
-    time.sleep( 5 )
-    sys.exit( 0 )
+    Generator files go in directory, or in the corpus_dir store for the
+    generators evoemit.py has.
+    """
+    if 'all' in dtest_list : # ignore any other dieharder test numbers
+        dtest_list = [ 'all' ]
+
+    generator_jobs = []
+    dieharder_jobs = []
+    for the_test in test_list :
+        the_group = test_to_group( EVOCRYPT_GROUPS, the_test )
+        base_name = os.path.join( directory, the_group + '_' + the_test )
+        file_name = base_name + '.bin'
+        stdout_name = file_name
+        if corpus_dir and the_test in EMIT_GENERATORS :
+            file_name   = corpus_file_name( the_test, password,
+                                            corpus_dir=corpus_dir )
+            # evocorpus.py prints the file name
+            stdout_name = base_name + '.corpus'
+
+        command, stdout_limit = generator_command( the_test, password,
+                                                   n_bytes, file_name,
+                                                   corpus_dir )
+        generator_job = Job( 'generate ' + the_test, command,
+                             timeout=timeout, retries=retries,
+                             stdout_name=stdout_name,
+                             stderr_name=base_name + '.generate.stderr',
+                             stdout_limit=stdout_limit )
+        if stdout_limit is None :
+            # evoemit.py rounds up to whole integers, a corpus may
+            # already be longer
+            generator_job.output_name = file_name
+            generator_job.output_size = n_bytes
+        generator_job.the_test = the_test
+        generator_jobs.append( generator_job )
 
+        for the_dtest in dtest_list :
+            dieharder_job = Job( 'dieharder ' + the_test + ' ' + the_dtest,
+                                 construct_dieharder_command(
+                                     dieharder_command, the_dtest,
+                                     file_name ),
+                                 depends=[ generator_job.name ],
+                                 timeout=timeout, retries=retries,
+                                 stdout_name=base_name + '_' + the_dtest +
+                                             '.stdout',
+                                 stderr_name=base_name + '_' + the_dtest +
+                                             '.stderr' )
+            dieharder_job.the_test  = the_test
+            dieharder_job.the_dtest = the_dtest
+            dieharder_jobs.append( dieharder_job )
+
+    return generator_jobs + dieharder_jobs
+
+def parse_dieharder_output( the_text ) :
+    """
+    The result lines of dieharder's table,
+        test_name   |ntup| tsamples |psamples|  p-value |Assessment
+        diehard_birthdays|   0|       100|     100|0.91234567|  PASSED
 
-def monitor_processes( process_and_queue_list ) :
+    Returns a list of dictionaries of those.
     """
-    Checks all the queues, displays information from each.
-    Checks all processes, says they closed if they close.
+    results = []
+    for the_line in the_text.splitlines() :
+        fields = [ field.strip() for field in the_line.split( '|' ) ]
+        if len( fields ) != 6 or fields[ 5 ] not in DIEHARDER_ASSESSMENTS :
+            continue
+        try :
+            p_value = float( fields[ 4 ] )
+        except ValueError :
+            continue
 
-    Knowing the files are dieharder output, we could check for too many
-    failures and know to stop the process?
+        results.append( { 'test_name'  : fields[ 0 ],
+                          'ntup'       : fields[ 1 ],
+                          'tsamples'   : fields[ 2 ],
+                          'psamples'   : fields[ 3 ],
+                          'p_value'    : p_value,
+                          'assessment' : fields[ 5 ] } )
 
-    That would be getting lost in your testing process, however.
+    return results
+
+def summarize_jobs( jobs ) :
+    """
+    One row per dieharder result line, or one row for a dieharder job
+    that didn't produce any, with the job's state and message.
     """
-    while True :
-        for this_tuple in process_and_queue_list :
-            the_process = this_tuple[ 0 ]
-            the_queue   = this_tuple[ 1 ]
-            if not the_queue.empty() :
-                the_message = the_queue.get_nowait()
-
-                if 'DONE'  in the_message :
-                    sys.stderr.write( 'Found DONE : ' + str( this_tuple) + '\n')
-                    the_process.join()
-                    
-                    # remove this tuple from the list
-                    process_and_queue_list.remove( this_tuple )
-
-                    # we have an empty slot in the process list
-                    return
-        time.sleep( 1 )
+    rows = []
+    for job in jobs :
+        if not hasattr( job, 'the_dtest' ) :
+            continue
+
+        results = []
+        if job.state == 'passed' and os.path.exists( job.stdout_name ) :
+            with open( job.stdout_name, 'r', errors='replace' ) as the_file :
+                results = parse_dieharder_output( the_file.read() )
+
+        the_row = { 'generator'  : job.the_test,
+                    'dieharder'  : job.the_dtest,
+                    'state'      : job.state,
+                    'attempts'   : job.attempts,
+                    'message'    : job.message }
+        if not results :
+            rows.append( dict( the_row, test_name='', ntup='',
+                               tsamples='', psamples='', p_value=None,
+                               assessment='' ) )
+        for the_result in results :
+            rows.append( dict( the_row, **the_result ) )
+
+    return rows
+
+SUMMARY_FIELDS = [ 'generator', 'dieharder', 'state', 'attempts',
+                   'test_name', 'ntup', 'tsamples', 'psamples', 'p_value',
+                   'assessment', 'message' ]
+
+def write_summary( rows, base_name ) :
+    """
+    rows from summarize_jobs() to base_name.json and base_name.csv.
+    """
+    with open( base_name + '.json', 'w' ) as json_file :
+        json.dump( rows, json_file, indent=1 )
+
+    with open( base_name + '.csv', 'w', newline='' ) as csv_file :
+        writer = csv.DictWriter( csv_file, fieldnames=SUMMARY_FIELDS )
+        writer.writeheader()
+        for the_row in rows :
+            writer.writerow( the_row )
 
 def usage() :
     """
@@ -146,14 +491,14 @@ def usage() :
     """
     usage_info = """
     --cores
-    -c      Number of cores to be dedicated to the test.
-            Default is currently 4
+    -c      Number of jobs, generators and dieharder tests, run at once.
+            Default is the number of cores.
 
-    --dieharder  
+    --dieharder
     -d      Dieharder test numbers put on the list.
             Defaults to 'all'
 
-    --evocrypt  
+    --evocrypt
     -e      Evocrypt individual test names put on the list.
             This allows control of individual test within a module.
 
@@ -165,6 +510,33 @@ def usage() :
             If you specify 'all', additional tests will be executed
             twice.
 
+    --bytes <n>
+            Bytes of each generator's output written to its file, and
+            read by every dieharder test of it, default 100M.
+
+    --password <password>
+            Password of the generators.
+
+    --timeout <seconds>
+            A job running longer is killed and counts as failed.
+
+    --retries <n>
+            Times a failed job is run again, default 0.
+
+    --directory <name>
+            Where the generator files and dieharder output go.
+
+    --corpus <directory>
+            Generator files from the evocorpus.py store in directory,
+            made once and reused by later runs.
+
+    --summary <name>
+            Results to <name>.json and <name>.csv, default
+            evodieharder_summary.
+
+    --dieharder_command <command>
+            Instead of 'dieharder', a stand-in for testing.
+
     --help  Invokes this usage function
     -h      Invokes this usage function
 
@@ -174,54 +546,28 @@ def usage() :
     """
     print( usage_info )
 
-MAX_SIMULTANEOUS_TESTS = 4      # number of cores to be used in this test
-
-# These should be imported from the modules.
-EVOCRYPT_TESTS = []
-HASH_TESTS     = [ 'hash0', 'hash1' ]
-FOLD_TESTS     = []
-PRIME_TESTS    = []
-RNT_TESTS      = []
-PRNG_TESTS     = []
-CPRNG_TESTS    = []
-
 # main begins here, generally test code for the module.
 
 if __name__ == "__main__" :
 
-    SHORT_ARGS = "c=d=e=g=hm="
-    LONG_ARGS  = [  'cores=', 'evocrypt=', 'dieharder=', 'help' ,
-                    'password=', 'test=', 'group=', 'max_tests='  ]
-    
-#    print( '#' + __filename__ )
-#    print( '#' + __version__ )
-#    print('#' + str( sys.argv[ 1 : ] ) )
-    
-    DIEHARDER_TEST_LIST = [] 
+    SHORT_ARGS = "c:d:e:g:hm:"
+    LONG_ARGS  = [  'bytes=', 'cores=', 'corpus=', 'dieharder=',
+                    'dieharder_command=', 'directory=', 'evocrypt=',
+                    'group=', 'help', 'max_tests=', 'password=',
+                    'retries=', 'summary=', 'timeout=' ]
+
+    DIEHARDER_TEST_LIST = []
     EVOCRYPT_GROUP_LIST = []
     EVOCRYPT_TEST_LIST  = []
-    GROUP_TO_FILE_NAMES = { 'fold'     : 'evofolds' ,
-                            'hash'     : 'evohashes',
-                            'rtn'      : 'evornt'   ,
-                            'prime'    : 'evoprimes',
-                            'prng'     : 'evoprngs' ,
-                            'cprng'    : 'evocprngs',
-                            'utils'    : 'evoutils' ,
-                            'evocrypt' : 'evocrypt' ,
-                           }
-    EVOCRYPT_GROUPS     = { 
-                            'fold'     : [ 'xor0', 'xor1', 'xadd0', 'xadd1' ],
-                            'hash'     : [ 'hash0', 'hash1', 'next' ],
-                            'rtn'      : [ 'wichman', 'randint', 'randint1',
-                                           'randint2', 'next_random_value' ],
-                            'prime'    : [],
-                            'prng'     : [ 'lcg', 'well512', 'newlib', 'knuth',
-                                           'lp5', 'lp256', 'cmwc4096', 'lfsr' ],
-                            'cprng'    : [ 'lcg_crypto', 'prng_crypto',
-                                           'hash_crypto', 'encode2'],
-                            'utils'    : [],
-                            'evocrypt' : [],
-                           }
+    N_CORES             = os.cpu_count() or 1
+    N_BYTES             = 100 * 1024 * 1024
+    PASSWORD            = 'umberallert'
+    TIMEOUT             = None
+    RETRIES             = 0
+    DIRECTORY           = '.'
+    CORPUS_DIR          = None
+    SUMMARY_NAME        = 'evodieharder_summary'
+    DIEHARDER_COMMAND   = [ 'dieharder' ]
 
     # User can specify 'all' for both tests and groups
     # in which case, construct the lists below
@@ -230,27 +576,26 @@ if __name__ == "__main__" :
 
     try :
         OPTS, ARGS = getopt.getopt( sys.argv[ 1 : ], SHORT_ARGS, LONG_ARGS )
-    
+
     except getopt.GetoptError as err :
         print( "getopt.GetoptError = ", err )
         sys.exit( -2 )
-    
+
     for o, a in OPTS :
-#        print( "o = '" + o + "' a = '" + a )
-        if o in ( "--cores" ) or o in ( '-c' ) :
-            MAX_SIMULTANEOUS_TESTS = int( a )
+        if o in ( "--cores", "-c", "--max_tests", "-m" ) :
+            N_CORES = int( a )
 
-        if o in ( "--help" ) or o in ( "-h" ) :
+        if o in ( "--help", "-h" ) :
             usage()
             sys.exit( -2 )
-    
-        if o in ( "--dieharder" ) or o in ( '-d' ) :
+
+        if o in ( "--dieharder", "-d" ) :
             DIEHARDER_TEST_LIST.append( a )
 
-        if o in ( "--evocrypt" ) or o in ( "-e" ) :
+        if o in ( "--evocrypt", "-e" ) :
             EVOCRYPT_TEST_LIST.append( a )
 
-        if o in ( "--group" ) or o in ( '-g' ) :
+        if o in ( "--group", "-g" ) :
             if a == 'all' :
                 EVOCRYPT_GROUP_LIST = list( EVOCRYPT_GROUPS.keys() )
             elif a in EVOCRYPT_GROUPS :
@@ -258,66 +603,60 @@ if __name__ == "__main__" :
             else :
                 print( "incorrect group", a )
                 sys.exit( 0 )
-    
+
             print( "EVOCRYPT_GROUP_LIST = ", EVOCRYPT_GROUP_LIST )
 
-        if o in ( "--max_tests") or o in ( "-m" ) :
-            MAX_SIMULTANEOUS_TESTS = int( a )
-    
-    if EVOCRYPT_GROUP_LIST :
-        # Construct the list of tests
-        for THIS_GROUP in list( EVOCRYPT_GROUPS.keys() ) :
-            for THIS_TEST in EVOCRYPT_GROUPS[ THIS_GROUP ] :
-                EVOCRYPT_TEST_LIST.append( THIS_TEST )
-    
-    # construct the dieharder command
-    # command   = 'dieharder'
-    # arguments = "-d 1 -g 200 -p 100 -t 100" 
-
-    mp.set_start_method( 'fork' )
-
-    # now apply dieharder to each of the necessary tests
-    PROCESS_AND_QUEUES = [ ]    # tuples of process and queue
-    CURRENT_N_TESTS    = 0
-    for THIS_TEST in EVOCRYPT_TEST_LIST :
-        sys.stderr.write('THIS_TEST = ' + THIS_TEST + "'\n")
-        THE_COMMAND, STDOUT_FILE_NAME = construct_command( THIS_TEST )
+        if o == "--bytes" :
+            N_BYTES = int( a )
 
-        STDOUT_FILE = open( STDOUT_FILE_NAME, 'w' )
-        STDOUT_FILE.write( THE_COMMAND + '\n\n' )
-        STDOUT_FILE.close()
+        if o == "--password" :
+            PASSWORD = a
 
-        THE_QUEUE = mp.Queue()
+        if o == "--timeout" :
+            TIMEOUT = float( a )
 
-#        class multiprocessing.Process( group=None, target=None,
-#                                       name=None, args=(), kwargs={}, *,
-#                                       daemon=None)
+        if o == "--retries" :
+            RETRIES = int( a )
 
-        try :
-            THE_PROCESS = mp.Process(
-                        target = execute_command_in_forked_process,
-                        args = ( THE_COMMAND, THE_QUEUE ) )
-        except : # catch *all* exceptions
-            e = sys.exc_info()[ 0 ]
+        if o == "--directory" :
+            DIRECTORY = a
 
-        try :
-            THE_PROCESS.start()
-        except : # catch *all* exceptions
-            e = sys.exc_info()[ 0 ]
+        if o == "--corpus" :
+            CORPUS_DIR = a
 
-        PROCESS_AND_QUEUES.append( ( THE_PROCESS, THE_QUEUE ) )
+        if o == "--summary" :
+            SUMMARY_NAME = a
 
-        CURRENT_N_TESTS += 1
-        if CURRENT_N_TESTS < MAX_SIMULTANEOUS_TESTS :
-            monitor_processes( PROCESS_AND_QUEUES )
+        if o == "--dieharder_command" :
+            DIEHARDER_COMMAND = a.split()
 
-            # Monitor doesn't return until a process has ended
-            sys.stderr.write( "Monitor_processes has returned\n" )
-            CURRENT_N_TESTS -= 1
+    # Construct the list of tests, groups first
+    GROUP_TESTS = []
+    for THIS_GROUP in EVOCRYPT_GROUP_LIST :
+        GROUP_TESTS += EVOCRYPT_GROUPS[ THIS_GROUP ]
+    EVOCRYPT_TEST_LIST = GROUP_TESTS + EVOCRYPT_TEST_LIST
 
-    # if there are no more tests, wait for all processes to finish
-    while CURRENT_N_TESTS > 0 :
-        monitor_processes( PROCESS_AND_QUEUES )
-        CURRENT_N_TESTS -= 1
+    for THIS_TEST in EVOCRYPT_TEST_LIST :
+        if test_to_group( EVOCRYPT_GROUPS, THIS_TEST ) is None :
+            print( "unknown evocrypt test ", THIS_TEST )
+            sys.exit( 0 )
+
+    if not DIEHARDER_TEST_LIST :
+        DIEHARDER_TEST_LIST = [ 'all' ]
+
+    JOBS = make_jobs( EVOCRYPT_TEST_LIST, DIEHARDER_TEST_LIST, PASSWORD,
+                      N_BYTES, DIRECTORY, DIEHARDER_COMMAND, TIMEOUT,
+                      RETRIES, CORPUS_DIR )
+    run_jobs( JOBS, N_CORES )
+
+    ROWS = summarize_jobs( JOBS )
+    write_summary( ROWS, SUMMARY_NAME )
+
+    for THE_ASSESSMENT in DIEHARDER_ASSESSMENTS :
+        print( THE_ASSESSMENT, len( [ THE_ROW for THE_ROW in ROWS
+                                      if THE_ROW[ 'assessment' ] ==
+                                         THE_ASSESSMENT ] ) )
+    print( "jobs failed", len( [ JOB for JOB in JOBS
+                                 if JOB.state != 'passed' ] ) )
 
     sys.exit( 0 )
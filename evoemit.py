@@ -0,0 +1,327 @@
+#!/usr/bin/python3
+
+"""
+evoemit.py
+
+Writes the output of any of the evo generators as raw binary, for
+dieharder and anything else that wants a file of random bits.
+
+The __main__ blocks of the modules each build their own generator and
+write one 64-bit value at a time, which is most of what they cost once
+the generator is fast enough. Here every generator is reached by name,
+the values go out in large blocks, and a byte count makes files of a
+known size. Dieharder reads those with '-g 201 -f <file>', much faster
+than piping, or stdout is piped to '-g 200' as before.
+
+Progress and rate go to stderr, stdout can be the data.
+
+Current limitations of the code :
+
+"""
+__version__   = "0.1"
+__revision__  = "$Id$"
+__date__      = "2026-10-18"
+__author__    = "nobody@nowhere.com"
+__copyright__ = "None"
+__license__   = "None"
+__filename__  = "evoemit.py"
+__history__   = """
+0.1 - 20261018 - started this file.
+"""
+
+import os
+import sys
+import getopt
+import time
+import random
+from array        import array
+from evohashes    import HASHES
+from evornt       import make_rnt
+from evoprngutils import constant_table
+from evoprngs     import LCG, KnuthMMIX, KnuthNewLib, LongPeriod5, \
+                         LongPeriod256, CMWC4096, MultiplyAdd00, \
+                         MultiplyAdd01, MultiplyAdd03, MultiplyAdd04
+from evocprngs    import LcgCrypto, HashCrypto, PrngCrypto
+
+# The PRNGs all take ( the_rnt, integer_width, prng_depth,
+# paranoia_level, multiplier, constant, lag ), whether they use the last
+# three or not.
+PRNG_GENERATORS   = { 'lcg'      : LCG,
+                      'knuth'    : KnuthMMIX,
+                      'newlib'   : KnuthNewLib,
+                      'lp5'      : LongPeriod5,
+                      'lp256'    : LongPeriod256,
+                      'cmwc4096' : CMWC4096,
+                      'ma00'     : MultiplyAdd00,
+                      'ma01'     : MultiplyAdd01,
+                      'ma03'     : MultiplyAdd03,
+                      'ma04'     : MultiplyAdd04 }
+
+# The crypto PRNGs take ( the_rnt, n_prngs, integer_width, vector_depth,
+# paranoia_level ).
+CRYPTO_GENERATORS = { 'lcg_crypto'  : LcgCrypto,
+                      'hash_crypto' : HashCrypto,
+                      'prng_crypto' : PrngCrypto }
+
+GENERATOR_NAMES = sorted( list( PRNG_GENERATORS ) +
+                          list( CRYPTO_GENERATORS ) + [ 'hash' ] )
+
+EMIT_BLOCK_SIZE = 1024 * 1024
+
+def make_generator( name, the_rnt, integer_width, depth, paranoia_level,
+                    n_prngs ) :
+    """
+    The generator called name, anything with next( bit_width, steps ).
+    The PRNGs' multiplier, constant and lag come from the RNT the same
+    way LcgCrypto's do.  n_prngs is only for the crypto PRNGs.
+    """
+    if name in PRNG_GENERATORS :
+        multiplier, constant, lag, _ = \
+            constant_table( the_rnt, integer_width, 1 )[ 0 ]
+        return PRNG_GENERATORS[ name ]( the_rnt, integer_width, depth,
+                                        paranoia_level, multiplier,
+                                        constant, lag )
+
+    if name in CRYPTO_GENERATORS :
+        return CRYPTO_GENERATORS[ name ]( the_rnt, n_prngs, integer_width,
+                                          depth, paranoia_level )
+
+    if name == 'hash' :
+        return HASHES( the_rnt, integer_width, depth ).next()
+
+    print( "unknown generator ", name, ", the generators are ",
+           GENERATOR_NAMES )
+    sys.exit( 0 )
+
+def fill_block( the_generator, block_size, bit_width ) :
+    """
+    block_size bytes of the_generator's output, bit_width 8 or 64.
+
+    8 is the keystream, the bytes that next( 8, 1 ) gives and evocrypt
+    xors with, through keystream_into() where the generator has it.
+    64 is next( 64, 1 ) values, native byte order, as the __main__
+    blocks always wrote them.  block_size is a multiple of 8 for 64.
+    """
+    if bit_width == 8 :
+        if hasattr( the_generator, 'keystream_into' ) :
+            the_block = bytearray( block_size )
+            the_generator.keystream_into( the_block, 1 )
+            return the_block
+
+        return bytes( [ the_generator.next( 8, 1 )
+                        for _ in range( block_size ) ] )
+
+    if bit_width == 64 :
+        the_block = array( 'Q', [ the_generator.next( 64, 1 )
+                                  for _ in range( block_size >> 3 ) ] )
+        return the_block.tobytes()
+
+    print( "fill_block : bit_width must be 8 or 64, not ", bit_width )
+    sys.exit( 0 )
+
+def emit( the_generator, out_file, n_bytes, bit_width=64,
+          block_size=EMIT_BLOCK_SIZE, report_seconds=10, report_file=None ) :
+    """
+    Writes n_bytes of the_generator's output to out_file, a binary file,
+    block_size bytes at a time. n_bytes of None is forever, for a pipe.
+
+    Every report_seconds the bytes so far and the rate are written to
+    report_file, stderr if None, and once more at the end.
+
+    Returns the number of bytes written.
+    """
+    if bit_width == 64 :
+        block_size = max( 8, block_size & ~7 )
+    if report_file is None :
+        report_file = sys.stderr
+
+    bytes_written  = 0
+    beginning_time = time.perf_counter()
+    last_report    = beginning_time
+    while n_bytes is None or bytes_written < n_bytes :
+        this_size = block_size
+        if n_bytes is not None :
+            this_size = min( block_size, n_bytes - bytes_written )
+
+        fill_size = this_size
+        if bit_width == 64 :
+            # a short last block still has to be whole 64-bit values
+            fill_size = ( this_size + 7 ) & ~7
+
+        the_block = fill_block( the_generator, fill_size, bit_width )
+        out_file.write( memoryview( the_block )[ : this_size ] )
+        bytes_written += this_size
+
+        now = time.perf_counter()
+        if now - last_report >= report_seconds :
+            report_rate( report_file, bytes_written, n_bytes,
+                         now - beginning_time )
+            last_report = now
+
+    out_file.flush()
+    report_rate( report_file, bytes_written, n_bytes,
+                 time.perf_counter() - beginning_time )
+
+    return bytes_written
+
+def report_rate( report_file, bytes_written, n_bytes, seconds ) :
+    """
+    One line of progress.
+    """
+    rate = bytes_written / seconds if seconds > 0 else 0.0
+    the_line = "emitted " + str( bytes_written )
+    if n_bytes is not None :
+        the_line += " of " + str( n_bytes )
+    the_line += " bytes, %.1f seconds, %.0f bytes/second\n" % ( seconds, rate )
+
+    report_file.write( the_line )
+    report_file.flush()
+
+def usage() :
+    """
+    This provides 'help' and other usage information.
+    """
+    usage_info = """
+        --generator <name>
+        -g          <name>
+            One of """ + ', '.join( GENERATOR_NAMES ) + """
+
+        --password <password>
+        -p         <password>
+            The RNT's password, the same password is the same stream.
+            Without one, a random one.
+
+        --int_width <bits>     integer width of the generator, 128
+        --vec_depth <n>        vector depth of the generator, 31
+        --paranoia  <level>    paranoia level, 1
+        --n_prngs   <n>        PRNGs in a crypto PRNG, 9
+
+        --bits <8 or 64>
+            8 is the keystream bytes evocrypt uses, 64 the next( 64, 1 )
+            values. Default 8 for the crypto PRNGs, 64 for the others.
+
+        --bytes <n>
+        -n      <n>
+            Bytes to write, default forever, for a pipe to dieharder.
+
+        --output <name>
+        -o       <name>
+            File to write, default stdout.
+
+        --block <bytes>
+            Bytes generated and written at a time, default 1M.
+
+        --report <seconds>
+            Seconds between progress lines on stderr, default 10.
+
+        For example :
+            ./evoemit.py -g lcg_crypto -p umberalertness -n 100000000 \\
+                -o lcg_crypto.bin
+            dieharder -a -g 201 -f lcg_crypto.bin
+
+            ./evoemit.py -g lcg -p umberalertness | dieharder -a -g 200
+    """
+    print( usage_info )
+
+#
+# main begins here
+#
+if __name__ == "__main__" :
+
+# stderr because stdout can be the data
+    sys.stderr.write( '# ' + __filename__ + ' : ' + __version__ + ' : ' +
+                      str( sys.argv[ 1 : ] ) + '\n' )
+
+    SHORT_ARGS = "g:hn:o:p:"
+    LONG_ARGS  = [ 'bits=', 'block=', 'bytes=', 'generator=', 'help',
+                   'int_width=', 'n_prngs=', 'output=', 'paranoia=',
+                   'password=', 'report=', 'vec_depth=' ]
+
+    GENERATOR_NAME = None
+    PASSWORD       = ''
+    INTEGER_WIDTH  = 128
+    VECTOR_DEPTH   = 31
+    PARANOIA_LEVEL = 1
+    N_PRNGS        = 9
+    BIT_WIDTH      = None
+    N_BYTES        = None
+    OUTPUT_NAME    = None
+    BLOCK_SIZE     = EMIT_BLOCK_SIZE
+    REPORT_SECONDS = 10
+
+    try :
+        OPTS, ARGS = getopt.getopt( sys.argv[ 1 : ], SHORT_ARGS, LONG_ARGS )
+
+    except getopt.GetoptError as err :
+        sys.stderr.write( "getopt.GetoptError = " + str( err ) + '\n' )
+        sys.exit( -2 )
+
+    for o, a in OPTS :
+        if o in ( "--help", "-h" ) :
+            usage()
+            sys.exit( -2 )
+
+        if o in ( "--generator", "-g" ) :
+            GENERATOR_NAME = a
+
+        if o in ( "--password", "-p" ) :
+            PASSWORD = a
+
+        if o == "--int_width" :
+            INTEGER_WIDTH = int( a )
+
+        if o == "--vec_depth" :
+            VECTOR_DEPTH = int( a )
+
+        if o == "--paranoia" :
+            PARANOIA_LEVEL = int( a )
+
+        if o == "--n_prngs" :
+            N_PRNGS = int( a )
+
+        if o == "--bits" :
+            BIT_WIDTH = int( a )
+
+        if o in ( "--bytes", "-n" ) :
+            N_BYTES = int( a )
+
+        if o in ( "--output", "-o" ) :
+            OUTPUT_NAME = a
+
+        if o == "--block" :
+            BLOCK_SIZE = int( a )
+
+        if o == "--report" :
+            REPORT_SECONDS = float( a )
+
+    if GENERATOR_NAME not in GENERATOR_NAMES :
+        sys.stderr.write( "--generator is one of " +
+                          ', '.join( GENERATOR_NAMES ) + '\n' )
+        sys.exit( 0 )
+
+    if BIT_WIDTH is None :
+        BIT_WIDTH = 8 if GENERATOR_NAME in CRYPTO_GENERATORS else 64
+
+    # need a random factor to prevent repeating pseudo-random sequences
+    if not PASSWORD :
+        random.seed()
+        PASSWORD = 'evoemit' + hex( random.getrandbits( 128 ) )
+
+    THE_RNT       = make_rnt( 4096, PASSWORD, 'desktop', PARANOIA_LEVEL )
+    THE_GENERATOR = make_generator( GENERATOR_NAME, THE_RNT, INTEGER_WIDTH,
+                                    VECTOR_DEPTH, PARANOIA_LEVEL, N_PRNGS )
+
+    if OUTPUT_NAME :
+        OUT_FILE = open( OUTPUT_NAME, 'wb' )
+    else :
+        OUT_FILE = os.fdopen( sys.stdout.fileno(), 'wb' )
+
+    try :
+        emit( THE_GENERATOR, OUT_FILE, N_BYTES, BIT_WIDTH, BLOCK_SIZE,
+              REPORT_SECONDS )
+    except BrokenPipeError :
+        # dieharder has read all it wants
+        pass
+
+    OUT_FILE.close()
+    sys.exit( 0 )
@@ -30,6 +30,22 @@ import random
 
 #SINGLE_PROGRAM_FROM_HERE
 
+# (1 << bit_width) - 1 by bit_width. The folds are asked for the same
+# handful of widths millions of times.
+FOLD_MASKS = {}
+
+def fold_mask( bit_width ) :
+    """
+    Returns the bit_width mask, from FOLD_MASKS once it has been seen.
+    """
+    the_mask = FOLD_MASKS.get( bit_width )
+    if the_mask is None :
+        assert bit_width > 0
+        the_mask = ( 1 << bit_width ) - 1
+        FOLD_MASKS[ bit_width ] = the_mask
+
+    return the_mask
+
 # folds are suprisingly tricky, I did a lot of experimenting to find
 # this set that pass dieharder.
 # I could argue, however, that it doesn't matter, as even bad folds hide
@@ -65,29 +81,70 @@ class FoldInteger() :
         """
         Invokes one of the fold functions, the caller can't know which one.
         This is the preferred way to invoke a fold in the crypto functions.
+
+        This is on every hot path, so next() is inlined here. The
+        functions are used in exactly the same order.
         """
-        assert bit_width > 0
+        the_mask = FOLD_MASKS.get( bit_width ) or fold_mask( bit_width )
 
-        if to_be_folded_value < ( 1 << bit_width ) :
+        if to_be_folded_value <= the_mask :
             return to_be_folded_value
 
-        the_fold_function = self.next()
-        return the_fold_function( to_be_folded_value, bit_width )
+        fold_index = self.next_fold_index
+        self.next_fold_index = ( fold_index + 1 ) % len( self.fold_functions )
+
+        return self.fold_functions[ fold_index ]( to_be_folded_value,
+                                                  bit_width )
+
+    def fold_many( self, to_be_folded_values, bit_width ) :
+        """
+        Returns the list of fold_it() of each of to_be_folded_values, in
+        order. The round robin of fold functions ends exactly where
+        calling fold_it() on each of them would have left it.
+        """
+        the_mask       = FOLD_MASKS.get( bit_width ) or fold_mask( bit_width )
+        fold_functions = self.fold_functions
+        n_functions    = len( fold_functions )
+        fold_index     = self.next_fold_index
+
+        folded_values = []
+        for the_value in to_be_folded_values :
+            if the_value > the_mask :
+                the_value  = fold_functions[ fold_index ]( the_value,
+                                                           bit_width )
+                fold_index = ( fold_index + 1 ) % n_functions
+
+            folded_values.append( the_value )
+
+        self.next_fold_index = fold_index
+
+        return folded_values
 
     def fold_xor0( self, to_be_folded_value, bit_width ) :
         """
          Uses xor of N-bit values beginning at the right end to fold
          N-bit values to bit_with bits
+
+         xor doesn't care about order, so for long values the upper half
+         of the N-bit values is xored onto the lower half until one is
+         left, log2 of the number of them in big integer operations
+         instead of one loop per N-bit value.
         """
-        assert bit_width > 0
+        the_mask = FOLD_MASKS.get( bit_width ) or fold_mask( bit_width )
+
+        # more than 8 of them
+        if to_be_folded_value >> ( bit_width << 3 ) > 0 :
+            n_values = ( to_be_folded_value.bit_length() + bit_width - 1 ) \
+                       // bit_width
+
+            while n_values > 4 :
+                low_values = ( n_values + 1 ) >> 1
+                low_width  = low_values * bit_width
+                to_be_folded_value = ( to_be_folded_value >> low_width ) ^ \
+                    ( to_be_folded_value & ( ( 1 << low_width ) - 1 ) )
+                n_values = low_values
 
         out_value = 0
-    
-        the_mask = ( 1 << bit_width ) - 1
-    
-#        out_value ^= to_be_folded_value & the_mask
-#        to_be_folded_value = to_be_folded_value >> bit_width
-    
         while to_be_folded_value > 0 :
             out_value ^= to_be_folded_value & the_mask
             to_be_folded_value  = to_be_folded_value >> bit_width
@@ -100,15 +157,10 @@ class FoldInteger() :
          Uses shifts and xor of N-bit values to fold N bit values
          to bitwidth bits
         """
-        assert bit_width > 0
+        the_mask = FOLD_MASKS.get( bit_width ) or fold_mask( bit_width )
 
         out_value = 0
     
-        the_mask = ( 1 << bit_width ) - 1
-    
-#        out_value ^= to_be_folded_value & the_mask
-#        to_be_folded_value = to_be_folded_value >> bit_width
-    
         while to_be_folded_value > 0 :
             out_value ^= to_be_folded_value & the_mask
             to_be_folded_value  = to_be_folded_value >> bit_width
@@ -126,15 +178,10 @@ class FoldInteger() :
          Uses xor and add of N-bit values beginning at the right end to fold
          N-bit values to bit_with bits
         """
-        assert bit_width > 0
+        the_mask = FOLD_MASKS.get( bit_width ) or fold_mask( bit_width )
 
         out_value = 0
     
-        the_mask = ( 1 << bit_width ) - 1
-    
-#        out_value ^= to_be_folded_value & the_mask
-#        to_be_folded_value = to_be_folded_value >> bit_width
-    
         while to_be_folded_value > 0 :
             if out_value & 0x01 :
                 out_value ^= to_be_folded_value & the_mask
@@ -149,14 +196,10 @@ class FoldInteger() :
         """
         A minor variant of fold_xor_add0
         """
-        assert bit_width > 0
+        the_mask = FOLD_MASKS.get( bit_width ) or fold_mask( bit_width )
 
-        out_value = 0
-    
-        the_mask = ( 1 << bit_width ) - 1
-    
         # one full-width component first
-        out_value ^= to_be_folded_value & the_mask
+        out_value = to_be_folded_value & the_mask
         to_be_folded_value = to_be_folded_value >> bit_width
     
         # a first simple variation
@@ -54,12 +54,15 @@ class HASHES() :
         This is the general hash, invoking specific hashes from the function
         list.
         """
+        # the shared registry, never modified, so no copy
         self.hash_functions  = HASH_FUNCTIONS
         self.next_hash_index = 0
         self.rnt             = rnt
         self.integer_width   = integer_width
         self.hash_depth      = hash_depth
 
+        # the new order is dropped, as it always has been, but this steps
+        # the caller's Wichmann-Hill, and every keystream depends on that
         self.rnt.scramble_list( self.hash_functions )
 
 
@@ -102,6 +105,10 @@ class HASH0( ) :
         self.integer_vector   = []
         self.backup_vector    = []
 
+        # the xor of all of integer_vector, kept up to date by update(),
+        # None when an update changed all of it and it's not been read
+        self.running_digest   = None
+
         self.the_fold            = FoldInteger( )
 
         # A simple initialization.  Could get the next higher prime,
@@ -142,6 +149,34 @@ class HASH0( ) :
         Never used.
         """
         self.integer_vector = copy.deepcopy( self.backup_vector )
+        self.reset_digest()
+
+    def reset_digest( self ) :
+        """
+        Recomputes running_digest from the whole vector, for anything
+        that replaces integer_vector instead of going through update().
+        """
+        self.running_digest = 0
+        for the_integer in self.integer_vector :
+            self.running_digest ^= the_integer
+
+    def xor_of_run( self, first_index, n_touched ) :
+        """
+        The xor of the n_touched slots beginning with first_index,
+        wrapping around the end of the vector.
+        """
+        return_value = 0
+        last_index   = first_index + n_touched
+        if last_index > self.hash_depth :
+            last_index -= self.hash_depth
+            for the_integer in self.integer_vector[ : last_index ] :
+                return_value ^= the_integer
+            last_index = self.hash_depth
+
+        for the_integer in self.integer_vector[ first_index : last_index ] :
+            return_value ^= the_integer
+
+        return return_value
         
     def nibble_change_to_vector( self, the_bit_string ) :
         """
@@ -176,12 +211,66 @@ class HASH0( ) :
 
         self.nibble_change_to_vector( this_random )
 
+    def update_length( self, the_update ) :
+        """
+        The number of bytes update() will mix in from the_update.
+        """
+        if isinstance( the_update, str ) :
+            return len( the_update )
+
+        if isinstance( the_update, int ) and the_update > 0 :
+            return ( the_update.bit_length() + 7 ) >> 3
+
+        if isinstance( the_update, ( bytes, bytearray, memoryview ) ) :
+            return memoryview( the_update ).nbytes
+
+        return 0
+
+    def fold_touched( self, first_index, n_touched ) :
+        """
+        Folds the n_touched slots beginning with first_index, wrapping
+        around the end of the vector. Every other slot was folded by the
+        last update and hasn't changed, so folding it again would
+        neither change it nor advance the fold's round robin.
+
+        The slots are folded in index order, the same order as folding
+        the whole vector, so the digests are exactly what they were.
+
+        It also puts the run back into running_digest, or leaves that
+        to the next intdigest() if the whole vector was touched.
+        """
+        if n_touched >= self.hash_depth :
+            self.integer_vector[ : ] = self.the_fold.fold_many(
+                                  self.integer_vector, self.integer_width )
+            self.running_digest = None
+            return
+
+        last_index = first_index + n_touched
+        if last_index <= self.hash_depth :
+            self.integer_vector[ first_index : last_index ] = \
+                self.the_fold.fold_many(
+                    self.integer_vector[ first_index : last_index ],
+                    self.integer_width )
+        else :
+            # wrapped, the slots at the beginning come first
+            last_index -= self.hash_depth
+            self.integer_vector[ : last_index ] = self.the_fold.fold_many(
+                                  self.integer_vector[ : last_index ],
+                                  self.integer_width )
+            self.integer_vector[ first_index : ] = self.the_fold.fold_many(
+                                  self.integer_vector[ first_index : ],
+                                  self.integer_width )
+
+        # update() took the old values of the run out of running_digest
+        if self.running_digest is not None :
+            self.running_digest ^= self.xor_of_run( first_index, n_touched )
+
     def update( self, the_update ) :
         """ 
         Mixes the value into the array of integers, state values for the
         hash function..
-        Problem of types, this handles strings and integers and arrays
-        of strings and integers.
+        Problem of types, this handles strings, integers and bytes,
+        bytearrays and memoryviews.
 
         Algorithm is to multiply the integer_vector[ next_index ] by the
         byte value, then shift the next 8 numbers left or right
@@ -196,7 +285,53 @@ class HASH0( ) :
         change more than 50% if they are random in the first place, so who
         can tell you did? Computational load is no particular constraint,
         so overkill is the way to go.
+
+        The subclasses differ in mix() and mix_byte(), this does the
+        folding and the digest for all of them.
         """
+        # Every slot this update touches is in one run from here, and
+        # only those can be out of range afterwards.
+        first_index = self.next_index
+        n_touched   = 1 + self.touched_per_byte * \
+                          self.update_length( the_update )
+        if n_touched < self.hash_depth and self.running_digest is not None :
+            self.running_digest ^= self.xor_of_run( first_index, n_touched )
+
+        if self.mix( the_update ) :
+            n_touched = self.hash_depth
+
+        # the integers grow without bound in the basic update.
+        # fold the integers back into range.
+        self.fold_touched( first_index, n_touched )
+
+    def update_many( self, the_updates ) :
+        """
+        Mixes each of the_updates, in order, folding only once for every
+        hash_depth bytes mixed and at the end. That is a lot fewer folds
+        than update() of each one, and a different digest, the folds are
+        part of the mixing.
+        """
+        mixed_bytes = 0
+        for the_update in the_updates :
+            self.mix( the_update )
+
+            mixed_bytes += self.update_length( the_update )
+            if mixed_bytes >= self.hash_depth :
+                self.fold_touched( 0, self.hash_depth )
+                mixed_bytes = 0
+
+        self.fold_touched( 0, self.hash_depth )
+
+    # slots changed by each byte of an update, beyond the first
+    touched_per_byte = 9
+
+    def mix( self, the_update ) :
+        """
+        The update without the fold. Returns True if it might have
+        changed any slot, not just the run mix_byte() walks.
+        """
+        mix_byte = self.mix_byte
+
         if isinstance( the_update, str ) :
             for this_byte in the_update :
                 # degenerate case causes right shifts, small numbers,
@@ -204,28 +339,7 @@ class HASH0( ) :
                 if ord( this_byte ) == 0 :
                     this_byte = self.rnt.randint( 8 )
 
-                # a big change to one value
-                self.integer_vector[ self.next_index ] *= ord( this_byte )
-
-                # bigger change to the next value
-                self.next_index += 1 
-                self.next_index %= self.hash_depth
-                self.integer_vector[ self.next_index ] *= 5 * ord( this_byte )
-
-                # the next 8 values are shifted according to bit
-                # settings in each byte
-                for i in range( 8 ) :
-                    self.next_index += 1 
-                    self.next_index %= self.hash_depth
-                    if ord( this_byte ) & ( 1 << i ) :
-                        self.integer_vector[ self.next_index ] <<= 1
-                        if i & 0x01 :
-                            self.integer_vector[ self.next_index ] += 1
-                    else :
-                        self.integer_vector[ self.next_index ] >>= 1
-                        if i & 0x01 :
-                            self.integer_vector[ self.next_index ] += \
-                                    self.max_integer
+                mix_byte( ord( this_byte ) )
 
         elif isinstance( the_update, int ) :
             while the_update :
@@ -239,39 +353,52 @@ class HASH0( ) :
                 assert self.next_index >= 0 and \
                         self.next_index < self.hash_depth
 
-                # a big change to one value
-                self.integer_vector[ self.next_index ] *= this_byte
-
-                # bigger change to the next value
-                self.next_index += 1 
-                self.next_index %= self.hash_depth
-                self.integer_vector[ self.next_index ] *= 5 * this_byte
-
-                # the next 8 values are shifted according to bit
-                # settings in each byte
-                for i in range( 8 ) :
-                    self.next_index += 1 
-                    self.next_index %= self.hash_depth
-                    if this_byte & ( 1 << i ) :
-                        self.integer_vector[ self.next_index ] <<= 1
-                        if i & 0x01 :
-                            self.integer_vector[ self.next_index ] += 1
-                    else :
-                        self.integer_vector[ self.next_index ] >>= 1
-                        if i & 0x01 :
-                            self.integer_vector[ self.next_index ] += \
-                                    self.max_integer
+                mix_byte( this_byte )
+
+        elif isinstance( the_update, ( bytes, bytearray, memoryview ) ) :
+            # the bytes are already small integers, no ord()
+            for this_byte in memoryview( the_update ).cast( 'B' ) :
+                if this_byte == 0 :
+                    this_byte = self.rnt.randint( 8 )
+
+                mix_byte( this_byte )
 
         elif isinstance( the_update, list or dict ) :
             print( "update with a list or dict" )
             sys.stdout.flush()
             sys.exit( 1 )
 
-        # the integers grow without bound in the basic update.
-        # fold the integers back into range.
-        for j in range( self.hash_depth ) :
-            self.integer_vector[ j ] = self.the_fold.fold_it(
-                                  self.integer_vector[ j ], self.integer_width )
+        return False
+
+    def mix_byte( self, this_byte ) :
+        """
+        Mixes one byte value into the vector at next_index.
+        """
+        integer_vector = self.integer_vector
+        hash_depth     = self.hash_depth
+        next_index     = self.next_index
+
+        # a big change to one value
+        integer_vector[ next_index ] *= this_byte
+
+        # bigger change to the next value
+        next_index = ( next_index + 1 ) % hash_depth
+        integer_vector[ next_index ] *= 5 * this_byte
+
+        # the next 8 values are shifted according to bit
+        # settings in each byte
+        for i in range( 8 ) :
+            next_index = ( next_index + 1 ) % hash_depth
+            if this_byte & ( 1 << i ) :
+                integer_vector[ next_index ] <<= 1
+                if i & 0x01 :
+                    integer_vector[ next_index ] += 1
+            else :
+                integer_vector[ next_index ] >>= 1
+                if i & 0x01 :
+                    integer_vector[ next_index ] += self.max_integer
+
+        self.next_index = next_index
 
     def next( self, bit_width, steps ) :
         """
@@ -292,11 +419,7 @@ class HASH0( ) :
         """
         returns a hexadecimal string of the xors of all integers in the vector
         """
-        return_value = 0
-        for vector_index in range( self.hash_depth ) :
-            return_value ^= self.integer_vector[ vector_index ]
-
-        hex_string = hex( return_value )
+        hex_string = hex( self.intdigest() )
         if 'L' in hex_string :
             return hex_string[ : -1 ]
         else :
@@ -309,12 +432,21 @@ class HASH0( ) :
 
         This intdigest is another xor, obliterating history and
         predictability.
+
+        update() keeps that xor in running_digest as it goes.
         """
-        return_value = 0
-        for i in range( self.hash_depth ) :
-            return_value ^= self.integer_vector[ i ]
+        if self.running_digest is None :
+            self.reset_digest()
 
-        return return_value
+        return self.running_digest
+
+    def digest_bytes( self ) :
+        """
+        returns the intdigest as integer_width bits of bytes, most
+        significant byte first.
+        """
+        return self.intdigest().to_bytes( ( self.integer_width + 7 ) >> 3,
+                                          'big' )
 
 
 class HASH1( HASH0 ) :
@@ -322,11 +454,13 @@ class HASH1( HASH0 ) :
     This uses a more general update method.
 
     """
-    def update( self, the_update ) :
+    touched_per_byte = 8
+
+    def mix( self, the_update ) :
         """ 
         Mixes the value into the array of bits.
-        Problem of types, this handles strings and integers and arrays
-        of strings and integers.
+        Problem of types, this handles strings, integers and bytes,
+        bytearrays and memoryviews.
 
         Algorithm is to multiply the integer_vector[ next_index ] by the
         byte value, then shift the next 8 numbers left or right
@@ -336,6 +470,8 @@ class HASH1( HASH0 ) :
         There are many possible update algorithms that will work with
         this basic structure, and thus more elements of HASH_FUNCTIONS[].
         """
+        mix_byte = self.mix_byte
+
         if isinstance( the_update, str ) :
             for this_byte in the_update :
                 # degenerate case causes right shifts, small numbers,
@@ -343,22 +479,7 @@ class HASH1( HASH0 ) :
                 if ord( this_byte ) == 0 :
                     this_byte = self.rnt.randint( 8 )
 
-                # a big change to one value
-                self.integer_vector[ self.next_index ] *= ord( this_byte )
-                # the next 8 values are shifted according to bit
-                # settings in each byte
-                for i in range( 8 ) :
-                    self.next_index += 1 
-                    self.next_index %= self.hash_depth
-                    if ord( this_byte ) & ( 1 << i ) :
-                        self.integer_vector[ self.next_index ] <<= 1
-                        if i & 0x01 :
-                            self.integer_vector[ self.next_index ] += 1
-                    else :
-                        self.integer_vector[ self.next_index ] >>= 1
-                        if i & 0x01 :
-                            self.integer_vector[ self.next_index ] += \
-                                    self.max_integer
+                mix_byte( ord( this_byte ) )
 
         elif isinstance( the_update, int ) :
             while the_update :
@@ -369,47 +490,63 @@ class HASH1( HASH0 ) :
                 if this_byte == 0 :
                     this_byte = self.rnt.randint( 8 )
 
-                # a big change to one value
-                self.integer_vector[ self.next_index ] *= this_byte
-                # the next 8 values are shifted according to bit
-                # settings in each byte
-                for i in range( 8 ) :
-                    self.next_index += 1 
-                    self.next_index %= self.hash_depth
-                    if this_byte & ( 1 << i ) :
-                        # bit is 1
-                        self.integer_vector[ self.next_index ] <<= 1
-                        # on odd bits, skip an index
-                        if i & 0x01 :
-                            self.integer_vector[ self.next_index ] += 1
-                    else :
-                        # bit is zero
-                        self.integer_vector[ self.next_index ] >>= 1
-                        if i & 0x01 :
-                            # odd bits, set a bit on the far left
-                            self.integer_vector[ self.next_index ] += \
-                                    self.max_integer
+                mix_byte( this_byte )
+
+        elif isinstance( the_update, ( bytes, bytearray, memoryview ) ) :
+            for this_byte in memoryview( the_update ).cast( 'B' ) :
+                if this_byte == 0 :
+                    this_byte = self.rnt.randint( 8 )
+
+                mix_byte( this_byte )
 
         elif isinstance( the_update, list or dict ) :
             print( "update with a list or dict" )
             sys.stdout.flush()
             sys.exit( 1 )
 
-        # the integers grow without bound in the basic update.
-        # fold the integers back into range.
-        for j in range( self.hash_depth ) :
-            self.integer_vector[ j ] = self.the_fold.fold_it(
-                                  self.integer_vector[ j ], self.integer_width )
+        return False
+
+    def mix_byte( self, this_byte ) :
+        """
+        Mixes one byte value into the vector at next_index.
+        """
+        integer_vector = self.integer_vector
+        hash_depth     = self.hash_depth
+        next_index     = self.next_index
+
+        # a big change to one value
+        integer_vector[ next_index ] *= this_byte
+
+        # the next 8 values are shifted according to bit
+        # settings in each byte
+        for i in range( 8 ) :
+            next_index = ( next_index + 1 ) % hash_depth
+            if this_byte & ( 1 << i ) :
+                # bit is 1
+                integer_vector[ next_index ] <<= 1
+                # on odd bits, skip an index
+                if i & 0x01 :
+                    integer_vector[ next_index ] += 1
+            else :
+                # bit is zero
+                integer_vector[ next_index ] >>= 1
+                if i & 0x01 :
+                    # odd bits, set a bit on the far left
+                    integer_vector[ next_index ] += self.max_integer
+
+        self.next_index = next_index
 
 class HASH2( HASH0 ) :
     """
     This uses a yet more general update method.
     """
-    def update( self, the_update ) :
+    touched_per_byte = 8
+
+    def mix( self, the_update ) :
         """ 
         Mixes the value into the array of bits.
-        Problem of types, this handles strings and integers and arrays
-        of strings and integers.
+        Problem of types, this handles strings, integers and bytes,
+        bytearrays and memoryviews.
 
         Algorithm is to multiply the integer_vector[ next_index ] by the
         byte value, then shift the next 8 numbers left or right
@@ -419,29 +556,18 @@ class HASH2( HASH0 ) :
         There are many possible update algorithms that will work with
         this basic structure, and thus more elements of HASH_FUNCTIONS[].
         """
+        mix_byte   = self.mix_byte
+        big_change = False
+
         if isinstance( the_update, str ) :
             for this_byte in the_update :
                 # degenerate case causes right shifts, small numbers,
                 # and loss of entropy in the vector
                 if ord( this_byte ) == 0 :
                     self.big_change_to_vector( this_byte )
+                    big_change = True
 
-                # a big change to one value
-                self.integer_vector[ self.next_index ] *= ord( this_byte )
-                # the next 8 values are shifted according to bit
-                # settings in each byte
-                for i in range( 8 ) :
-                    self.next_index += 1 
-                    self.next_index %= self.hash_depth
-                    if ord( this_byte ) & ( 1 << i ) :
-                        self.integer_vector[ self.next_index ] <<= 1
-                        if i & 0x01 :
-                            self.integer_vector[ self.next_index ] += 1
-                    else :
-                        self.integer_vector[ self.next_index ] >>= 1
-                        if i & 0x01 :
-                            self.integer_vector[ self.next_index ] += \
-                                    self.max_integer
+                mix_byte( ord( this_byte ) )
 
         elif isinstance( the_update, int ) :
             while the_update :
@@ -450,40 +576,29 @@ class HASH2( HASH0 ) :
                 this_byte = the_update & 0xFF
                 if this_byte == 0 :
                     self.big_change_to_vector( the_update )
+                    big_change = True
 
                 the_update >>= 8
 
-                # a big change to one value
-                self.integer_vector[ self.next_index ] *= this_byte
-                # the next 8 values are shifted according to bit
-                # settings in each byte
-                for i in range( 8 ) :
-                    self.next_index += 1 
-                    self.next_index %= self.hash_depth
-                    if this_byte & ( 1 << i ) :
-                        # bit is 1
-                        self.integer_vector[ self.next_index ] <<= 1
-                        # on odd bits, skip an index
-                        if i & 0x01 :
-                            self.integer_vector[ self.next_index ] += 1
-                    else :
-                        # bit is zero
-                        self.integer_vector[ self.next_index ] >>= 1
-                        if i & 0x01 :
-                            # odd bits, set a bit on the far left
-                            self.integer_vector[ self.next_index ] += \
-                                    self.max_integer
+                mix_byte( this_byte )
+
+        elif isinstance( the_update, ( bytes, bytearray, memoryview ) ) :
+            for this_byte in memoryview( the_update ).cast( 'B' ) :
+                if this_byte == 0 :
+                    self.big_change_to_vector( this_byte )
+                    big_change = True
+
+                mix_byte( this_byte )
 
         elif isinstance( the_update, list or dict ) :
             print( "update with a list or dict" )
             sys.stdout.flush()
             sys.exit( 1 )
 
-        # the integers grow without bound in the basic update.
-        # fold the integers back into range.
-        for j in range( self.hash_depth ) :
-            self.integer_vector[ j ] = self.the_fold.fold_it(
-                                  self.integer_vector[ j ], self.integer_width )
+        return big_change
+
+    # the same byte mixing as HASH1
+    mix_byte = HASH1.mix_byte
 
 
 #
@@ -23,6 +23,7 @@ __history__   = """
 
 import random
 import math
+import hashlib
 import sys
 import traceback
 import evoutils
@@ -126,13 +127,90 @@ LOW_PRIMES = [
     9803,9811,9817,9829,9833,9839,9851,9857,9859,9871,9883,9887,9901,
     9907,9923,9929,9931,9941,9949,9967,9973,
     ]
-def rabin_miller( the_candidate ) :
+
+LOW_PRIMES_SET     = set( LOW_PRIMES )
+LOW_PRIMES_LIMIT   = LOW_PRIMES[ -1 ]
+
+# one gcd with the product replaces a Python loop of 1200 modulos
+LOW_PRIMES_PRODUCT = 1
+for LOW_PRIME in LOW_PRIMES :
+    LOW_PRIMES_PRODUCT *= LOW_PRIME
+
+# ( bit length up to, primes below ) the sieve windows strike with.
+# Rabin-Miller on a survivor costs more the wider the candidate, so wider
+# candidates are worth sieving with more primes.  Beyond the last, the
+# maximum.
+SIEVE_LIMITS       = [ ( 128, LOW_PRIMES_LIMIT + 1 ), ( 512, 1 << 16 ) ]
+SIEVE_MAX_LIMIT    = 1 << 20
+
+# limit : ( odd primes below limit, the inverse of 2 modulo each ),
+# built when first needed
+SIEVE_PRIMES       = {}
+
+# Rabin-Miller with the first 12 primes as witnesses has no false
+# positives below 3.3 * 10**24, so every candidate below 2**64 gets an
+# exact answer.
+DETERMINISTIC_WITNESSES = [ 2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37 ]
+
+# ( bit length up to, rounds ).  Roughly twice the rounds the Handbook of
+# Applied Cryptography (table 4.4) gives for a 2**-80 error, beyond that
+# the minimum.  The candidates come from a sieve, so the rounds are spent
+# on real primes, a composite almost always fails the first round.
+RABIN_MILLER_ROUNDS     = [ ( 128, 40 ), ( 256, 27 ), ( 512, 15 ),
+                            ( 1024, 8 ) ]
+RABIN_MILLER_MIN_ROUNDS = 4
+
+# the most odd candidates the searches try, as before
+MAX_PRIME_CANDIDATES = 10000
+
+# bounded LRU of recent search results, ( beginning integer, step ) : prime.
+# The same starting points recur, every LongPeriod5 of a password asks
+# for the same prime, and generate_constants() is called again for every
+# CRYPTO built from the same RNT.
+PRIME_CACHE      = {}
+PRIME_CACHE_SIZE = 1024
+
+def rabin_miller_rounds( bit_length ) :
+    """
+    The number of random-witness rounds for a candidate of bit_length.
+    """
+    for max_bit_length, n_rounds in RABIN_MILLER_ROUNDS :
+        if bit_length <= max_bit_length :
+            return n_rounds
+
+    return RABIN_MILLER_MIN_ROUNDS
+
+def candidate_witnesses( the_candidate, n_rounds ) :
+    """
+    N_rounds witnesses in [ 2, the_candidate - 2 ] derived from the
+    candidate itself, SHAKE-256 of its bytes, 64 bits wider than the
+    candidate each so the modulo is close to uniform.
+
+    The same candidate always gets the same witnesses, in any process, so
+    nothing depends on the global random module's state.
+    """
+    n_bytes    = ( the_candidate.bit_length() + 7 ) // 8
+    width      = n_bytes + 8
+    the_stream = hashlib.shake_256( the_candidate.to_bytes( n_bytes, 'big' )
+                                  ).digest( n_rounds * width )
+
+    return [ 2 + int.from_bytes( the_stream[ i : i + width ], 'big' ) %
+                 ( the_candidate - 3 )
+             for i in range( 0, n_rounds * width, width ) ]
+
+def rabin_miller( the_candidate, n_rounds=None, witness_source=None ) :
     """
     Rabin-Miller algorithm.
 
     I switched to Python 3, then had to change a divide by 2
     into '>> 1' to prevent it complaining about floating point values.
 
+    Below 2**64 the witnesses are DETERMINISTIC_WITNESSES and the answer
+    is exact, above that n_rounds witnesses, by default
+    rabin_miller_rounds() of the candidate's bit length.  Those come from
+    witness_source.randrange(), e.g. a random.Random of your own, or
+    when it is None from candidate_witnesses(), so the answer is a pure
+    function of the candidate.
     """
     s = the_candidate - 1
     t = 0
@@ -140,47 +218,184 @@ def rabin_miller( the_candidate ) :
         s  = s >> 1
         t += 0x01
 
-    k = 0
-    while k < 128 :
-        a = random.randrange( 2, the_candidate - 1 )
+    if the_candidate < 1 << 64 :
+        witnesses = DETERMINISTIC_WITNESSES
+    else :
+        if n_rounds is None :
+            n_rounds = rabin_miller_rounds( the_candidate.bit_length() )
+        if witness_source is None :
+            witnesses = candidate_witnesses( the_candidate, n_rounds )
+        else :
+            witnesses = [ witness_source.randrange( 2, the_candidate - 1 )
+                          for _ in range( n_rounds ) ]
+
+    minus_one = the_candidate - 1
+    for a in witnesses :
+        a %= the_candidate
+        if a == 0 :
+            continue
+
         # a^s is computationally infeasible.  We need a more intelligent
         #  approach
         # v = ( a**s ) % n
         # python's core math module can do modular exponentiation
         # where values are (num,exp,mod)
-        v = pow( int( a ), int( s ), the_candidate )
-#        print( "a=", a, "v=", v )
+        v = pow( a, s, the_candidate )
         if v != 1:
             i = 0
-            while v != ( the_candidate - 1 ) :
+            while v != minus_one :
                 if i == t - 1 :
-#                    print( "false", v, i, t )
                     return False
                 else:
                     i = i + 1
-                    v = ( v**2 ) % the_candidate
-        k += 2
-#    print( "true", k )
+                    v = pow( v, 2, the_candidate )
     return True
 
-def is_prime( the_number ):
+def is_prime( the_number, witness_source=None ):
     """ low_primes is all primes (sans 2, which is covered by the
     bitwise and operator) under 10000. taking n modulo each lowPrime allows
     us to remove a huge chunk of composite numbers from our potential pool
     without resorting to Rabin-Miller.
 
+    That is one gcd with the product of the low primes now.  The
+    witness_source is passed to rabin_miller().
     """
-    if ( the_number >= 3 ) :
-        if ( the_number & 1 != 0 ):
-            for p in LOW_PRIMES:
-                if ( the_number == p ) :
-                    return True
+    if the_number < 3 or the_number & 1 == 0 :
+        return False
 
-                if ( the_number % p == 0 ) :
-                    return False
+    if the_number <= LOW_PRIMES_LIMIT :
+        return the_number in LOW_PRIMES_SET
+
+    if math.gcd( the_number, LOW_PRIMES_PRODUCT ) != 1 :
+        return False
+
+    return rabin_miller( the_number, witness_source=witness_source )
+
+def sieve_limit( bit_length ) :
+    """
+    The sieve windows for candidates of bit_length strike with the odd
+    primes below this.
+    """
+    for max_bit_length, the_limit in SIEVE_LIMITS :
+        if bit_length <= max_bit_length :
+            return the_limit
+
+    return SIEVE_MAX_LIMIT
+
+def sieve_primes( the_limit ) :
+    """
+    Returns ( odd primes below the_limit, the inverse of 2 modulo each ),
+    from SIEVE_PRIMES, Eratosthenes the first time.
+    """
+    if the_limit not in SIEVE_PRIMES :
+        if the_limit == LOW_PRIMES_LIMIT + 1 :
+            primes = LOW_PRIMES
+        else :
+            the_sieve = bytearray( b'\x01' ) * the_limit
+            the_sieve[ 0 : 2 ] = b'\x00\x00'
+            i = 2
+            while i * i < the_limit :
+                if the_sieve[ i ] :
+                    the_sieve[ i * i :: i ] = \
+                                bytes( ( the_limit - 1 - i * i ) // i + 1 )
+                i += 1
+            primes = [ p for p in range( 3, the_limit, 2 ) if the_sieve[ p ] ]
 
-            return rabin_miller( the_number )
-    return False
+        SIEVE_PRIMES[ the_limit ] = ( primes,
+                                      [ ( p + 1 ) >> 1 for p in primes ] )
+
+    return SIEVE_PRIMES[ the_limit ]
+
+def sieve_window( first_candidate, step, n_candidates, the_limit ) :
+    """
+    The candidates are first_candidate + i * step, step is 2 or -2, for
+    i in range( n_candidates ).  Returns a bytearray with a 1 for each
+    candidate that no odd prime below the_limit divides.
+
+    Every candidate must be at least the_limit, else a prime strikes
+    itself.
+    """
+    primes, halves = sieve_primes( the_limit )
+
+    the_sieve = bytearray( b'\x01' ) * n_candidates
+    no_prime  = bytes( n_candidates )
+    for p, half in zip( primes, halves ) :
+        # the first i with p dividing the candidate, then every p-th
+        if step > 0 :
+            i = ( -first_candidate * half ) % p
+        else :
+            i = ( first_candidate * half ) % p
+
+        if i < n_candidates :
+            the_sieve[ i :: p ] = \
+                no_prime[ : ( n_candidates - 1 - i ) // p + 1 ]
+
+    return the_sieve
+
+def prime_search( begin_integer, step, witness_source=None ) :
+    """
+    The first prime at or beyond odd begin_integer in the direction of
+    step, 2 or -2, None after MAX_PRIME_CANDIDATES candidates.
+
+    Candidates are sieved a window at a time, only the survivors get
+    Rabin-Miller, with the witness_source as in rabin_miller().
+    """
+    # about three times the average gap between primes of this size
+    window    = max( 64, begin_integer.bit_length() )
+    the_limit = sieve_limit( begin_integer.bit_length() )
+
+    n = begin_integer
+    n_tried = 0
+    while n_tried < MAX_PRIME_CANDIDATES :
+        n_candidates = min( window, MAX_PRIME_CANDIDATES - n_tried )
+        last_candidate = n + ( n_candidates - 1 ) * step
+
+        if min( n, last_candidate ) < the_limit :
+            # too close to the sieve primes to sieve, one at a time
+            for _ in range( n_candidates ) :
+                if is_prime( n, witness_source ) :
+                    return n
+                n += step
+        else :
+            the_sieve = sieve_window( n, step, n_candidates, the_limit )
+            i = the_sieve.find( 1 )
+            while i >= 0 :
+                if rabin_miller( n + i * step,
+                                 witness_source=witness_source ) :
+                    return n + i * step
+                i = the_sieve.find( 1, i + 1 )
+            n += n_candidates * step
+
+        n_tried += n_candidates
+
+    return None
+
+def cached_prime_search( begin_integer, step, witness_source=None ) :
+    """
+    prime_search() through the PRIME_CACHE LRU.
+
+    The cache only holds searches with the default witnesses, which are a
+    pure function of the candidate.  An explicit witness_source is the
+    caller's state, those searches always run.
+    """
+    if witness_source is not None :
+        return prime_search( begin_integer, step, witness_source )
+
+    key = ( begin_integer, step )
+    if key in PRIME_CACHE :
+        # most recent goes last
+        the_prime = PRIME_CACHE.pop( key )
+    else :
+        the_prime = prime_search( begin_integer, step )
+        if the_prime is None :
+            return None
+
+        if len( PRIME_CACHE ) >= PRIME_CACHE_SIZE :
+            del PRIME_CACHE[ next( iter( PRIME_CACHE ) ) ]
+
+    PRIME_CACHE[ key ] = the_prime
+
+    return the_prime
 
 def generate_large_prime(k):
     """
@@ -200,10 +415,13 @@ def generate_large_prime(k):
 
     return "Failure after "+ str( r_ ) + " tries."
 
-def get_next_higher_prime( beginning_integer ) :
+def get_next_higher_prime( beginning_integer, witness_source=None ) :
     """
         Begins searching for a prime at the beginning_integer, returns
         the first one found.
+
+        With the default witness_source the result depends only on
+        beginning_integer, see rabin_miller().
     """
     # if a negative number, the question is, how can it be negative?
     # Python integers have to be negative coming in, it isn't an
@@ -220,22 +438,22 @@ def get_next_higher_prime( beginning_integer ) :
     else :
         n = begin_integer + 1
 
-    # assume there will be a prime within 1000 * 2
-    # is_prime guarantees 64 tries of Rabin-Miller
-    for _ in range( 10000 ) :   
-        if is_prime( n ) :
-            return n
-        else :
-            n += 2
+    # assume there will be a prime within 10000 * 2
+    the_prime = cached_prime_search( n, 2, witness_source )
+    if the_prime is not None :
+        return the_prime
 
     print( "Failure after 1000 tries." )
     print( "begin_integer = ", hex( begin_integer ) )
     evoutils.print_stacktrace()
 
-def get_next_lower_prime( beginning_integer ) :
+def get_next_lower_prime( beginning_integer, witness_source=None ) :
     """
         Begins searching down for a prime at the beginning_integer, returns
         the first one found.
+
+        With the default witness_source the result depends only on
+        beginning_integer, see rabin_miller().
     """
     # if a negative number, the question is, how can it be negative?
     # Python integers have to be negative coming in, it isn't an
@@ -252,13 +470,10 @@ def get_next_lower_prime( beginning_integer ) :
     else :
         n = begin_integer - 1
 
-    # assume there will be a prime within 1000 * 2
-    # is_prime guarantees 64 tries of Rabin-Miller
-    for _ in range( 10000 ) :   
-        if is_prime( n ) :
-            return n
-        else :
-            n -= 2
+    # assume there will be a prime within 10000 * 2
+    the_prime = cached_prime_search( n, -2, witness_source )
+    if the_prime is not None :
+        return the_prime
 
     print( "Failure after 1000 tries." )
     print( "begin_integer = ", hex( begin_integer ) )
@@ -41,12 +41,40 @@ import evoutils
 from array        import array
 from evofolds     import FoldInteger
 from evohashes    import HASHES
-from evoprngutils import generate_constants
+from evoprngutils import constant_table
 from evornt       import RNT
 from evoprimes    import get_next_higher_prime
 
 #SINGLE_PROGRAM_FROM_HERE
 
+# How LCG.__init__ seeds its integer vector.  LEGACY hashes every element
+# before the new one again for each new one, n_integers**2 / 2 hash
+# updates, and every keystream so far depends on it. CHAINED hashes only
+# the element just before, the hash state already has all the others.
+LCG_SEEDING_LEGACY  = 0
+LCG_SEEDING_CHAINED = 1
+
+LCG_SEEDING = LCG_SEEDING_LEGACY
+
+def set_lcg_seeding( seeding_version ) :
+    """
+    Selects the seeding of every LCG constructed from now on. Both ends
+    have to use the same one, like the password.
+    """
+    global LCG_SEEDING
+
+    if seeding_version not in [ LCG_SEEDING_LEGACY, LCG_SEEDING_CHAINED ] :
+        print( "unknown LCG seeding version", seeding_version )
+        sys.exit( 0 )
+
+    LCG_SEEDING = seeding_version
+
+def lcg_seeding() :
+    """
+    The seeding version LCGs constructed now get.
+    """
+    return LCG_SEEDING
+
 #
 # PRNGs that are not crypto quality, but which can be used to compose the
 # crypto versions. 
@@ -102,19 +130,14 @@ class PRNGs() :
         list, in round-robin order.
         
         """
-        self.prng_functions       = [ LCG, KnuthMMIX, KnuthNewLib,
-                                      LongPeriod5, LongPeriod256,
-                                      CMWC4096, MultiplyAdd00,
-                                      MultiplyAdd01, MultiplyAdd03
-                                    ]
+        # a copy of the shared registry, so no instance can reorder
+        # another's.  This used to build an RNT from a constant "internal
+        # password" on every call to scramble the list, but scramble_list()
+        # returns the new order and that was dropped, so the order was
+        # always the registry's and the RNT was pure construction cost.
+        self.prng_functions       = list( PRNG_FUNCTIONS )
         self.next_prng_index      = 0
 
-        # not useless, calculated entropy can only be known to an opponent
-        # if they also have the random number table
-        the_rnt = RNT( 4096, "internal password", "desktop", 1 )
-
-        the_rnt.scramble_list( self.prng_functions )
-
     def name( self ) :
         """
         Returns the string name, debugging.
@@ -488,6 +511,7 @@ class LCG():
         self.constant             = constant
         self.lag                  = lag
         self.index                = 0
+        self.seeding_version      = LCG_SEEDING
 
         if integer_width < 64 :    # bad, so apply paranoia
             print( "integer widths less than 64 bits are prohibited!" )
@@ -536,11 +560,18 @@ class LCG():
 
         the_hash.update( xor_result )
 
+        width_in_whole_bytes = ( self.width_in_bits + 7 ) >> 3
         for vector_index in range( self.integer_vector_size ) :
 
-            # the hash of the previous part of the array
-            for int_index in range( vector_index ) :
-                the_hash.update( str( self.integer_vector[ int_index ] ) )
+            if self.seeding_version == LCG_SEEDING_LEGACY :
+                # the hash of the previous part of the array
+                for int_index in range( vector_index ) :
+                    the_hash.update( str( self.integer_vector[ int_index ] ) )
+
+            elif vector_index > 0 :
+                # the hash already has the rest of the previous part
+                the_hash.update( self.integer_vector[ vector_index - 1 ]
+                                 .to_bytes( width_in_whole_bytes, 'big' ) )
 
             integer_hash = the_hash.intdigest()
             integer_hash = self.the_fold.fold_it( integer_hash,
@@ -631,13 +662,18 @@ class LCG():
             # debug from here
             # this happens for 128-bit values? and the vector does not
             # have any zeros? WTF?
-            self.dump_state()
-            print( "Zero or all_ffs return value" )
-            print( "before_the_fold  = ", hex( before_the_fold ) )
-            print( "the return_value = ", hex( return_value ) )
-            print( "the_fold = ", self.the_fold )
-            print( traceback.extract_stack() )
-            sys.stdout.flush()
+            # For bytes it is 1 in 128, expected, not worth a dump.
+            # stderr, stdout can be the cipher text.
+            if bit_width > 8 :
+                self.dump_state()
+                sys.stderr.write( "Zero or all_ffs return value\n" )
+                sys.stderr.write( "before_the_fold  = " +
+                                  hex( before_the_fold ) + '\n' )
+                sys.stderr.write( "the return_value = " +
+                                  hex( return_value ) + '\n' )
+                sys.stderr.write( "the_fold = " + str( self.the_fold ) + '\n' )
+                sys.stderr.write( str( traceback.extract_stack() ) + '\n' )
+                sys.stderr.flush()
             # debug to here
             return_value = self.next( bit_width, steps )
 
@@ -649,7 +685,7 @@ class LCG():
         Debug code
         """
         for element in self.integer_vector :
-            print( hex( element ) + '\n' )
+            sys.stderr.write( hex( element ) + '\n' )
 
 class MultiplyAdd00( LCG ) :
     """
@@ -942,10 +978,10 @@ class MultiplyAdd03( MultiplyAdd02 ) :
 #                                            integer_width )
 #        entropy_bits = folded_hash_of_state ^ rnt.password_hash
 
-        constant_generator = generate_constants( rnt, self.integer_width, 
-                                                 self.n_integers )
-        for _ in range( n_integers ) :
-            multiplier, addition, lag, delta = next( constant_generator )
+        the_constants = constant_table( rnt, self.integer_width,
+                                        self.n_integers )
+        for i in range( n_integers ) :
+            multiplier, addition, lag, delta = the_constants[ i ]
             self.multipliers.append( multiplier )
             self.additions.append(   addition )
 
@@ -1081,6 +1117,13 @@ class MultiplyAdd04( MultiplyAdd03 ) :
                                                              # 0s in low byte
         return return_value
 
+#
+# The registry of PRNGs, in the order PRNGs.next() hands them out.  Built
+# once at import, like HASH_FUNCTIONS in evohashes.
+#
+PRNG_FUNCTIONS = [ LCG, KnuthMMIX, KnuthNewLib, LongPeriod5, LongPeriod256,
+                   CMWC4096, MultiplyAdd00, MultiplyAdd01, MultiplyAdd03 ]
+
         
 def byte_rate( the_function, result_width, n_values ) :
     """
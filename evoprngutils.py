@@ -24,17 +24,23 @@ ODO :
 """
 
 import sys
+import os
 import getopt
-import evoprimes 
+import hashlib
 from   evofolds  import FoldInteger
+from   evoprimes import get_next_higher_prime
 from   evohashes import HASHES
+from   evornt    import pack_rnt_values, unpack_rnt_values, is_private, \
+                        rnt_program_digest
+from   evoutils  import debug
 
 #SINGLE_PROGRAM_FROM_HERE
 
-def generate_constants( the_rnt, integer_width, n_prngs ) :
+def constants_seed( the_rnt, integer_width, n_prngs ) :
     """
-    computes big_prime, the multiplier, small_prime, the addition, and
-    the lag
+    The entropy every constant generate_constants() yields is computed
+    from.  This is all it draws from the_rnt, the prime searches after
+    it depend on nothing else.
     """
     the_fold            = FoldInteger( )
     # hash_depth should be differently different than vector_depth
@@ -51,6 +57,12 @@ def generate_constants( the_rnt, integer_width, n_prngs ) :
     folded_hash_of_state = \
             the_fold.fold_it( hash_of_state, integer_width )
 
+    return folded_hash_of_state ^ the_rnt.password_hash
+
+def constants_from_seed( entropy_bits, integer_width, n_prngs ) :
+    """
+    generate_constants() from its constants_seed().
+    """
     # multipliers and additive constants :
     # need 2 series of primes a good distance apart, say the low
     # range beginning from low at 10% to high at 40 and high range
@@ -59,15 +71,13 @@ def generate_constants( the_rnt, integer_width, n_prngs ) :
     # need the entropy mixed into this.
     # return multiplier, constant, lag, increment
 
-    entropy_bits = folded_hash_of_state ^ the_rnt.password_hash
-
     max_integer = 1 << integer_width
 
     while entropy_bits < max_integer :
-        entropy_bits *= evoprimes.get_next_higher_prime( entropy_bits )
+        entropy_bits *= get_next_higher_prime( entropy_bits )
 
     # we need entropy bits to more bits than 3 * n_prngs
-    entropy_bits *= evoprimes.get_next_higher_prime( entropy_bits )
+    entropy_bits *= get_next_higher_prime( entropy_bits )
 
     the_multiplier   = entropy_bits % int( max_integer * .9 )
 
@@ -79,12 +89,12 @@ def generate_constants( the_rnt, integer_width, n_prngs ) :
     the_increment    = int( ( the_multiplier * .3 ) / n_prngs )
 
     for _ in range( n_prngs ) :
-        the_multiplier   = evoprimes.get_next_higher_prime( the_multiplier )
-        the_addition     = evoprimes.get_next_higher_prime( the_addition )
-        the_increment    = evoprimes.get_next_higher_prime( the_increment )
+        the_multiplier   = get_next_higher_prime( the_multiplier )
+        the_addition     = get_next_higher_prime( the_addition )
+        the_increment    = get_next_higher_prime( the_increment )
         # another bit of complexity for code breakers
-        entropy_bits     = evoprimes.get_next_higher_prime( entropy_bits +
-                                                      the_increment >> 4 )
+        entropy_bits     = get_next_higher_prime( entropy_bits +
+                                                  the_increment >> 4 )
 
         yield the_multiplier, the_addition, the_lag, the_increment
 
@@ -94,6 +104,246 @@ def generate_constants( the_rnt, integer_width, n_prngs ) :
         the_addition   += the_increment
         the_lag        += 2
 
+def generate_constants( the_rnt, integer_width, n_prngs ) :
+    """
+    computes big_prime, the multiplier, small_prime, the addition, and
+    the lag
+    """
+    entropy_bits = constants_seed( the_rnt, integer_width, n_prngs )
+    yield from constants_from_seed( entropy_bits, integer_width, n_prngs )
+
+# Cache files, a magic string, the tagged values, a sha256 of both.
+CONSTANTS_MAGIC = b'EVOCONS2'
+DRAWS_MAGIC     = b'EVODRAW1'
+
+# ( integer_width, n_prngs, constants_seed() ) : constants, least
+# recently used first
+CONSTANTS_CACHE      = {}
+CONSTANTS_CACHE_SIZE = 256
+
+# key : RNT draw state after, for rnt_advance()
+DRAWS_CACHE          = {}
+
+# None is no persisted cache, set_constants_cache() to a directory turns
+# it on.
+CONSTANTS_CACHE_DIR  = None
+
+# what cache file names are computed from, once per process
+PROGRAM_DIGEST       = None
+
+def set_constants_cache( cache_dir ) :
+    """
+    Turns the on-disk constants cache on, in cache_dir, or off with None.
+
+    The constants are derived from the password, so the directory is
+    created owner-only and only used if nobody else can read it.
+    """
+    global CONSTANTS_CACHE_DIR
+
+    if cache_dir is not None :
+        os.makedirs( cache_dir, mode=0o700, exist_ok=True )
+        os.chmod( cache_dir, 0o700 )
+
+    CONSTANTS_CACHE_DIR = cache_dir
+
+def rnt_state_key( the_rnt, the_parameters ) :
+    """
+    A digest of the RNT's table, settings and draw state, and
+    the_parameters, a tuple of whatever else the result depends on.
+    """
+    the_hash = hashlib.sha256( the_rnt.rnt_bytes )
+    the_hash.update( repr( ( the_rnt.password_hash, the_rnt.system_type,
+                             the_rnt.paranoia_level,
+                             the_rnt.bit_string_version,
+                             the_rnt.draw_state(),
+                             the_parameters ) ).encode( 'utf8' ) )
+
+    return the_hash.hexdigest()
+
+def program_digest() :
+    """
+    sha512 of the code of the PRNG modules, or of the single-file
+    program, read once.
+    """
+    global PROGRAM_DIGEST
+
+    if PROGRAM_DIGEST is None :
+        source_files = set()
+        for module_name in [ generate_constants.__module__, 'evoprimes',
+                             'evoprngs', 'evocprngs' ] :
+            the_file = getattr( sys.modules.get( module_name ), '__file__',
+                                None )
+            if the_file :
+                source_files.add( the_file )
+
+        the_hash = hashlib.sha512( rnt_program_digest() )
+        for the_file in sorted( source_files ) :
+            with open( the_file, 'rb' ) as source_fd :
+                the_hash.update( source_fd.read() )
+        PROGRAM_DIGEST = the_hash.digest()
+
+    return PROGRAM_DIGEST
+
+def cache_file_name( cache_dir, the_key, the_suffix ) :
+    """
+    The cache file for the_key, which changes with the code of the
+    PRNG modules, or of the single-file program.
+    """
+    the_hash = hashlib.sha512( program_digest() )
+    the_hash.update( the_key.encode( 'utf8' ) )
+
+    return os.path.join( cache_dir, the_hash.hexdigest()[ : 64 ] +
+                         the_suffix )
+
+def read_cache_file( the_file_name, the_magic, n_values ) :
+    """
+    Returns the list of n_values from a cache file, None if there is no
+    good one.
+    """
+    if not os.path.isfile( the_file_name ) or \
+       not is_private( CONSTANTS_CACHE_DIR ) or \
+       not is_private( the_file_name ) :
+        return None
+
+    try :
+        with open( the_file_name, 'rb' ) as cache_fd :
+            the_bytes = cache_fd.read()
+
+        the_body = the_bytes[ : -32 ]
+        if the_body[ : len( the_magic ) ] != the_magic or \
+           hashlib.sha256( the_body ).digest() != the_bytes[ -32 : ] :
+            raise ValueError( "not an intact cache file" )
+
+        the_values, offset = unpack_rnt_values( the_body, len( the_magic ),
+                                                n_values )
+        if offset != len( the_body ) :
+            raise ValueError( "cache file has trailing data" )
+
+    except ( IOError, ValueError, IndexError ) as msg :
+        debug( "read_cache_file : bad cache entry", str( msg ), 5 )
+        return None
+
+    return the_values
+
+def write_cache_file( the_file_name, the_magic, the_values ) :
+    """
+    Writes a cache file, owner-only, write then rename so a reader never
+    sees half a file.  Failing to is not an error.
+    """
+    if not is_private( CONSTANTS_CACHE_DIR ) :
+        return
+
+    the_body = the_magic + pack_rnt_values( the_values )
+
+    temp_file_name = the_file_name + '.' + str( os.getpid() )
+    try :
+        cache_fd = os.open( temp_file_name,
+                            os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600 )
+        with os.fdopen( cache_fd, 'wb' ) as cache_file :
+            cache_file.write( the_body + hashlib.sha256( the_body ).digest() )
+        os.replace( temp_file_name, the_file_name )
+    except OSError as msg :
+        debug( "write_cache_file : could not write the cache",
+               str( msg ), 5 )
+        if os.path.exists( temp_file_name ) :
+            os.remove( temp_file_name )
+
+def cache_lookup( the_cache, the_key ) :
+    """
+    The entry for the_key, made the most recent, None if there isn't one.
+    """
+    if the_key not in the_cache :
+        return None
+
+    # most recent goes last
+    the_entry = the_cache.pop( the_key )
+    the_cache[ the_key ] = the_entry
+
+    return the_entry
+
+def cache_store( the_cache, the_key, the_entry ) :
+    """
+    Adds the_entry, dropping the least recently used past
+    CONSTANTS_CACHE_SIZE.
+    """
+    if len( the_cache ) >= CONSTANTS_CACHE_SIZE :
+        del the_cache[ next( iter( the_cache ) ) ]
+
+    the_cache[ the_key ] = the_entry
+
+def constant_table( the_rnt, integer_width, n_prngs ) :
+    """
+    The n_prngs ( multiplier, addition, lag, increment ) tuples
+    generate_constants() yields, as a list, and the_rnt left exactly as
+    generate_constants() leaves it.
+
+    The draws from the_rnt are always made, by constants_seed(), and
+    the prime searches are memoized on what they depend on,
+    integer_width, n_prngs and that seed, in CONSTANTS_CACHE and, if
+    set_constants_cache() turned it on, on disk.  Generators built from
+    the same password at the same point share them.
+    """
+    entropy_bits = constants_seed( the_rnt, integer_width, n_prngs )
+    the_key      = ( integer_width, n_prngs, entropy_bits )
+
+    the_constants = cache_lookup( CONSTANTS_CACHE, the_key )
+    if the_constants is None :
+        if CONSTANTS_CACHE_DIR is not None :
+            the_file_name = cache_file_name( CONSTANTS_CACHE_DIR,
+                                             repr( the_key ), '.constants' )
+            the_values = read_cache_file( the_file_name, CONSTANTS_MAGIC, 1 )
+            if the_values is not None :
+                the_constants = [ tuple( these_constants )
+                                  for these_constants in the_values[ 0 ] ]
+
+        if the_constants is None :
+            the_constants = list( constants_from_seed( entropy_bits,
+                                                       integer_width,
+                                                       n_prngs ) )
+
+            if CONSTANTS_CACHE_DIR is not None :
+                write_cache_file( the_file_name, CONSTANTS_MAGIC,
+                                  [ [ list( these_constants )
+                                      for these_constants in
+                                      the_constants ] ] )
+
+        cache_store( CONSTANTS_CACHE, the_key, the_constants )
+
+    return list( the_constants )
+
+def rnt_advance( the_rnt, the_parameters, draw_function ) :
+    """
+    Leaves the_rnt exactly as draw_function() would, for code that needs
+    the RNT's state afterwards but not what draw_function() built.
+
+    The_parameters is a tuple of everything besides the RNT that
+    draw_function() depends on.  Memoized on rnt_state_key(), in
+    DRAWS_CACHE and, if set_constants_cache() turned it on, on disk.
+    On a miss draw_function() is called and what it returns dropped.
+    """
+    the_key = rnt_state_key( the_rnt, the_parameters )
+
+    the_draw_state = cache_lookup( DRAWS_CACHE, the_key )
+    if the_draw_state is None :
+        if CONSTANTS_CACHE_DIR is not None :
+            the_file_name = cache_file_name( CONSTANTS_CACHE_DIR, the_key,
+                                             '.draws' )
+            the_values = read_cache_file( the_file_name, DRAWS_MAGIC, 1 )
+            if the_values is not None :
+                the_draw_state = the_values[ 0 ]
+
+        if the_draw_state is None :
+            draw_function()
+            the_draw_state = the_rnt.draw_state()
+
+            if CONSTANTS_CACHE_DIR is not None :
+                write_cache_file( the_file_name, DRAWS_MAGIC,
+                                  [ the_draw_state ] )
+
+        cache_store( DRAWS_CACHE, the_key, the_draw_state )
+
+    the_rnt.set_draw_state( the_draw_state )
+
 #SINGLE_PROGRAM_TO_HERE
 
 def usage() :
@@ -33,6 +33,8 @@ import copy
 import getopt
 import random
 import time
+import hashlib
+import struct
 from array     import array
 from evoutils  import debug, print_stacktrace, print_stacktrace_exit
 from evofolds  import FoldInteger
@@ -317,6 +319,13 @@ N_K_RANDOM_BYTES = [
 # the maximum integer size for this program
 MAX_INTEGER_BIT_WIDTH = 1024
 
+# How bit_string_from_randoms() reads a field that spans more than 2
+# words. The original read words w, w+1, w+3, w+6 ... ( 'word_index += i' )
+# and every keystream so far depends on that, so it stays the default.
+# CONTIGUOUS is the bit string the docstring describes.
+RNT_BIT_STRING_LEGACY     = 0
+RNT_BIT_STRING_CONTIGUOUS = 1
+
 class WichmannHill(object):
     """
     An implementation of the Wichmann-Hill pseudo-random number generator.
@@ -493,7 +502,7 @@ class RNT() :
     """
 
     def __init__( self, desired_rnt_bytes, passphrase, system_type,
-                  paranoia_level ) :
+                  paranoia_level, bit_string_version=RNT_BIT_STRING_LEGACY ) :
         """
         Transforms the password into random integers within certain bounds
         with a mechansism that ties it to this particular program.
@@ -520,9 +529,13 @@ class RNT() :
 
         self.desired_bytes  = desired_rnt_bytes
 
+        self.bit_string_version = bit_string_version
+
         # always begin with the static text identifying this program
         # the Password will produce a new rnt
-        self.rnt = copy.deepcopy( N_K_RANDOM_BYTES )
+        self.rnt       = None
+        self.rnt_bytes = None
+        self.set_table( copy.deepcopy( N_K_RANDOM_BYTES ) )
 
         # if the size of the rnt is changed, there is a boot-strap problem.
         # I am ignoring that, it is currently 8K in my tests. It can be
@@ -589,7 +602,8 @@ class RNT() :
 
             self.password_hash += self.hash.intdigest()
 
-            self.rnt = self.new_rnt( self.password_hash, self.desired_bytes )
+            self.set_table( self.new_rnt( self.password_hash,
+                                          self.desired_bytes ) )
 
         # At long last, initialization is complete, having burned enough
         # processor instructions over enough different functions that it
@@ -646,6 +660,16 @@ class RNT() :
 
         return return_list
 
+    def set_table( self, the_table ) :
+        """
+        Installs a new table of 64-bit words. The words are kept as a
+        list, and as one bytes string, most significant byte first, which
+        is the one long string of bits bit_string_from_randoms() reads.
+        """
+        self.rnt       = the_table
+        self.rnt_bytes = b''.join( [ the_word.to_bytes( 8, 'big' )
+                                     for the_word in the_table ] )
+
     def bit_string_from_randoms( self, rnt_bit_index, field_width ) :
         """
         returns the consecutive field_width bits beginning with rnt_bit_index
@@ -655,25 +679,48 @@ class RNT() :
         In fact, it is important to have some extra words because I
         don't check bounds in any of the accesses, they can run over the
         end of the 4KB. So I think I add 32 words, way more than enough.
+
+        The field is one slice of rnt_bytes and one int.from_bytes, no
+        Python loop over words.  Fields wider than 2 words are read the
+        legacy way unless bit_string_version is CONTIGUOUS, see
+        RNT_BIT_STRING_LEGACY.
         """
         if isinstance( self.rnt, type( None ) ) :
             print_stacktrace_exit( " self.rnt is NoneType", self.rnt )
 
         rnt_bit_index %= self.rnt_bit_size
 
+        bit_offset = rnt_bit_index & 0x07
+        if field_width + ( rnt_bit_index & 0x3f ) >= 128 and \
+           self.bit_string_version == RNT_BIT_STRING_LEGACY :
+            return self.legacy_bit_string( rnt_bit_index, field_width )
+
+        byte_index = rnt_bit_index >> 3
+        n_bytes    = ( bit_offset + field_width + 7 ) >> 3
+
+        the_bytes = self.rnt_bytes[ byte_index : byte_index + n_bytes ]
+        if len( the_bytes ) != n_bytes :
+            print_stacktrace_exit( "bit_string_from_randoms : past the end",
+                                   ( rnt_bit_index, field_width ) )
+
+        bits = int.from_bytes( the_bytes, 'big' )
+
+        return ( bits >> ( ( n_bytes << 3 ) - bit_offset - field_width ) ) & \
+               ( ( 1 << field_width ) - 1 )
+
+    def legacy_bit_string( self, rnt_bit_index, field_width ) :
+        """
+        The original word loop, for the fields wider than 2 words where
+        'word_index += i' skips words.  Kept so keystreams don't change.
+        """
         bit_offset = rnt_bit_index % 64
         word_index = rnt_bit_index >> 6
         consecutive_words = 1 + int ( ( field_width + bit_offset ) / 64 ) 
 
-#        print( "bit_string_from_randoms : ", self.desired_bytes,
-#                len( self.rnt ), rnt_bit_index )
-
         bits = 0
         for i in range( consecutive_words ) :
             word_index += i
             bits <<= 64
-
-#            assert word_index < self.rnt_bit_size/64, word_index
             bits += self.rnt[ word_index ]
 
         total_width = 64 * consecutive_words
@@ -916,6 +963,335 @@ class RNT() :
 
         return out_list
 
+    def snapshot( self ) :
+        """
+        Returns the complete state of an initialized RNT as bytes, so
+        restore_rnt() can skip the bootstrap.  That is the table and its
+        sizes, the indexes, the Wichmann-Hill seeds, the HASH0 vector,
+        the password_hash and the round-robin state of every fold,
+        everything that determines what the RNT produces next.
+
+        Anyone holding a snapshot can do anything the password can, so
+        treat it as the password.
+        """
+        the_state = [ self.desired_bytes, self.paranoia_level,
+                      self.system_type, self.rnt, self.rnt_bit_size,
+                      self.rnt_actual_bytes, self.rnt_bit_index_mask,
+                      self.bits_in_rnt_mask, self.fold.next_fold_index,
+                      self.wichmann.seeds, self.wichmann.paranoia_level,
+                      self.wichmann.fold.next_fold_index,
+                      self.password_hash, self.randint_hash,
+                      self.randint_index_0, self.randint_index_1,
+                      self.randint_index_2, self.randint_index_3,
+                      self.randint_function,
+                      self.hash.integer_width, self.hash.hash_depth,
+                      self.hash.next_index, self.hash.entropy_bits,
+                      self.hash.the_fold.next_fold_index,
+                      self.hash.integer_vector, self.bit_string_version ]
+
+        the_body = RNT_SNAPSHOT_MAGIC + pack_rnt_values( the_state )
+
+        return the_body + hashlib.sha256( the_body ).digest()
+
+    def draw_state( self ) :
+        """
+        The part of snapshot() that drawing from the RNT changes, the
+        indexes, the Wichmann-Hill seeds, the HASH0 vector and the fold
+        round robins, as a list.  The table and its sizes are fixed by
+        the password, system_type and paranoia_level.
+        """
+        return [ self.fold.next_fold_index,
+                 list( self.wichmann.seeds ),
+                 self.wichmann.fold.next_fold_index,
+                 self.randint_hash,
+                 self.randint_index_0, self.randint_index_1,
+                 self.randint_index_2, self.randint_index_3,
+                 self.randint_function,
+                 self.hash.next_index, self.hash.entropy_bits,
+                 self.hash.the_fold.next_fold_index,
+                 list( self.hash.integer_vector ) ]
+
+    def set_draw_state( self, the_state ) :
+        """
+        The inverse of draw_state(), the RNT continues from there.
+        """
+        self.fold.next_fold_index, wichmann_seeds, \
+            self.wichmann.fold.next_fold_index, self.randint_hash, \
+            self.randint_index_0, self.randint_index_1, \
+            self.randint_index_2, self.randint_index_3, \
+            self.randint_function, self.hash.next_index, \
+            self.hash.entropy_bits, self.hash.the_fold.next_fold_index, \
+            hash_vector = the_state
+
+        self.wichmann.seeds       = list( wichmann_seeds )
+        self.hash.integer_vector  = list( hash_vector )
+        self.hash.reset_digest()
+
+# RNT snapshots, a magic string, the tagged values, a sha256 of both.
+RNT_SNAPSHOT_MAGIC = b'EVORNT01'
+
+# None is no cache, set_rnt_cache() to a directory turns it on.
+RNT_CACHE_DIR = None
+
+def pack_rnt_values( the_values ) :
+    """
+    Packs a list of ints, floats, strs and lists of those into bytes,
+    each value a one byte tag and its data.  Lists of 64-bit unsigned
+    integers, the tables, are packed as 8-byte words.
+
+    No pickle, a cache file must not be able to run code.
+    """
+    packed = bytearray()
+    for the_value in the_values :
+        if isinstance( the_value, bool ) :
+            print_stacktrace_exit( "pack_rnt_values : bool", the_value )
+
+        if isinstance( the_value, int ) :
+            the_bytes = the_value.to_bytes(
+                            ( the_value.bit_length() + 8 ) // 8, 'little',
+                            signed=True )
+            packed += b'i' + struct.pack( '<I', len( the_bytes ) ) + the_bytes
+
+        elif isinstance( the_value, float ) :
+            packed += b'f' + struct.pack( '<d', the_value )
+
+        elif isinstance( the_value, str ) :
+            the_bytes = the_value.encode( 'utf8' )
+            packed += b's' + struct.pack( '<I', len( the_bytes ) ) + the_bytes
+
+        elif isinstance( the_value, list ) :
+            if all( isinstance( element, int ) and
+                    0 <= element < ( 1 << 64 ) for element in the_value ) :
+                packed += b'w' + struct.pack( '<I', len( the_value ) )
+                packed += b''.join( [ element.to_bytes( 8, 'little' )
+                                      for element in the_value ] )
+            else :
+                packed += b'l' + struct.pack( '<I', len( the_value ) )
+                packed += pack_rnt_values( the_value )
+        else :
+            print_stacktrace_exit( "pack_rnt_values : can't pack",
+                                   type( the_value ) )
+
+    return bytes( packed )
+
+def unpack_rnt_values( packed, offset, n_values ) :
+    """
+    The inverse of pack_rnt_values(), n_values beginning at offset.
+
+    Returns the list of values and the offset following them.
+    Raises ValueError on anything it does not recognize.
+    """
+    the_values = []
+    for _ in range( n_values ) :
+        the_tag = packed[ offset : offset + 1 ]
+        offset += 1
+
+        if the_tag in ( b'i', b's', b'w', b'l' ) :
+            the_length, = struct.unpack_from( '<I', packed, offset )
+            offset += 4
+
+        if the_tag == b'i' :
+            the_values.append( int.from_bytes( packed[ offset :
+                                                       offset + the_length ],
+                                               'little', signed=True ) )
+            offset += the_length
+
+        elif the_tag == b'f' :
+            the_values.append( struct.unpack_from( '<d', packed, offset )[ 0 ] )
+            offset += 8
+
+        elif the_tag == b's' :
+            the_values.append(
+                packed[ offset : offset + the_length ].decode( 'utf8' ) )
+            offset += the_length
+
+        elif the_tag == b'w' :
+            the_words = packed[ offset : offset + 8 * the_length ]
+            if len( the_words ) != 8 * the_length :
+                raise ValueError( "truncated RNT snapshot" )
+            the_values.append( [ int.from_bytes( the_words[ i : i + 8 ],
+                                                 'little' )
+                                 for i in range( 0, len( the_words ), 8 ) ] )
+            offset += 8 * the_length
+
+        elif the_tag == b'l' :
+            the_list, offset = unpack_rnt_values( packed, offset, the_length )
+            the_values.append( the_list )
+
+        else :
+            raise ValueError( "unknown tag in RNT snapshot" )
+
+    if offset > len( packed ) :
+        raise ValueError( "truncated RNT snapshot" )
+
+    return the_values, offset
+
+def restore_rnt( the_snapshot ) :
+    """
+    Rebuilds an RNT from RNT.snapshot() without the bootstrap. The
+    restored RNT produces exactly what the original would have from
+    the moment of the snapshot.
+
+    Raises ValueError for anything that isn't an intact snapshot.
+    """
+    the_snapshot = bytes( the_snapshot )
+    magic_length = len( RNT_SNAPSHOT_MAGIC )
+    if len( the_snapshot ) < magic_length + 32 or \
+       the_snapshot[ : magic_length ] != RNT_SNAPSHOT_MAGIC :
+        raise ValueError( "not an RNT snapshot" )
+
+    the_body = the_snapshot[ : -32 ]
+    if hashlib.sha256( the_body ).digest() != the_snapshot[ -32 : ] :
+        raise ValueError( "RNT snapshot is corrupted" )
+
+    the_state, offset = unpack_rnt_values( the_body, magic_length, 26 )
+    if offset != len( the_body ) :
+        raise ValueError( "RNT snapshot has trailing data" )
+
+    the_rnt = RNT.__new__( RNT )
+
+    the_rnt.desired_bytes, the_rnt.paranoia_level, the_rnt.system_type, \
+        the_rnt.rnt, the_rnt.rnt_bit_size, the_rnt.rnt_actual_bytes, \
+        the_rnt.rnt_bit_index_mask, the_rnt.bits_in_rnt_mask, \
+        fold_index, wichmann_seeds, wichmann_paranoia, wichmann_fold_index, \
+        the_rnt.password_hash, the_rnt.randint_hash, \
+        the_rnt.randint_index_0, the_rnt.randint_index_1, \
+        the_rnt.randint_index_2, the_rnt.randint_index_3, \
+        the_rnt.randint_function, \
+        hash_width, hash_depth, hash_next_index, hash_entropy_bits, \
+        hash_fold_index, hash_vector, the_rnt.bit_string_version = the_state
+
+    the_rnt.set_table( the_rnt.rnt )
+
+    the_rnt.fold = FoldInteger()
+    the_rnt.fold.next_fold_index = fold_index
+
+    the_rnt.wichmann = WichmannHill( wichmann_seeds, wichmann_paranoia )
+    the_rnt.wichmann.fold.next_fold_index = wichmann_fold_index
+
+    # HASH0's __init__ draws from the rnt, so build it bare as well
+    the_rnt.hash = HASH0.__new__( HASH0 )
+    the_rnt.hash.rnt              = the_rnt
+    the_rnt.hash.integer_width    = hash_width
+    the_rnt.hash.hash_depth       = hash_depth
+    the_rnt.hash.max_integer      = 1 << hash_width
+    the_rnt.hash.max_integer_mask = the_rnt.hash.max_integer - 1
+    the_rnt.hash.next_index       = hash_next_index
+    the_rnt.hash.entropy_bits     = hash_entropy_bits
+    the_rnt.hash.integer_vector   = hash_vector
+    the_rnt.hash.backup_vector    = []
+    the_rnt.hash.reset_digest()
+    the_rnt.hash.the_fold         = FoldInteger()
+    the_rnt.hash.the_fold.next_fold_index = hash_fold_index
+
+    return the_rnt
+
+def set_rnt_cache( cache_dir ) :
+    """
+    Turns the on-disk RNT cache on, in cache_dir, or off with None.
+
+    The directory is created owner-only. The cache holds the equivalent
+    of passwords, so it is only used if nobody else can read it.
+    """
+    global RNT_CACHE_DIR
+
+    if cache_dir is not None :
+        os.makedirs( cache_dir, mode=0o700, exist_ok=True )
+        os.chmod( cache_dir, 0o700 )
+
+    RNT_CACHE_DIR = cache_dir
+
+def rnt_program_digest() :
+    """
+    sha512 of the source of the code an RNT is built by, so a cache
+    entry is never used by a different program or a new generation with
+    a new N_K_RANDOM_BYTES.  In the single-file program that is the
+    program itself.
+    """
+    the_hash = hashlib.sha512()
+    source_files = []
+    for the_class in [ RNT, HASH0, FoldInteger ] :
+        the_module = sys.modules.get( the_class.__module__ )
+        the_file = getattr( the_module, '__file__', None )
+        if the_file and the_file not in source_files :
+            source_files.append( the_file )
+
+    for the_file in sorted( source_files ) :
+        with open( the_file, 'rb' ) as source_fd :
+            the_hash.update( source_fd.read() )
+
+    return the_hash.digest()
+
+def rnt_cache_file_name( cache_dir, desired_rnt_bytes, passphrase,
+                         system_type, paranoia_level,
+                         bit_string_version=RNT_BIT_STRING_LEGACY ) :
+    """
+    The cache file for these parameters. The name is a digest, it
+    reveals nothing about the passphrase.
+    """
+    the_hash = hashlib.sha512( rnt_program_digest() )
+    the_hash.update( repr( ( desired_rnt_bytes, passphrase, system_type,
+                             paranoia_level, bit_string_version )
+                         ).encode( 'utf8' ) )
+
+    return os.path.join( cache_dir, the_hash.hexdigest()[ : 64 ] + '.rnt' )
+
+def is_private( the_path ) :
+    """
+    True if the_path is ours and no one else can read or write it.
+    """
+    the_stat = os.stat( the_path )
+    if hasattr( os, 'getuid' ) and the_stat.st_uid != os.getuid() :
+        return False
+
+    return ( the_stat.st_mode & 0o077 ) == 0
+
+def make_rnt( desired_rnt_bytes, passphrase, system_type, paranoia_level,
+              bit_string_version=RNT_BIT_STRING_LEGACY ) :
+    """
+    RNT( desired_rnt_bytes, passphrase, system_type, paranoia_level, ... ),
+    from the cache if set_rnt_cache() turned it on and there is a good
+    entry, otherwise built and, with the cache on, saved.
+
+    Any problem with a cache entry means it is rebuilt, never an error.
+    """
+    if RNT_CACHE_DIR is None :
+        return RNT( desired_rnt_bytes, passphrase, system_type,
+                    paranoia_level, bit_string_version )
+
+    cache_file_name = rnt_cache_file_name( RNT_CACHE_DIR, desired_rnt_bytes,
+                                           passphrase, system_type,
+                                           paranoia_level, bit_string_version )
+
+    if os.path.isfile( cache_file_name ) and \
+       is_private( RNT_CACHE_DIR ) and is_private( cache_file_name ) :
+        try :
+            with open( cache_file_name, 'rb' ) as cache_fd :
+                return restore_rnt( cache_fd.read() )
+        except ( IOError, ValueError ) as msg :
+            debug( "make_rnt : bad cache entry, rebuilding", str( msg ), 5 )
+
+    the_rnt = RNT( desired_rnt_bytes, passphrase, system_type, paranoia_level,
+                   bit_string_version )
+
+    if not is_private( RNT_CACHE_DIR ) :
+        return the_rnt
+
+    # write then rename, a reader never sees half a file
+    temp_file_name = cache_file_name + '.' + str( os.getpid() )
+    try :
+        cache_fd = os.open( temp_file_name,
+                            os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600 )
+        with os.fdopen( cache_fd, 'wb' ) as cache_file :
+            cache_file.write( the_rnt.snapshot() )
+        os.replace( temp_file_name, cache_file_name )
+    except OSError as msg :
+        debug( "make_rnt : could not write the cache", str( msg ), 5 )
+        if os.path.exists( temp_file_name ) :
+            os.remove( temp_file_name )
+
+    return the_rnt
+
 def clean_line( input_line ) :
     """
     Removes '\n', leading spaces and comments.
@@ -1000,6 +1376,26 @@ def rnt_rate( the_function, result_width, n_results ) :
     return ( n_results * ( result_width / 8 ) ) \
              / ( ending_time - beginning_time )
 
+def bit_string_rate( the_rnt, field_widths, n_fields ) :
+    """
+    Microbenchmark of bit_string_from_randoms, returns a list of
+    ( field_width, fields / second ) for each of field_widths, each
+    timed over n_fields fields at scattered bit indexes.
+    """
+    rates = []
+    for field_width in field_widths :
+        rnt_bit_index = 0
+        beginning_time = time.perf_counter()
+        for _ in range( n_fields ) :
+            rnt_bit_index += 0x3d95      # odd, so every bit offset is hit
+            the_rnt.bit_string_from_randoms( rnt_bit_index, field_width )
+        ending_time = time.perf_counter()
+
+        rates.append( ( field_width,
+                        n_fields / ( ending_time - beginning_time ) ) )
+
+    return rates
+
 
 #SINGLE_PROGRAM_TO_HERE
 
@@ -1109,6 +1505,16 @@ if __name__ == "__main__" :
         print( 'twister crypto byte rate = ',
                rnt_rate( THE_RNT.randint, 64, 1024*1024 ) )
 
+    if 'bit_string_rate' in TEST_LIST :
+        for THE_VERSION in [ RNT_BIT_STRING_LEGACY,
+                             RNT_BIT_STRING_CONTIGUOUS ] :
+            THE_RNT.bit_string_version = THE_VERSION
+            for FIELD_WIDTH, RATE in bit_string_rate( THE_RNT,
+                                                      [ 8, 64, 256, 1024 ],
+                                                      100000 ) :
+                print( 'bit_string_from_randoms version', THE_VERSION,
+                       FIELD_WIDTH, 'bits', int( RATE ), 'fields / second' )
+
 
     if 'next_random_value' in TEST_LIST :
         ENTROPY_BITS = 0XF3AF33210ED7FCA6F64C4C72488AC5DF
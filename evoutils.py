@@ -135,6 +135,30 @@ def print_stacktrace_exit( message, variable ) :
     debug( message, variable, 0 )
     sys.exit( 0 )
 
+def xor_combine( data_block, keystream_block ) :
+    """
+    The combine stage of the stream cipher, data xor keystream.
+
+    Returns bytes of len( data_block ), keystream_block must be at least
+    that long. Both are anything with the buffer protocol.
+
+    Both blocks become one very wide integer each, so the xor is one
+    C-level operation instead of a Python loop over bytes. Numpy would
+    do no better, and the single-file program has no dependencies.
+    """
+    n_bytes = len( data_block )
+    if n_bytes == 0 :
+        return b''
+
+    if len( keystream_block ) < n_bytes :
+        print_stacktrace_exit( "xor_combine : keystream shorter than data",
+                               ( len( keystream_block ), n_bytes ) )
+
+    the_xor = int.from_bytes( data_block, 'little' ) ^ \
+              int.from_bytes( keystream_block[ : n_bytes ], 'little' )
+
+    return the_xor.to_bytes( n_bytes, 'little' )
+
 #SINGLE_PROGRAM_TO_HERE
 
 def usage() :
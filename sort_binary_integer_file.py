@@ -23,209 +23,349 @@ This program has many entities, so uses overkill on the descriptivenss of
 names to avoid any confusion. Elegance is in the mind of the beholder, and
 code is read far more often than it is written, so I think it is elegant,
 in an overkill sort of way.
+
+Instead of --input, --generator, --password and --bytes read a stream
+from the evocorpus.py store, generated there the first time it is
+asked for.
+
+The file is memory-mapped, not read. With --chunk, a file larger than
+memory is sorted in chunks of that many integers and merged into the
+output, also memory-mapped.
 """
 #import io
 import os
 import sys
 import getopt
 import time
-import array
+import tempfile
 import numpy
+from evocorpus import make_corpus
 
 
-def extract_dups_and_special_values( the_sorted_numpy_array ) :
+def special_values( integer_width ) :
     """
-    Scan the array beginning to end, checking for duplicates, zeros,
-    ffs, and ??
+    The values that shouldn't come out of a generator, 0 and all ones at
+    integer_width bits.
     """
-    shape_tuple = the_sorted_numpy_array.shape
-    print( "shape_tuple of sorted numpy array = ", shape_tuple )
+    return [ 0x0, ( 1 << integer_width ) - 1 ]
 
-    number_of_sorted_integers = the_sorted_numpy_array.size
-    print( "number of integers in the sorted numpy array= ",
-           number_of_sorted_integers )
+def extract_dups_and_special_values( the_sorted_numpy_array,
+                                     integer_width=None ) :
+    """
+    Scan the sorted array for duplicates, out of order values, and the
+    special values, zeros and ffs at integer_width bits, the width of the
+    array's values by default.
+
+    Comparing the array with itself shifted by one does it all at once,
+    no loop in python, a 1e8 integer file takes seconds.
+
+    Returns a dictionary of arrays :
+        duplicate_indices    i, where [ i ] == [ i + 1 ]
+        duplicate_values     each value that is there more than once
+        duplicate_counts     how many times it is there
+        out_of_order_indices i, where [ i ] > [ i + 1 ]
+        special_indices      i, where [ i ] is a special value
+        special_values       those values
+    """
+    if integer_width is None :
+        integer_width = the_sorted_numpy_array.dtype.itemsize * 8
+
+    first_values  = the_sorted_numpy_array[ : -1 ]
+    second_values = the_sorted_numpy_array[ 1 : ]
+
+    duplicate_indices    = numpy.flatnonzero( first_values == second_values )
+    out_of_order_indices = numpy.flatnonzero( first_values > second_values )
+
+    # each extra copy is one duplicate index, so a value's count is one
+    # more than its number of duplicate indices
+    duplicate_values, duplicate_counts = numpy.unique(
+                         the_sorted_numpy_array[ duplicate_indices ],
+                         return_counts=True )
+    duplicate_counts += 1
+
+    special_mask = numpy.zeros( the_sorted_numpy_array.shape, dtype=bool )
+    for the_value in special_values( integer_width ) :
+        special_mask |= the_sorted_numpy_array == \
+                        the_sorted_numpy_array.dtype.type( the_value )
+    special_indices = numpy.flatnonzero( special_mask )
+
+    return { 'duplicate_indices'    : duplicate_indices,
+             'duplicate_values'     : duplicate_values,
+             'duplicate_counts'     : duplicate_counts,
+             'out_of_order_indices' : out_of_order_indices,
+             'special_indices'      : special_indices,
+             'special_values'       : the_sorted_numpy_array[
+                                                       special_indices ] }
+
+def report_dups_and_special_values( the_sorted_numpy_array, the_scan,
+                                    max_lines=20 ) :
+    """
+    Prints what extract_dups_and_special_values() found, the counts and
+    the first max_lines of each.
+    """
+    print( "number of integers in the sorted numpy array = ",
+           the_sorted_numpy_array.size )
 
     # sort produces low to high, this verifies that visually
-    print( hex( the_sorted_numpy_array[ 0 ] ),
-           hex( the_sorted_numpy_array[ 1 ] ),
-           hex( the_sorted_numpy_array[ 2 ] ),
-           hex( the_sorted_numpy_array[ 3 ] ) )
-
-    # list of tuples, ( i, dup )
-    list_of_dups                 = []
-    # list of tuples, ( i, first_value, second_value )
-    list_of_out_of_order_values  = []
-    # list of tuples, ( i, special value )
-    list_of_special_values       = []
-    for i in range( number_of_sorted_integers -1 ) :
-        if the_sorted_numpy_array[ i ] == the_sorted_numpy_array[ i + 1 ]  :
-            print( "dup at ", i, hex( the_sorted_numpy_array[ i ] ) )
-            sys.stdout.flush()
-            list_of_dups.append( ( i, hex( the_sorted_numpy_array[i] ) ) )
-
-        if the_sorted_numpy_array[ i ] > the_sorted_numpy_array[ i + 1 ]  :
-            print( "out_of_order at ", i, hex( the_sorted_numpy_array[ i ] ),
-                                          hex( the_sorted_numpy_array[ i + 1 ]))
-            sys.stdout.flush()
-            list_of_out_of_order_values.append( ( i,
-                                             hex( the_sorted_numpy_array[ i ] ),
-                                             hex( the_sorted_numpy_array[i+1])))
-
-
-        if the_sorted_numpy_array[ i ] == 0x0 or \
-            the_sorted_numpy_array[ i ] == 0xFFFFFFFFFFFFFFFFF  :
-            print( "0 or ffs at ", i, hex( the_sorted_numpy_array[ i ] ) )
-            sys.stdout.flush()
-            list_of_special_values.append(( i,
-                                           hex( the_sorted_numpy_array[ i ] ) ))
-
-
-    return list_of_dups, list_of_out_of_order_values, \
-           list_of_special_values
+    print( [ hex( the_value ) for the_value in
+             the_sorted_numpy_array[ : 4 ].tolist() ] )
+
+    print( "duplicates         = ", the_scan[ 'duplicate_indices' ].size,
+           "of", the_scan[ 'duplicate_values' ].size, "values" )
+    for the_value, the_count in zip(
+                     the_scan[ 'duplicate_values' ][ : max_lines ].tolist(),
+                     the_scan[ 'duplicate_counts' ][ : max_lines ].tolist() ) :
+        print( "    dup ", hex( the_value ), the_count, "times" )
+
+    print( "out_of_order       = ", the_scan[ 'out_of_order_indices' ].size )
+    for i in the_scan[ 'out_of_order_indices' ][ : max_lines ].tolist() :
+        print( "    out_of_order at ", i,
+               hex( int( the_sorted_numpy_array[ i ] ) ),
+               hex( int( the_sorted_numpy_array[ i + 1 ] ) ) )
+
+    print( "0 or ffs           = ", the_scan[ 'special_indices' ].size )
+    for i, the_value in zip(
+                     the_scan[ 'special_indices' ][ : max_lines ].tolist(),
+                     the_scan[ 'special_values' ][ : max_lines ].tolist() ) :
+        print( "    0 or ffs at ", i, hex( the_value ) )
+
+    sys.stdout.flush()
+
+def stable_order( the_numpy_array ) :
+    """
+    The indices that sort the_numpy_array, equal values in the order
+    they are in the_numpy_array. Computed once, every search of the
+    unsorted array below uses it instead of scanning the array.
+    """
+    return numpy.argsort( the_numpy_array, kind='stable' )
+
+def ordered_values( the_numpy_array, the_order=None, the_sorted_values=None ) :
+    """
+    ( the_order, the_sorted_values ), the stable order of the unsorted
+    array and the array in that order, whichever isn't given computed
+    here. Pass both in, the one argsort and one gather, to every
+    function below.
+    """
+    if the_order is None :
+        the_order = stable_order( the_numpy_array )
+
+    if the_sorted_values is None :
+        the_sorted_values = the_numpy_array[ the_order ]
+
+    return the_order, the_sorted_values
+
+def first_and_last_indices( sorted_values, the_order, the_values ) :
+    """
+    For each of the_values, whether it is in sorted_values, the
+    unsorted array in the_order, and the index in the unsorted array of
+    its first and last occurrence, -1 if it isn't there.
+    """
+    the_values    = numpy.asarray( the_values,
+                                   dtype=sorted_values.dtype ).ravel()
+
+    left  = numpy.searchsorted( sorted_values, the_values, side='left' )
+    right = numpy.searchsorted( sorted_values, the_values, side='right' )
+    found = right > left
+
+    # the order is stable, the first of a value's run has its lowest
+    # index, the last its highest
+    first_indices = numpy.full( the_values.shape, -1, dtype=numpy.int64 )
+    last_indices  = numpy.full( the_values.shape, -1, dtype=numpy.int64 )
+    first_indices[ found ] = the_order[ left[ found ] ]
+    last_indices[ found ]  = the_order[ right[ found ] - 1 ]
+
+    return found, first_indices, last_indices
+
+def duplicate_distances( the_numpy_array, the_order=None,
+                         the_sorted_values=None ) :
+    """
+    Every duplicate in the unsorted array, as the value, the index of
+    one occurrence, the index of the next occurrence and the distance
+    between them. A value there 3 times is two of those.
+
+    Sorted by value, the equal values are neighbours, and with a stable
+    sort their indices are in order, so neighbours that are equal are
+    exactly those pairs. One pass, no search.
+
+    Returns a dictionary of arrays, values, first_indices, next_indices
+    and distances.
+    """
+    the_order, sorted_values = ordered_values( the_numpy_array, the_order,
+                                               the_sorted_values )
+    pair_indices  = numpy.flatnonzero( sorted_values[ : -1 ] ==
+                                       sorted_values[ 1 : ] )
+
+    first_indices = the_order[ pair_indices ]
+    next_indices  = the_order[ pair_indices + 1 ]
+
+    return { 'values'        : sorted_values[ pair_indices ],
+             'first_indices' : first_indices,
+             'next_indices'  : next_indices,
+             'distances'     : next_indices - first_indices }
+
+def distance_histogram( the_distances ) :
+    """
+    The distances between duplicates and how often each occurs, most
+    frequent first. A generator with a cycle has one distance, or a few,
+    over and over, random duplicates are scattered.
+    """
+    the_distances, the_counts = numpy.unique( the_distances,
+                                              return_counts=True )
+    most_frequent = numpy.argsort( -the_counts, kind='stable' )
+
+    return the_distances[ most_frequent ], the_counts[ most_frequent ]
+
+def report_duplicate_distances( the_analysis, max_lines=20 ) :
+    """
+    Prints the duplicates from duplicate_distances() and the histogram
+    of their distances, the first max_lines of each.
+    """
+    print( "duplicate pairs    = ", the_analysis[ 'distances' ].size )
+    for the_value, first_index, next_index, the_distance in zip(
+                 the_analysis[ 'values' ][ : max_lines ].tolist(),
+                 the_analysis[ 'first_indices' ][ : max_lines ].tolist(),
+                 the_analysis[ 'next_indices' ][ : max_lines ].tolist(),
+                 the_analysis[ 'distances' ][ : max_lines ].tolist() ) :
+        print( "    dup ", hex( the_value ), "at", first_index, "and",
+               next_index, "distance", the_distance )
+
+    the_distances, the_counts = distance_histogram(
+                                               the_analysis[ 'distances' ] )
+    print( "distinct distances = ", the_distances.size )
+    for the_distance, the_count in zip( the_distances[ : max_lines ].tolist(),
+                                        the_counts[ : max_lines ].tolist() ) :
+        print( "    distance ", the_distance, the_count, "times" )
+
+    sys.stdout.flush()
 
-#
-# I need another one of these that checks for loops, the likely source
-# of so many dups
-#
 def verify_out_of_order_values( the_numpy_array,
-                                the_out_of_order_list_of_tuples ) :
+                                the_out_of_order_list_of_tuples,
+                                the_order=None, the_sorted_values=None ) :
     """
     Are the_out_of_order values actually in the original list?
     Not much checking I can do otherwise, and so far I don't see any of
     these anyway, so the sort seems accurate, not generating artifacts.
 
-    Algorithm : this is simple, but there should not be so many, so not
-    worth the effort to optimize.
-        scan the array for each value, adding i and value to the tuple,
-        append the tuple
-    """
-    unfound_first_values  = []
-    unfound_second_values = []
-    # list of tuples, ( i, first_value, second_value )
-    for the_tuple in enumerate( the_out_of_order_list_of_tuples ) :
-        first_value = the_tuple[ 1 ]
-        for j in range( the_numpy_array.size ) :
-            if the_numpy_array[ j ] == first_value :
-                # now find the 2nd value
-                second_value = the_tuple[ 2 ]
-                for k in range( j, the_numpy_array.size, 1 ) :
-                    if the_numpy_array[ k ] == second_value :
-                        # OK, found them both, nothing further to do
-                        break
-                # here, didn't find the 2nd value 
-                unfound_second_values.append( second_value )
-                break
-        # here, didn't find the first value
-        unfound_first_values.append( first_value )
+    Each tuple is ( i, first_value, second_value ). The first value has
+    to be in the original list, and the second value somewhere at or
+    after the first one's first occurrence.
+
+    Returns the lists of first and second values that weren't found.
+    """
+    if not the_out_of_order_list_of_tuples :
+        return [], []
+
+    the_order, sorted_values = ordered_values( the_numpy_array, the_order,
+                                               the_sorted_values )
+
+    first_values  = [ the_tuple[ 1 ]
+                      for the_tuple in the_out_of_order_list_of_tuples ]
+    second_values = [ the_tuple[ 2 ]
+                      for the_tuple in the_out_of_order_list_of_tuples ]
+
+    first_found, first_indices, _ = first_and_last_indices(
+                                 sorted_values, the_order, first_values )
+    second_found, _, second_last_indices = first_and_last_indices(
+                                 sorted_values, the_order, second_values )
+    second_found &= second_last_indices >= first_indices
+
+    unfound_first_values  = [ the_value for the_value, found in
+                              zip( first_values, first_found ) if not found ]
+    unfound_second_values = [ the_value for the_value, found in
+                              zip( second_values, second_found )
+                              if not found ]
 
     return unfound_first_values, unfound_second_values
 
-def verify_special_values( the_numpy_array, the_special_values_list_of_tuples) :
+def verify_special_values( the_numpy_array, the_special_values_list_of_tuples,
+                           the_order=None, the_sorted_values=None ) :
     """
     Are the special values actually in the original list.
 
-    Algorithm : this is simple, but there should not be many, etc.
-        scan the array for each value, append i and value to the list
-        Big problem is that there may be dups of 0x0 and 0xffff...
-        So keep a starting index for each, begin from there when the
-        tuple's value is the special value. May be other special values,
-        so make it easy to extend.
-    """
-    # list of tuples, ( i, special value )
-    unfound_special_values  = []
-    zeros_last_index        = 0
-    ffs_last_index          = 0
-    found_the_special_value = False
-    for the_tuple in enumerate( the_special_values_list_of_tuples ) :
-        special_value = the_tuple[ 1 ]
-        if special_value == 0x0 :
-            # found one of them, there may be more, so start here for the next
-            for j in range( zeros_last_index, the_numpy_array.size, 1 ) :
-                if the_numpy_array[ j ] == special_value :
-                    zeros_last_index = j + 1
-                    found_the_special_value = True
-                    break
-
-        # this should be conditional on the integer_width. Someday.
-        if special_value == 0xFFFFFFFFFFFFFFFFF  :
-            # found one of them, there may be more, so start here for the next
-            for j in range( ffs_last_index, the_numpy_array.size, 1 ) :
-                if the_numpy_array[ j ] == special_value :
-                    ffs_last_index = j + 1
-                    found_the_special_value = True
-                    break
-
-        # note that if we didn't find the last special value, we won't find any
-        # more, as we have exhausted the numpy_array, could optimize
-        # here, not worth the code.
-        if not found_the_special_value :
-            unfound_special_values.append( special_value )
-
-        found_the_special_value = False
+    There may be dups of 0x0 and 0xffff..., so each one reported has to
+    be another occurrence, a value reported 3 times has to be there at
+    least 3 times.
+
+    Returns the reported special values that aren't there.
+    """
+    if not the_special_values_list_of_tuples :
+        return []
+
+    the_order, sorted_values = ordered_values( the_numpy_array, the_order,
+                                               the_sorted_values )
+
+    reported_values = [ the_tuple[ 1 ]
+                        for the_tuple in the_special_values_list_of_tuples ]
+    the_values, reported_counts = numpy.unique(
+                     numpy.asarray( reported_values,
+                                    dtype=the_numpy_array.dtype ),
+                     return_counts=True )
+
+    found_counts  = numpy.searchsorted( sorted_values, the_values,
+                                        side='right' ) - \
+                    numpy.searchsorted( sorted_values, the_values,
+                                        side='left' )
+
+    unfound_special_values = []
+    for the_value, reported, found in zip( the_values.tolist(),
+                                           reported_counts.tolist(),
+                                           found_counts.tolist() ) :
+        unfound_special_values += [ the_value ] * max( 0, reported - found )
 
     return unfound_special_values
 
-def verify_duplicate_values( the_numpy_array, the_duplicates_list_of_tuples ) :
+def verify_duplicate_values( the_numpy_array, the_duplicates_list_of_tuples,
+                             the_order=None, the_sorted_values=None ) :
     """
     Make sure the processing has not somehow generated the dups, etc. by
-    showing that each reported dup or special value exists in the unsorted
-    file, and reporting their position in it.
-
-    Algorithm : this is simple, but may need to be optimized, seems like
-    there are a lot of dups in the hash output.
-        scan the unsorted, original, array for each duplicate value,
-           append i and value to the list
-        Begin at the index of the first searching for the 2nd 
-            append the index of the 2nd, and also the difference between 
-            1st and 2nd index
-            if those are a small set of constants, it was a cycle.
-
-        In fact, keep the differences as a separate list, sort it before
-        returning, that may be all I need to clearly see that there are
-        one or more cycles. 
+    showing that each reported dup exists more than once in the unsorted
+    file, and reporting their positions in it.
+
+    Every duplicate pair comes from duplicate_distances(), the index of
+    each occurrence and the difference to the next. If the differences
+    are a small set of constants, it was a cycle.
+
+    Returns the reported values that aren't duplicates in the unsorted
+    file, a list of ( dup value, 1st_index, 2nd_index, index_diff ) and
+    the sorted list of index differences.
     """
     print( "\nverify_duplicate_values" )
-    print( "dups list of tuples = ", the_duplicates_list_of_tuples )
     print( "len( dups_list_of_tuples ) = ",
             len( the_duplicates_list_of_tuples ) )
-    print( "the_duplicates_list_of_tuples[ 0 ] = ",
-            the_duplicates_list_of_tuples[ 0 ] )
-    print( "the_duplicates_list_of_tuples[ 1 ] = ",
-            the_duplicates_list_of_tuples[ 1 ] )
-
-    # list of tuples, ( i, dup )
-    unfound_duplicate_values  = []
-
-    # list_of_tuples ( dup value, 1st_index, 2nd_index, index_diff )
-    duplicate_index_diffs_tuples = []
-    duplicate_index_diffs_list   = []
-    for the_tuple in range( len( the_duplicates_list_of_tuples ) ) :
-        print( "the_tuple = ", the_tuple )
-        duplicate_value = the_tuple[ 1 ]
-        for j in range( the_numpy_array.size ) :
-            if the_numpy_array[ j ] == duplicate_value :
-                for k in range( j + 1, the_numpy_array.size, 1 ) :
-                    if the_numpy_array[ k ] == duplicate_value :
-                        # we have found both of them
-                        duplicate_index_diffs_tuples.append( (
-                                                duplicate_value, j, k, k - j ) )
-                        duplicate_index_diffs_list.append( k - j )
 
+    the_analysis = duplicate_distances( the_numpy_array, the_order,
+                                        the_sorted_values )
+
+    reported_values = numpy.asarray( [ the_tuple[ 1 ] for the_tuple in
+                                       the_duplicates_list_of_tuples ],
+                                     dtype=the_numpy_array.dtype )
+    found = numpy.isin( reported_values, the_analysis[ 'values' ] )
+    unfound_duplicate_values = reported_values[ ~found ].tolist()
+
+    duplicate_index_diffs_tuples = list( zip(
+                               the_analysis[ 'values' ].tolist(),
+                               the_analysis[ 'first_indices' ].tolist(),
+                               the_analysis[ 'next_indices' ].tolist(),
+                               the_analysis[ 'distances' ].tolist() ) )
+    duplicate_index_diffs_list = numpy.sort(
+                               the_analysis[ 'distances' ] ).tolist()
+
+    report_duplicate_distances( the_analysis )
 
     return unfound_duplicate_values, duplicate_index_diffs_tuples, \
            duplicate_index_diffs_list
 
-def save_numpy_array_to_output_file( the_sorted_numpy_array, the_output_file ) :
-    """
-    Saves the numpy array in a form easy to read back as a numpy array.
+def sort_numpy_array( the_numpy_array, the_output_file=None ) :
     """
+    Sort the list, through its stable order, which the checks against
+    the unsorted array need anyway, so it is sorted once.
 
-    numpy.save( the_output_file, the_sorted_numpy_array )
-#                allow_pickle=False, fix_imports=False )
+    With the_output_file, the sorted array is gathered straight into
+    that .npy file, memory mapped and in native byte order, as
+    sort_out_of_core() writes it, so there is no copy to save after.
+    numpy.load( name, mmap_mode='r' ) maps it without reading it.
 
-def sort_numpy_array( the_numpy_array ) :
-    """
-    Sort the list.
+    Returns the order and the sorted array.
     """
 
     print( "the numpy_array size = ", the_numpy_array.size )
@@ -233,8 +373,16 @@ def sort_numpy_array( the_numpy_array ) :
     the_numpy_array_shape_tuple = the_numpy_array.shape
     print( "shape_tuple of numpy array = ", the_numpy_array_shape_tuple )
 
-    the_sorted_numpy_array = numpy.sort( the_numpy_array, None,
-                                         kind='quicksort', order=None )
+    if the_output_file is None :
+        the_order, the_sorted_numpy_array = ordered_values( the_numpy_array )
+    else :
+        the_order = stable_order( the_numpy_array )
+        the_sorted_numpy_array = numpy.lib.format.open_memmap(
+                         npy_file_name( the_output_file ), mode='w+',
+                         dtype=the_numpy_array.dtype.newbyteorder( '=' ),
+                         shape=the_numpy_array.shape )
+        numpy.take( the_numpy_array, the_order, out=the_sorted_numpy_array )
+        the_sorted_numpy_array.flush()
 
     print( the_sorted_numpy_array.size )
 
@@ -244,44 +392,146 @@ def sort_numpy_array( the_numpy_array ) :
 
 
 
-    return  the_sorted_numpy_array
+    return  the_order, the_sorted_numpy_array
+
+# numpy's unsigned integer types by integer_width
+INTEGER_DTYPES = { 8 : 'u1', 16 : 'u2', 32 : 'u4', 64 : 'u8' }
+
+# --byte_order, evoemit.py writes native
+BYTE_ORDERS    = { 'native' : '=', 'little' : '<', 'big' : '>' }
 
-def convert_binary_array_to_numpy_array( the_binary_array ) :
+def integer_dtype( integer_width, byte_order='native' ) :
     """
-    simple conversion of array.array() to numpy.array()
+    The numpy dtype of integer_width-bit unsigned integers in
+    byte_order, 'native', 'little' or 'big'.
     """
-    #bin_vector = array.array( 'Q' )     # now emits long long
+    if integer_width not in INTEGER_DTYPES or byte_order not in BYTE_ORDERS :
+        print( "integer width must be one of ", sorted( INTEGER_DTYPES ),
+               " and byte order one of ", sorted( BYTE_ORDERS ), ", not ",
+               integer_width, byte_order )
+        sys.exit( 0 )
 
-    the_numpy_array = numpy.array( the_binary_array )
+    return numpy.dtype( BYTE_ORDERS[ byte_order ] +
+                        INTEGER_DTYPES[ integer_width ] )
 
-    return the_numpy_array
-
-def read_binary_file_to_array( the_binary_file_name, integer_width ) :
+def map_binary_file( the_binary_file_name, integer_width,
+                     byte_order='native' ) :
     """
-    This handles reading the file, passes back the in_memory buffer
+    The file as a read-only numpy.memmap of integer_width-bit integers,
+    nothing is read or copied until it is used, so it can be larger than
+    memory. A partial integer at the end is ignored.
     """
-
-    bytes_in_integer     = int( integer_width / 8 )
+    the_dtype = integer_dtype( integer_width, byte_order )
 
     binary_file_size = os.path.getsize( the_binary_file_name )
     print( "binary file size = ", binary_file_size )
-    number_of_integers_in_file = int( binary_file_size / bytes_in_integer )
+    number_of_integers_in_file = binary_file_size // the_dtype.itemsize
     print( "integers in file = ", number_of_integers_in_file )
 
-    dir_path = os.path.dirname(os.path.realpath(__file__))
-    random_number_binary_file = open( dir_path + '/' + the_binary_file_name,
-                                      "rb" )
+    if number_of_integers_in_file == 0 :
+        # mmap can't map nothing
+        return numpy.empty( 0, dtype=the_dtype )
 
-    binary_array = array.array( 'Q' )
+    return numpy.memmap( the_binary_file_name, dtype=the_dtype, mode='r',
+                         shape=( number_of_integers_in_file, ) )
 
-    binary_array.fromfile( random_number_binary_file,
-                           number_of_integers_in_file )
-    random_number_binary_file.close()
+def npy_file_name( the_output_file ) :
+    """
+    numpy.save() adds '.npy' if it isn't there, so does everything else
+    writing one.
+    """
+    if the_output_file.endswith( '.npy' ) :
+        return the_output_file
 
-#    read_length = len( read_data )
-#    n_integers = int( read_length / bytes_in_integer ) - 1 # -1 to be sure
+    return the_output_file + '.npy'
 
-    return binary_array, number_of_integers_in_file
+def merge_sorted_runs( the_runs, the_output, buffer_integers ) :
+    """
+    Merges the sorted arrays in the_runs, memmaps, into the_output.
+
+    Every run has a buffer of its next buffer_integers values. All the
+    values no larger than the smallest of the buffers' last values are
+    the next ones in order, nothing after them in any run can be
+    smaller. Those are taken from every buffer, sorted and written, and
+    at least one buffer is used up each time. Only the buffers are in
+    memory.
+    """
+    positions = [ 0 ] * len( the_runs )
+    buffers   = [ numpy.array( the_run[ : buffer_integers ] )
+                  for the_run in the_runs ]
+    output_position = 0
+
+    while any( the_buffer.size for the_buffer in buffers ) :
+        cutoff = min( the_buffer[ -1 ] for the_buffer in buffers
+                      if the_buffer.size )
+
+        taken = []
+        for i, the_buffer in enumerate( buffers ) :
+            n_taken = numpy.searchsorted( the_buffer, cutoff, side='right' )
+            taken.append( the_buffer[ : n_taken ] )
+            buffers[ i ] = the_buffer[ n_taken : ]
+
+            if buffers[ i ].size == 0 :
+                positions[ i ] += n_taken
+                buffers[ i ] = numpy.array( the_runs[ i ][
+                                   positions[ i ] :
+                                   positions[ i ] + buffer_integers ] )
+            else :
+                positions[ i ] += n_taken
+
+        the_values = numpy.sort( numpy.concatenate( taken ) )
+        the_output[ output_position : output_position + the_values.size ] = \
+            the_values
+        output_position += the_values.size
+
+    return the_output
+
+def sort_out_of_core( the_numpy_array, the_output_file, chunk_integers ) :
+    """
+    Sorts an array larger than memory, a memmap from map_binary_file(),
+    into the .npy file the_output_file, through a memmap.
+
+    Each chunk_integers values are sorted in memory and written to a
+    temporary file next to the output, then those runs are merged by
+    merge_sorted_runs(). At most about 2 * chunk_integers values are in
+    memory at once.
+
+    Returns the sorted memmap.
+    """
+    the_output_file = npy_file_name( the_output_file )
+    n_integers      = the_numpy_array.size
+    # native order to sort, the byte order was only how the file is
+    the_dtype       = the_numpy_array.dtype.newbyteorder( '=' )
+
+    runs_fd, runs_file_name = tempfile.mkstemp(
+                     dir=os.path.dirname( os.path.abspath( the_output_file ) ),
+                     suffix='.runs' )
+    os.close( runs_fd )
+    try :
+        the_runs = numpy.memmap( runs_file_name, dtype=the_dtype, mode='w+',
+                                 shape=( n_integers, ) )
+        run_list = []
+        for first in range( 0, n_integers, chunk_integers ) :
+            last = min( first + chunk_integers, n_integers )
+            the_runs[ first : last ] = numpy.sort(
+                         the_numpy_array[ first : last ].astype( the_dtype ) )
+            run_list.append( the_runs[ first : last ] )
+        the_runs.flush()
+        print( "sorted runs = ", len( run_list ) )
+
+        the_output = numpy.lib.format.open_memmap( the_output_file,
+                                                   mode='w+',
+                                                   dtype=the_dtype,
+                                                   shape=( n_integers, ) )
+        buffer_integers = max( 1, chunk_integers // ( len( run_list ) + 1 ) )
+        merge_sorted_runs( run_list, the_output, buffer_integers )
+        the_output.flush()
+
+        del run_list, the_runs
+    finally :
+        os.remove( runs_file_name )
+
+    return numpy.load( the_output_file, mmap_mode='r' )
 
 def usage() :
     """
@@ -291,19 +541,46 @@ def usage() :
         --help  Invokes this usage function
         -h      Invokes this usage function
 
-        --file   name of the file to be tested
-        --width  width of the integers in the binary file.
+        --input  name of the file to be tested
+        -i
+        --output name of the sorted .npy file
+        -o
+        --width  width of the integers in the binary file, 8, 16, 32
+                 or 64, default 64.
+        -w
+        --byte_order native, little or big, default native.
+        --chunk  <integers>
+                 sort out of core, this many integers at a time, for
+                 files larger than memory. Only the sort and the scan
+                 of the sorted file are done, the checks against the
+                 unsorted file need it in memory.
+
+        --generator <name>   a corpus of one of evoemit.py's generators
+        --password  <password>
+        --bytes     <n>      bytes of the corpus, made if not there
+        --corpus    <directory>
+                             the evocorpus.py store, default
+                             $EVOCORPUS_DIR or ./evocorpus
     """
     print( usage_info )
 
 
 if __name__ == "__main__" :
 
-    SHORT_ARGS = "hi=o=w="
-    LONG_ARGS  = [  'help' , 'width=', 'input=', 'output=' ]
-
-    INTEGER_WIDTH = 0     # list of tests to execute
-    THE_FILE  = ''
+    SHORT_ARGS = "hi:o:w:"
+    LONG_ARGS  = [  'help' , 'width=', 'input=', 'output=',
+                    'generator=', 'password=', 'bytes=', 'corpus=',
+                    'byte_order=', 'chunk=' ]
+
+    INTEGER_WIDTH = 64
+    BYTE_ORDER     = 'native'
+    CHUNK_INTEGERS = 0
+    THE_INPUT_FILE  = None
+    THE_OUTPUT_FILE = None
+    GENERATOR_NAME = None
+    PASSWORD       = ''
+    N_BYTES        = 0
+    CORPUS_DIR     = None
     try :
         OPTS, ARGS = getopt.getopt( sys.argv[ 1 : ], SHORT_ARGS, LONG_ARGS )
 
@@ -312,78 +589,130 @@ if __name__ == "__main__" :
         sys.exit( -2 )
 
     for o, a in OPTS :
-        if o in ( "--help" ) or o in ( "-h" ) :
+        if o in ( "--help", "-h" ) :
             usage()
             sys.exit( -2 )
 
-        if o in ( "--width" ) or o in ( "-w" ) :
+        if o in ( "--width", "-w" ) :
             INTEGER_WIDTH = int( a )
 
-        if o in ( "--input") or o in ( "-i" ) :
+        if o in ( "--input", "-i" ) :
             THE_INPUT_FILE = a
 
-        if o in ( "--output") or o in ( "-o" ) :
+        if o in ( "--output", "-o" ) :
             THE_OUTPUT_FILE = a
 
-print( "\nTHE_INPUT_FILE  = ", THE_INPUT_FILE )
-print( "THE_OUTPUT_FILE = ",   THE_OUTPUT_FILE )
-print( "INTEGER_WIDTH   = ",   INTEGER_WIDTH, "\n" )
-
-BEGINNING_TIME = time.time()
-THE_BINARY_ARRAY, NUMBER_OF_INTEGERS = read_binary_file_to_array(
-                                                        THE_INPUT_FILE,
-                                                        INTEGER_WIDTH )
-ELAPSED_TIME = time.time() - BEGINNING_TIME
-print( "Elapsed time for reading the file = ", ELAPSED_TIME )
-
-BEGINNING_TIME = time.time()
-THE_NUMPY_ARRAY = convert_binary_array_to_numpy_array( THE_BINARY_ARRAY )
-ELAPSED_TIME = time.time() - BEGINNING_TIME
-print( "Elapsed time for converting binary numpy.array = ", ELAPSED_TIME )
-
-BEGINNING_TIME = time.time()
-THE_SORTED_NUMPY_ARRAY = sort_numpy_array( THE_NUMPY_ARRAY )
-ELAPSED_TIME = time.time() - BEGINNING_TIME
-print( "Elapsed time for sorting the list = ", ELAPSED_TIME )
-
-BEGINNING_TIME = time.time()
-LIST_OF_DUPLICATE_VALUE_TUPLES, LIST_OF_OUT_OF_ORDER_TUPLES, \
-LIST_OF_SPECIAL_VALUE_TUPLES = extract_dups_and_special_values(
-                                                       THE_SORTED_NUMPY_ARRAY )
-ELAPSED_TIME = time.time() - BEGINNING_TIME
-print( "Elapsed time for extracting dups and special value = ", ELAPSED_TIME )
-print( "list of duplicate tuples = ", LIST_OF_DUPLICATE_VALUE_TUPLES )
-print( "list of out_of_order tuples = ", LIST_OF_OUT_OF_ORDER_TUPLES )
-print( "list of special value tuples = ", LIST_OF_SPECIAL_VALUE_TUPLES )
-                   
-BEGINNING_TIME = time.time()
-UNVERIFIED_OUT_OF_ORDER_TUPLES = verify_out_of_order_values( THE_NUMPY_ARRAY,
-                                LIST_OF_OUT_OF_ORDER_TUPLES )
-ELAPSED_TIME = time.time() - BEGINNING_TIME
-print( "Elapsed time for verifying out_of_order values = ", ELAPSED_TIME )
-print( "unverified out_of_order tuples = ", UNVERIFIED_OUT_OF_ORDER_TUPLES )
-
-BEGINNING_TIME = time.time()
-UNVERIFIED_SPECIAL_VALUES_TUPLES = verify_special_values( THE_NUMPY_ARRAY,
-                                   LIST_OF_SPECIAL_VALUE_TUPLES )
-ELAPSED_TIME = time.time() - BEGINNING_TIME
-print( "Elapsed time for verifying special values = ", ELAPSED_TIME )
-print( "list of unverified special values = ",
-        UNVERIFIED_SPECIAL_VALUES_TUPLES )
-
-BEGINNING_TIME = time.time()
-UNVERIFIED_DUPLICATE_VALUE_TUPLES = verify_duplicate_values( THE_NUMPY_ARRAY,
-                                           LIST_OF_DUPLICATE_VALUE_TUPLES )
-ELAPSED_TIME = time.time() - BEGINNING_TIME
-print( "Elapsed time for verifying duplicate values = ", ELAPSED_TIME )
-print( "list of unverified duplicate values = ",
-UNVERIFIED_DUPLICATE_VALUE_TUPLES )
-
-BEGINNING_TIME = time.time()
-save_numpy_array_to_output_file( THE_SORTED_NUMPY_ARRAY, THE_OUTPUT_FILE )
-ELAPSED_TIME = time.time() - BEGINNING_TIME
-print( "Elapsed time for saving the sorted_numpy_array = ", ELAPSED_TIME )
- 
+        if o == "--generator" :
+            GENERATOR_NAME = a
+
+        if o == "--password" :
+            PASSWORD = a
+
+        if o == "--bytes" :
+            N_BYTES = int( a )
+
+        if o == "--corpus" :
+            CORPUS_DIR = a
+
+        if o == "--byte_order" :
+            BYTE_ORDER = a
+
+        if o == "--chunk" :
+            CHUNK_INTEGERS = int( a )
+
+    if GENERATOR_NAME :
+        THE_INPUT_FILE = make_corpus( GENERATOR_NAME, PASSWORD, N_BYTES,
+                                      corpus_dir=CORPUS_DIR )
+
+    if THE_INPUT_FILE is None or THE_OUTPUT_FILE is None :
+        print( "--input ( or --generator ) and --output are required" )
+        usage()
+        sys.exit( -2 )
+
+    print( "\nTHE_INPUT_FILE  = ", THE_INPUT_FILE )
+    print( "THE_OUTPUT_FILE = ",   THE_OUTPUT_FILE )
+    print( "INTEGER_WIDTH   = ",   INTEGER_WIDTH, "\n" )
+
+    BEGINNING_TIME = time.time()
+    THE_NUMPY_ARRAY = map_binary_file( THE_INPUT_FILE, INTEGER_WIDTH,
+                                       BYTE_ORDER )
+    ELAPSED_TIME = time.time() - BEGINNING_TIME
+    print( "Elapsed time for mapping the file = ", ELAPSED_TIME )
+
+    OUT_OF_CORE = 0 < CHUNK_INTEGERS < THE_NUMPY_ARRAY.size
+    BEGINNING_TIME = time.time()
+    if OUT_OF_CORE :
+        THE_SORTED_NUMPY_ARRAY = sort_out_of_core( THE_NUMPY_ARRAY,
+                                                   THE_OUTPUT_FILE,
+                                                   CHUNK_INTEGERS )
+    else :
+        THE_ORDER, THE_SORTED_NUMPY_ARRAY = sort_numpy_array(
+                                             THE_NUMPY_ARRAY, THE_OUTPUT_FILE )
+    ELAPSED_TIME = time.time() - BEGINNING_TIME
+    print( "Elapsed time for sorting the list = ", ELAPSED_TIME )
+
+    BEGINNING_TIME = time.time()
+    THE_SCAN = extract_dups_and_special_values( THE_SORTED_NUMPY_ARRAY,
+                                                INTEGER_WIDTH )
+    ELAPSED_TIME = time.time() - BEGINNING_TIME
+    print( "Elapsed time for extracting dups and special value = ",
+           ELAPSED_TIME )
+    report_dups_and_special_values( THE_SORTED_NUMPY_ARRAY, THE_SCAN )
+
+    # the verify functions take lists of tuples, ( i, value ) and
+    # ( i, first_value, second_value )
+    DUP_INDICES = THE_SCAN[ 'duplicate_indices' ]
+    LIST_OF_DUPLICATE_VALUE_TUPLES = list( zip(
+                         DUP_INDICES.tolist(),
+                         THE_SORTED_NUMPY_ARRAY[ DUP_INDICES ].tolist() ) )
+    OUT_OF_ORDER_INDICES = THE_SCAN[ 'out_of_order_indices' ]
+    LIST_OF_OUT_OF_ORDER_TUPLES = list( zip(
+                OUT_OF_ORDER_INDICES.tolist(),
+                THE_SORTED_NUMPY_ARRAY[ OUT_OF_ORDER_INDICES ].tolist(),
+                THE_SORTED_NUMPY_ARRAY[ OUT_OF_ORDER_INDICES + 1 ].tolist() ) )
+    LIST_OF_SPECIAL_VALUE_TUPLES = list( zip(
+                                 THE_SCAN[ 'special_indices' ].tolist(),
+                                 THE_SCAN[ 'special_values' ].tolist() ) )
+
+    if OUT_OF_CORE :
+        # the sort wrote the output, and the checks against the unsorted
+        # file need all of it in memory
+        print( "sorted out of core to ", npy_file_name( THE_OUTPUT_FILE ),
+               ", not verified against the unsorted file" )
+        sys.exit( 0 )
+
+    # the verifying shares the sort's order and sorted array
+    BEGINNING_TIME = time.time()
+    UNVERIFIED_OUT_OF_ORDER_TUPLES = verify_out_of_order_values(
+                                    THE_NUMPY_ARRAY,
+                                    LIST_OF_OUT_OF_ORDER_TUPLES, THE_ORDER,
+                                    THE_SORTED_NUMPY_ARRAY )
+    ELAPSED_TIME = time.time() - BEGINNING_TIME
+    print( "Elapsed time for verifying out_of_order values = ", ELAPSED_TIME )
+    print( "unverified out_of_order tuples = ", UNVERIFIED_OUT_OF_ORDER_TUPLES )
+
+    BEGINNING_TIME = time.time()
+    UNVERIFIED_SPECIAL_VALUES_TUPLES = verify_special_values( THE_NUMPY_ARRAY,
+                                       LIST_OF_SPECIAL_VALUE_TUPLES,
+                                       THE_ORDER, THE_SORTED_NUMPY_ARRAY )
+    ELAPSED_TIME = time.time() - BEGINNING_TIME
+    print( "Elapsed time for verifying special values = ", ELAPSED_TIME )
+    print( "list of unverified special values = ",
+            UNVERIFIED_SPECIAL_VALUES_TUPLES )
+
+    BEGINNING_TIME = time.time()
+    UNVERIFIED_DUPLICATE_VALUE_TUPLES = verify_duplicate_values(
+                                               THE_NUMPY_ARRAY,
+                                               LIST_OF_DUPLICATE_VALUE_TUPLES,
+                                               THE_ORDER,
+                                               THE_SORTED_NUMPY_ARRAY )
+    ELAPSED_TIME = time.time() - BEGINNING_TIME
+    print( "Elapsed time for verifying duplicate values = ", ELAPSED_TIME )
+    print( "list of unverified duplicate values = ",
+    UNVERIFIED_DUPLICATE_VALUE_TUPLES[ 0 ] )
+
+    print( "sorted to ", npy_file_name( THE_OUTPUT_FILE ) )
+
 #
 # output on the last test. Lengths, etc. are correct, these are the 64-bit
 # most- and least-significant halves of 128-bit output of LCG_CRYPTO().
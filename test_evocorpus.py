@@ -0,0 +1,175 @@
+#!/usr/bin/python3
+"""
+Tests of the evocorpus.py code.
+"""
+
+import io
+import os
+import json
+import hashlib
+import shutil
+import tempfile
+import unittest
+
+import evocorpus
+from evornt    import RNT
+from evoemit   import make_generator, fill_block, GENERATOR_NAMES
+from evocorpus import make_corpus, corpus_file_name, open_corpus, \
+                      read_corpus_metadata, read_corpus_state, \
+                      set_generator_state
+
+class TestCorpus( unittest.TestCase ) :
+    """
+    A corpus is the generator's output, however many runs it took to
+    generate it.
+    """
+    def setUp( self ) :
+        self.corpus_dir = os.path.join( tempfile.mkdtemp(), 'corpus' )
+        self.old_checkpoint = evocorpus.CORPUS_CHECKPOINT_BYTES
+        evocorpus.CORPUS_CHECKPOINT_BYTES = 64
+
+    def tearDown( self ) :
+        evocorpus.CORPUS_CHECKPOINT_BYTES = self.old_checkpoint
+        shutil.rmtree( os.path.dirname( self.corpus_dir ) )
+
+    def make( self, name, n_bytes, password='TestCorpusStreams' ) :
+        """
+        make_corpus() in the test directory, quietly.
+        """
+        return make_corpus( name, password, n_bytes, 128, 9, 1, 7,
+                            program_hash='0x1234', corpus_dir=self.corpus_dir,
+                            report_file=io.StringIO() )
+
+    def expected( self, name, n_bytes, bit_width ) :
+        """
+        n_bytes straight from the generator.
+        """
+        the_rnt = RNT( 4096, 'TestCorpusStreams', 'desktop', 1 )
+        the_generator = make_generator( name, the_rnt, 128, 9, 1, 7 )
+        return bytes( fill_block( the_generator, n_bytes, bit_width ) )
+
+    def test_resume( self ) :
+        """
+        Extending a corpus resumes the generator, the bytes are the same
+        as generating them all at once.
+        """
+        print( "test_resume" )
+
+        file_name = self.make( 'lcg_crypto', 100 )
+        self.assertEqual( os.path.getsize( file_name ), 100 )
+        self.assertEqual( self.make( 'lcg_crypto', 50 ), file_name )
+        self.assertEqual( os.path.getsize( file_name ), 100 )
+
+        self.make( 'lcg_crypto', 250 )
+        self.assertEqual( bytes( open_corpus( file_name ) ),
+                          self.expected( 'lcg_crypto', 250, 8 ) )
+
+        metadata = read_corpus_metadata( file_name )
+        self.assertEqual( metadata[ 'n_bytes' ], 250 )
+        self.assertEqual( metadata[ 'bit_width' ], 8 )
+        self.assertEqual( metadata[ 'program_hash' ], '0x1234' )
+        with open( file_name[ : -4 ] + '.json' ) as metadata_file :
+            self.assertNotIn( 'TestCorpusStreams', metadata_file.read() )
+
+    def test_every_generator( self ) :
+        """
+        Every generator resumes from its saved state where it was.
+        """
+        print( "test_every_generator" )
+
+        for name in GENERATOR_NAMES :
+            file_name = self.make( name, 48 )
+            the_state = read_corpus_state( file_name[ : -4 ],
+                                           'TestCorpusStreams' )
+            the_rnt   = RNT( 4096, 'TestCorpusStreams', 'desktop', 1 )
+            self.assertTrue( set_generator_state(
+                                 make_generator( name, the_rnt, 128, 9, 1, 7 ),
+                                 *the_state[ 1 : ] ), name )
+            self.assertIsNone( read_corpus_state( file_name[ : -4 ],
+                                                  'Different' ) )
+
+            self.make( name, 120 )
+            bit_width = read_corpus_metadata( file_name )[ 'bit_width' ]
+            self.assertEqual( bytes( open_corpus( file_name ) ),
+                              self.expected( name, 120, bit_width ), name )
+
+    def test_interrupted( self ) :
+        """
+        Bytes past the saved state, from a run that stopped between
+        checkpoints, are regenerated.
+        """
+        print( "test_interrupted" )
+
+        file_name = self.make( 'lcg', 128 )
+        with open( file_name, 'ab' ) as corpus_file :
+            corpus_file.write( b'\0' * 20 )
+
+        self.make( 'lcg', 200 )
+        expected = self.expected( 'lcg', 200, 64 )
+        self.assertEqual( bytes( open_corpus( file_name ) ), expected )
+        self.assertEqual( list( open_corpus( file_name, 40, 'Q' ) ),
+                          list( memoryview( expected[ : 40 ] ).cast( 'Q' ) ) )
+
+    def test_keys( self ) :
+        """
+        Anything the stream depends on is a different corpus, and the
+        directory and files are owner-only.
+        """
+        print( "test_keys" )
+
+        file_name = self.make( 'lcg', 16 )
+        self.assertEqual( file_name,
+                          corpus_file_name( 'lcg', 'TestCorpusStreams', 128,
+                                            9, 1, 7, None, '0x1234',
+                                            self.corpus_dir ) )
+        self.assertNotEqual( file_name, self.make( 'lcg', 16, 'Different' ) )
+        self.assertNotEqual( file_name,
+                             corpus_file_name( 'lcg', 'TestCorpusStreams',
+                                               128, 9, 1, 7, None, '0x5678',
+                                               self.corpus_dir ) )
+        self.assertNotEqual( file_name,
+                             corpus_file_name( 'lcg', 'TestCorpusStreams',
+                                               64, 9, 1, 7, None, '0x1234',
+                                               self.corpus_dir ) )
+
+        self.assertEqual( os.stat( self.corpus_dir ).st_mode & 0o077, 0 )
+        for the_file in os.listdir( self.corpus_dir ) :
+            self.assertEqual( os.stat( os.path.join( self.corpus_dir,
+                                                     the_file ) ).st_mode &
+                              0o077, 0 )
+
+    def test_bad_state( self ) :
+        """
+        A state file that isn't intact means starting over, not an
+        error.
+        """
+        print( "test_bad_state" )
+
+        file_name  = self.make( 'hash', 64 )
+        state_name = file_name[ : -4 ] + '.state'
+        with open( state_name, 'r+b' ) as state_file :
+            state_file.seek( 10 )
+            state_file.write( b'\xff\xff' )
+
+        self.make( 'hash', 80 )
+        self.assertEqual( bytes( open_corpus( file_name ) ),
+                          self.expected( 'hash', 80, 64 ) )
+        with open( file_name[ : -4 ] + '.json' ) as metadata_file :
+            self.assertEqual( json.load( metadata_file )[ 'n_bytes' ], 80 )
+
+        # a digest anyone can compute is not enough, it is keyed by the
+        # password
+        with open( state_name, 'rb' ) as state_file :
+            the_body = state_file.read()[ : -32 ]
+        with open( state_name, 'wb' ) as state_file :
+            state_file.write( the_body + hashlib.sha256( the_body ).digest() )
+        with open( file_name, 'r+b' ) as corpus_file :
+            corpus_file.write( b'\0' * 8 )
+
+        self.make( 'hash', 96 )
+        self.assertEqual( bytes( open_corpus( file_name ) ),
+                          self.expected( 'hash', 96, 64 ) )
+
+
+if __name__ == '__main__':
+    unittest.main()
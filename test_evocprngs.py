@@ -9,17 +9,25 @@ code is working.
 """
 
 import sys
+import os
 import random
+import shutil
+import tempfile
 
 import unittest
 import time
 
 from evoprimes import get_next_higher_prime
 from evofolds  import FoldInteger
-from evornt    import RNT
+from evornt    import RNT, restore_rnt
 from evoprngs  import LCG, byte_rate, PRNGs
 from evocprngs import CRYPTO, generate_constants, generate_random_table,\
-                      LcgCrypto,PrngCrypto, HashCrypto
+                      LcgCrypto,PrngCrypto, HashCrypto, \
+                      set_crypto_construction, CRYPTO_CONSTRUCTION_LEGACY, \
+                      CRYPTO_CONSTRUCTION_LEAN
+import evoprngutils
+from evoprngutils import constant_table, set_constants_cache
+from evocorpus import make_corpus, open_corpus
 
 """
 random_table = [ \
@@ -524,6 +532,233 @@ class TestEvoCPrngs( unittest.TestCase ) :
                         ( 'test_crypto', encode, decode, plain_in,
                           plain_out, system_type, paranoia_level ) )
 
+class TestKeystreamBlocks( unittest.TestCase ) :
+    """
+    The block keystream must be exactly the bytes of next( 8, steps ).
+    Small ensembles, these are about equality, not randomness.
+    """
+    def make_pair( self, the_crypto ) :
+        """
+        Two identically seeded instances of the_crypto.
+        """
+        pair = []
+        for _ in range( 2 ) :
+            the_rnt = RNT( 4096, 'TestKeystreamBlocks', 'desktop', 1 )
+            pair.append( the_crypto( the_rnt, 7, 128, 9, 1 ) )
+
+        return pair
+
+    def test_next_bytes( self ) :
+        """
+        next_bytes() and keystream_into() against next( 8, steps ),
+        then a wider next() to be sure both are in the same state after.
+        """
+        for the_crypto in [ LcgCrypto, HashCrypto, PrngCrypto ] :
+            by_byte, by_block = self.make_pair( the_crypto )
+
+            for steps in [ 1, 2 ] :
+                expected = bytes( [ by_byte.next( 8, steps )
+                                    for _ in range( 48 ) ] )
+                self.assertEqual( bytes( by_block.next_bytes( 32, steps ) ),
+                                  expected[ : 32 ] )
+
+                the_buffer = bytearray( 20 )
+                by_block.keystream_into( memoryview( the_buffer )[ 4 : ],
+                                         steps )
+                self.assertEqual( bytes( the_buffer[ 4 : ] ),
+                                  expected[ 32 : ] )
+
+            self.assertEqual( by_byte.next( 64, 1 ), by_block.next( 64, 1 ) )
+
+    def test_encrypt_decrypt( self ) :
+        """
+        encrypt() and decrypt() xor whole blocks, the cipher text must
+        be the byte at a time xor it always was.
+        """
+        plain_text = "this is a test case\n"
+        by_byte, by_block = self.make_pair( LcgCrypto )
+
+        expected = bytearray( [ by_byte.next( 8, 1 ) ^ ord( plain_byte )
+                                for plain_byte in plain_text ] )
+        cipher_text = by_block.encrypt( plain_text, 1 )
+        self.assertEqual( cipher_text, expected )
+
+        by_byte, by_block = self.make_pair( LcgCrypto )
+        self.assertEqual( by_block.decrypt( cipher_text, 1 ), plain_text )
+        self.assertEqual( by_byte.decrypt( [ plain_text[ : 7 ],
+                                             plain_text[ 7 : ] ], 1 ),
+                          expected.decode( 'latin-1' ) )
+
+class TestConstantTable( unittest.TestCase ) :
+    """
+    constant_table() is generate_constants(), memoized.
+    """
+    def setUp( self ) :
+        the_rnt = RNT( 4096, 'TestConstantTable', 'desktop', 1 )
+        self.the_snapshot = the_rnt.snapshot()
+        self.cache_dir = None
+        evoprngutils.CONSTANTS_CACHE.clear()
+
+    def tearDown( self ) :
+        set_constants_cache( None )
+        evoprngutils.CONSTANTS_CACHE.clear()
+        if self.cache_dir :
+            shutil.rmtree( self.cache_dir )
+
+    def check_table( self, integer_width, n_prngs ) :
+        """
+        One constant_table() against generate_constants() on a twin RNT,
+        the constants and the RNT's state after.
+        """
+        expected_rnt = restore_rnt( self.the_snapshot )
+        expected = list( generate_constants( expected_rnt, integer_width,
+                                             n_prngs ) )
+
+        the_rnt = restore_rnt( self.the_snapshot )
+        self.assertEqual( constant_table( the_rnt, integer_width, n_prngs ),
+                          expected )
+        self.assertEqual( the_rnt.draw_state(), expected_rnt.draw_state() )
+        self.assertEqual( the_rnt.randint( 64 ), expected_rnt.randint( 64 ) )
+
+    def test_memoized( self ) :
+        """
+        Computed, then from the in-process cache, the same both times.
+        """
+        print( "test_memoized" )
+
+        for integer_width, n_prngs in [ ( 64, 7 ), ( 128, 3 ) ] :
+            self.check_table( integer_width, n_prngs )
+            self.assertEqual( len( evoprngutils.CONSTANTS_CACHE ), 1 )
+            self.check_table( integer_width, n_prngs )
+            self.assertEqual( len( evoprngutils.CONSTANTS_CACHE ), 1 )
+            evoprngutils.CONSTANTS_CACHE.clear()
+
+        # a different state of the same RNT is a different entry
+        the_rnt = restore_rnt( self.the_snapshot )
+        constant_table( the_rnt, 64, 7 )
+        constant_table( the_rnt, 64, 7 )
+        self.assertEqual( len( evoprngutils.CONSTANTS_CACHE ), 2 )
+
+    def test_persisted( self ) :
+        """
+        Written owner-only to the cache directory, then read back.
+        """
+        print( "test_persisted" )
+
+        self.cache_dir = tempfile.mkdtemp()
+        set_constants_cache( os.path.join( self.cache_dir, 'constants' ) )
+
+        self.check_table( 64, 7 )
+        cache_files = os.listdir( evoprngutils.CONSTANTS_CACHE_DIR )
+        self.assertEqual( len( cache_files ), 1 )
+        cache_file = os.path.join( evoprngutils.CONSTANTS_CACHE_DIR,
+                                   cache_files[ 0 ] )
+        self.assertEqual( os.stat( cache_file ).st_mode & 0o777, 0o600 )
+
+        evoprngutils.CONSTANTS_CACHE.clear()
+        self.check_table( 64, 7 )
+
+        # a damaged file is recomputed
+        with open( cache_file, 'r+b' ) as cache_fd :
+            cache_fd.seek( 20 )
+            cache_fd.write( b'\xff\xff' )
+        evoprngutils.CONSTANTS_CACHE.clear()
+        self.check_table( 64, 7 )
+
+class TestCryptoConstruction( unittest.TestCase ) :
+    """
+    HashCrypto and PrngCrypto no longer build LcgCrypto's LCGs.
+    """
+    def setUp( self ) :
+        the_rnt = RNT( 4096, 'TestCryptoConstruction', 'desktop', 1 )
+        self.the_snapshot = the_rnt.snapshot()
+        evoprngutils.DRAWS_CACHE.clear()
+
+    def tearDown( self ) :
+        set_crypto_construction( CRYPTO_CONSTRUCTION_LEGACY )
+        evoprngutils.DRAWS_CACHE.clear()
+
+    def skipped_rnt( self ) :
+        """
+        An RNT after skip_lcg_vector().
+        """
+        the_rnt = restore_rnt( self.the_snapshot )
+        the_crypto = LcgCrypto.__new__( LcgCrypto )
+        the_crypto.init_state( the_rnt, 7, 128, 9, 1 )
+        the_crypto.skip_lcg_vector()
+
+        return the_rnt
+
+    def test_legacy( self ) :
+        """
+        Skipping leaves the RNT where building an LcgCrypto does, built
+        and then memoized.
+        """
+        print( "test_legacy" )
+
+        built_rnt = restore_rnt( self.the_snapshot )
+        LcgCrypto( built_rnt, 7, 128, 9, 1 )
+
+        for _ in range( 2 ) :
+            the_rnt = self.skipped_rnt()
+            self.assertEqual( the_rnt.draw_state(), built_rnt.draw_state() )
+            self.assertEqual( len( evoprngutils.DRAWS_CACHE ), 1 )
+
+    def test_lean( self ) :
+        """
+        LEAN draws nothing for the LCGs, is recorded, and is a different
+        keystream.
+        """
+        print( "test_lean" )
+
+        set_crypto_construction( CRYPTO_CONSTRUCTION_LEAN )
+        self.assertEqual( self.skipped_rnt().draw_state(),
+                          restore_rnt( self.the_snapshot ).draw_state() )
+
+        for the_crypto in [ HashCrypto, PrngCrypto ] :
+            set_crypto_construction( CRYPTO_CONSTRUCTION_LEAN )
+            lean = the_crypto( restore_rnt( self.the_snapshot ), 7, 128, 9, 1 )
+            self.assertEqual( lean.construction_version,
+                              CRYPTO_CONSTRUCTION_LEAN )
+
+            set_crypto_construction( CRYPTO_CONSTRUCTION_LEGACY )
+            legacy = the_crypto( restore_rnt( self.the_snapshot ),
+                                 7, 128, 9, 1 )
+            self.assertNotEqual( bytes( lean.next_bytes( 16, 1 ) ),
+                                 bytes( legacy.next_bytes( 16, 1 ) ) )
+
+class TestCorpusStreams( unittest.TestCase ) :
+    """
+    The simple checks, no duplicates, zeros or all ffs, on the crypto
+    PRNGs' keystreams from the evocorpus.py store. With EVOCORPUS_DIR
+    set they are generated once and reused by every run, otherwise in a
+    temporary directory.
+    """
+    def setUp( self ) :
+        self.temp_dir = None
+        if not os.environ.get( 'EVOCORPUS_DIR' ) :
+            self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown( self ) :
+        if self.temp_dir :
+            shutil.rmtree( self.temp_dir )
+
+    def test_keystreams( self ) :
+        """
+        512 64-bit values of each keystream.
+        """
+        print( "test_keystreams" )
+
+        for the_name in [ 'lcg_crypto', 'prng_crypto', 'hash_crypto' ] :
+            file_name = make_corpus( the_name, 'TestCorpusStreams', 4096,
+                                     128, 9, 1, 7, corpus_dir=self.temp_dir )
+            the_values = list( open_corpus( file_name, 4096, 'Q' ) )
+
+            self.assertEqual( len( the_values ), 512 )
+            self.assertEqual( count_duplicates( the_values ), 0 )
+            self.assertEqual( count_zeros( the_values ), 0 )
+            self.assertEqual( count_all_fs( the_values, 64 ), 0 )
+
 
 if __name__ == '__main__':
 #    sys.path.append( '../' )
@@ -8,13 +8,22 @@ import unittest
 import random
 import evornt
 import copy
+import hashlib
+import hmac
+import tempfile
+import subprocess
 from evornt   import RNT
+from evocprngs import CRYPTO, set_crypto_construction, \
+                      CRYPTO_CONSTRUCTION_LEGACY, CRYPTO_CONSTRUCTION_LEAN
+from evoprngs  import set_lcg_seeding, LCG_SEEDING_LEGACY, LCG_SEEDING_CHAINED
 from evocrypt import crypt
 
 
 from evocrypt import assemble_program_from_dev_files, generate_new_program, \
 check_name_against_hash, generate_random_array, replace_random_table, \
-encrypt_file, decrypt_file, crypt
+encrypt_file, decrypt_file, crypt, crypt_stream, encrypt_segments, \
+decrypt_range, segment_passphrase, CONTAINER_HEADER_SIZE, \
+crypt_directory, report_batch, hash_text
 
 def count_duplicates( the_list ) :
     """
@@ -288,6 +297,376 @@ class TestEvoCrypt( unittest.TestCase ) :
         self.assertTrue( the_rnt.password_hash != 0, "password hash was zero" )
 
 
+def write_v1_file( plain_name, cipher_name, passphrase, chunk_size ) :
+    """
+    The v1 .evocrypt file evocrypt.py no longer writes but still reads :
+        64-bytes of sha512 hash of the plaintext file,
+        the encrypted file data,
+        64-bytes of sha512 hash of the preceding two.
+    """
+    plain_digest = hashlib.sha512( open( plain_name, 'rb' ).read() ).digest()
+    cipher_hash  = hashlib.sha512( plain_digest )
+    encode       = CRYPTO( passphrase, 'laptop', 1 ).next()
+
+    with open( cipher_name, 'wb' ) as cipher_file :
+        cipher_file.write( plain_digest )
+        with open( plain_name, 'rb' ) as plain_file :
+            crypt_stream( plain_file, cipher_file, encode, None, cipher_hash,
+                          chunk_size )
+        cipher_file.write( cipher_hash.digest() )
+
+
+class TestFileStreams( unittest.TestCase ) :
+    """
+    v1 files, written by write_v1_file(), and decrypt_file() a chunk at
+    a time.
+    """
+    def setUp( self ) :
+        self.passphrase = 'TestFileStreams'
+        self.temp_dir   = tempfile.TemporaryDirectory()
+        self.plain_name = os.path.join( self.temp_dir.name, 'plain.txt' )
+
+        # a bit over 3 chunks, so the last chunk is short
+        random.seed( 1 )
+        self.plain_text = bytes( [ random.getrandbits( 8 )
+                                   for _ in range( 3 * 64 + 17 ) ] )
+        with open( self.plain_name, 'wb' ) as plain_file :
+            plain_file.write( self.plain_text )
+
+        self.cipher_name = self.plain_name + '_1_0x1234abcd.evocrypt'
+        write_v1_file( self.plain_name, self.cipher_name, self.passphrase, 64 )
+
+    def tearDown( self ) :
+        self.temp_dir.cleanup()
+
+    def test_file_format( self ) :
+        """
+        plain text digest, cipher text, digest of the two.
+        """
+        cipher_data = open( self.cipher_name, 'rb' ).read()
+        self.assertEqual( len( cipher_data ), len( self.plain_text ) + 128 )
+        self.assertEqual( cipher_data[ : 64 ],
+                          hashlib.sha512( self.plain_text ).digest() )
+        self.assertEqual( cipher_data[ -64 : ],
+                          hashlib.sha512( cipher_data[ : -64 ] ).digest() )
+
+        encode = CRYPTO( self.passphrase, 'laptop', 1 ).next()
+        expected = bytes( [ plain_byte ^ encode.next( 8, 1 )
+                            for plain_byte in self.plain_text ] )
+        self.assertEqual( cipher_data[ 64 : -64 ], expected )
+
+    def test_decrypt_file( self ) :
+        """
+        Decrypts with a different chunk size, never over the original.
+        """
+        decrypted_name = decrypt_file( self.cipher_name, self.passphrase,
+                                       'laptop', 1, 100 )
+        self.assertNotEqual( decrypted_name, self.plain_name )
+        self.assertEqual( open( decrypted_name, 'rb' ).read(),
+                          self.plain_text )
+
+    def test_crypt_filter( self ) :
+        """
+        The stdio filter in small buffers is the same keystream as the
+        file encryption.
+        """
+        cipher_data = open( self.cipher_name, 'rb' ).read()
+
+        old_stdin, old_stdout = sys.stdin, sys.stdout
+        sys.stdin  = io.BytesIO( self.plain_text )
+        sys.stdout = io.BytesIO()
+        try :
+            crypt( self.passphrase, 'laptop', 1, 50 )
+            filtered = sys.stdout.getvalue()
+        finally :
+            sys.stdin, sys.stdout = old_stdin, old_stdout
+
+        self.assertEqual( filtered, cipher_data[ 64 : -64 ] )
+
+
+class TestSegmentedFiles( unittest.TestCase ) :
+    """
+    The v2 segmented container, through encrypt_segments() for the same
+    reason as TestFileStreams. Small segments so there are a few of them.
+    """
+    def setUp( self ) :
+        self.passphrase = 'TestSegmentedFiles'
+        self.temp_dir   = tempfile.TemporaryDirectory()
+        self.plain_name = os.path.join( self.temp_dir.name, 'plain.txt' )
+
+        # 3 segments, the last one short
+        random.seed( 2 )
+        self.plain_text = bytes( [ random.getrandbits( 8 )
+                                   for _ in range( 2 * 100 + 17 ) ] )
+        with open( self.plain_name, 'wb' ) as plain_file :
+            plain_file.write( self.plain_text )
+
+        self.plain_digest = hashlib.sha512( self.plain_text ).digest()
+        self.cipher_name  = self.plain_name + '_1_0x1234abcd.evocrypt'
+        encrypt_segments( self.plain_name, self.cipher_name,
+                          self.plain_digest, self.passphrase, 'laptop', 1,
+                          100, 1 )
+
+    def tearDown( self ) :
+        self.temp_dir.cleanup()
+
+    def segment( self, segment_index ) :
+        """
+        cipher text and digest of one segment
+        """
+        cipher_data = open( self.cipher_name, 'rb' ).read()
+        offset      = CONTAINER_HEADER_SIZE + segment_index * 164
+        return cipher_data[ offset : offset + 164 ]
+
+    def test_file_format( self ) :
+        """
+        header, then every segment is its own keystream and digest.
+        """
+        cipher_data = open( self.cipher_name, 'rb' ).read()
+        self.assertEqual( len( cipher_data ), CONTAINER_HEADER_SIZE +
+                          len( self.plain_text ) + 3 * 64 )
+        self.assertEqual( cipher_data[ : 9 ], b'EVOCRYPT\x02' )
+
+        # the digest key, then the cipher text's keystream
+        decode = CRYPTO( segment_passphrase( self.passphrase,
+                                             self.plain_digest, 1 ),
+                         'laptop', 1 ).next()
+        digest_key = bytes( [ decode.next( 8, 1 ) for _ in range( 64 ) ] )
+        expected   = bytes( [ plain_byte ^ decode.next( 8, 1 )
+                              for plain_byte in self.plain_text[ 100 : 200 ] ] )
+        self.assertEqual( self.segment( 1 )[ : 100 ], expected )
+
+        the_hmac = hmac.new( digest_key, cipher_data[ CONTAINER_HEADER_SIZE -
+                                                      64 :
+                                                      CONTAINER_HEADER_SIZE ],
+                             hashlib.sha512 )
+        the_hmac.update( ( 1 ).to_bytes( 8, 'big' ) + expected )
+        self.assertEqual( self.segment( 1 )[ 100 : ], the_hmac.digest() )
+
+    def test_decrypt_file( self ) :
+        """
+        decrypt_file() knows v2 from v1 by itself.
+        """
+        decrypted_name = decrypt_file( self.cipher_name, self.passphrase,
+                                       'laptop', 1 )
+        self.assertEqual( open( decrypted_name, 'rb' ).read(),
+                          self.plain_text )
+
+    def test_decrypt_range( self ) :
+        """
+        within a segment, across a boundary and past the end
+        """
+        self.assertEqual( decrypt_range( self.cipher_name, self.passphrase,
+                                         210, 5 ),
+                          self.plain_text[ 210 : 215 ] )
+        self.assertEqual( decrypt_range( self.cipher_name, self.passphrase,
+                                         90, 20 ),
+                          self.plain_text[ 90 : 110 ] )
+        self.assertEqual( decrypt_range( self.cipher_name, self.passphrase,
+                                         200, 100 ),
+                          self.plain_text[ 200 : ] )
+
+    def test_corrupt_segment( self ) :
+        """
+        A changed byte is caught by that segment's digest, and no
+        plain text file is left behind.
+        """
+        cipher_data = bytearray( open( self.cipher_name, 'rb' ).read() )
+        cipher_data[ CONTAINER_HEADER_SIZE + 164 + 3 ] ^= 1
+        open( self.cipher_name, 'wb' ).write( cipher_data )
+
+        # segment 0 is still good
+        self.assertEqual( decrypt_range( self.cipher_name, self.passphrase,
+                                         0, 10 ),
+                          self.plain_text[ : 10 ] )
+        with self.assertRaises( SystemExit ) :
+            decrypt_range( self.cipher_name, self.passphrase, 150, 10 )
+        with self.assertRaises( SystemExit ) :
+            decrypt_file( self.cipher_name, self.passphrase, 'laptop', 1 )
+        self.assertFalse( os.path.exists( self.plain_name + '.v0' ) )
+
+    def test_construction( self ) :
+        """
+        The header has the crypto construction the file was written
+        with, and decrypting uses it whatever is set.
+        """
+        os.remove( self.cipher_name )
+        set_crypto_construction( CRYPTO_CONSTRUCTION_LEAN )
+        try :
+            encrypt_segments( self.plain_name, self.cipher_name,
+                              self.plain_digest, self.passphrase, 'laptop', 1,
+                              100, 1 )
+        finally :
+            set_crypto_construction( CRYPTO_CONSTRUCTION_LEGACY )
+
+        cipher_data = open( self.cipher_name, 'rb' ).read()
+        self.assertEqual( cipher_data[ : 12 ], b'EVOCRYPT\x02\x01\x01\x00' )
+        self.assertEqual( decrypt_range( self.cipher_name, self.passphrase,
+                                         90, 120 ),
+                          self.plain_text[ 90 : 210 ] )
+
+    def test_seeding( self ) :
+        """
+        The header has the LCG seeding the file was written with, the
+        keystream is different, and decrypting uses it whatever is set.
+        """
+        legacy_data = open( self.cipher_name, 'rb' ).read()
+        os.remove( self.cipher_name )
+        set_lcg_seeding( LCG_SEEDING_CHAINED )
+        try :
+            encrypt_segments( self.plain_name, self.cipher_name,
+                              self.plain_digest, self.passphrase, 'laptop', 1,
+                              100, 1 )
+        finally :
+            set_lcg_seeding( LCG_SEEDING_LEGACY )
+
+        cipher_data = open( self.cipher_name, 'rb' ).read()
+        self.assertEqual( cipher_data[ : 12 ], b'EVOCRYPT\x02\x01\x00\x01' )
+        self.assertNotEqual( cipher_data[ CONTAINER_HEADER_SIZE : ],
+                             legacy_data[ CONTAINER_HEADER_SIZE : ] )
+        self.assertEqual( decrypt_range( self.cipher_name, self.passphrase,
+                                         90, 120 ),
+                          self.plain_text[ 90 : 210 ] )
+
+    def test_wrong_password( self ) :
+        """
+        A wrong password, or a segment rewritten with a digest anyone
+        could compute, is caught instead of giving garbage.
+        """
+        with self.assertRaises( SystemExit ) :
+            decrypt_range( self.cipher_name, 'NotTheSegmentedFiles', 0, 10 )
+
+        cipher_data = bytearray( open( self.cipher_name, 'rb' ).read() )
+        offset      = CONTAINER_HEADER_SIZE + 164
+        cipher_data[ offset + 3 ] ^= 1
+        the_hash = hashlib.sha512( cipher_data[ CONTAINER_HEADER_SIZE - 64 :
+                                                CONTAINER_HEADER_SIZE ] )
+        the_hash.update( ( 1 ).to_bytes( 8, 'big' ) )
+        the_hash.update( cipher_data[ offset : offset + 100 ] )
+        cipher_data[ offset + 100 : offset + 164 ] = the_hash.digest()
+        open( self.cipher_name, 'wb' ).write( cipher_data )
+
+        with self.assertRaises( SystemExit ) :
+            decrypt_range( self.cipher_name, self.passphrase, 150, 10 )
+
+    def test_workers( self ) :
+        """
+        A pool of workers writes the same file as one process.
+        """
+        pool_name = self.plain_name + '_1_0x5678abcd.evocrypt'
+        encrypt_segments( self.plain_name, pool_name, self.plain_digest,
+                          self.passphrase, 'laptop', 1, 100, 2 )
+        self.assertEqual( open( pool_name, 'rb' ).read(),
+                          open( self.cipher_name, 'rb' ).read() )
+
+
+class TestAssembledProgram( unittest.TestCase ) :
+    """
+    --encrypt and --decrypt only run from the assembled program, named
+    with its own hash, so everything they use has to be in it.
+    """
+    def test_round_trip( self ) :
+        """
+        The assembled program encrypts a file into segments, with a pool
+        of 2, and decrypts it.
+        """
+        print( "test_round_trip" )
+
+        the_program = assemble_program_from_dev_files()
+        with tempfile.TemporaryDirectory() as temp_dir :
+            program_name = os.path.join( temp_dir, 'evo_test_' +
+                                         hash_text( the_program )[ 3 ] +
+                                         '.py' )
+            with open( program_name, 'w' ) as program_file :
+                program_file.write( the_program )
+
+            random.seed( 3 )
+            plain_text = bytes( [ random.getrandbits( 8 )
+                                  for _ in range( 2500 ) ] )
+            plain_name = os.path.join( temp_dir, 'plain.bin' )
+            with open( plain_name, 'wb' ) as plain_file :
+                plain_file.write( plain_text )
+
+            subprocess.run( [ sys.executable, program_name,
+                              '--password', 'TestAssembledProgram',
+                              '--segment_size', '1000', '--workers', '2',
+                              '--encrypt', plain_name ],
+                            cwd=temp_dir, check=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE )
+            cipher_names = [ name for name in os.listdir( temp_dir )
+                             if name.endswith( '.evocrypt' ) ]
+            self.assertEqual( len( cipher_names ), 1 )
+
+            os.remove( plain_name )
+            subprocess.run( [ sys.executable, program_name,
+                              '--password', 'TestAssembledProgram',
+                              '--decrypt', cipher_names[ 0 ] ],
+                            cwd=temp_dir, check=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE )
+            with open( plain_name, 'rb' ) as plain_file :
+                self.assertEqual( plain_file.read(), plain_text )
+
+
+class TestBatch( unittest.TestCase ) :
+    """
+    crypt_directory() over a small tree, with a pool of 2. The program
+    hash is handed in, as the program running the tests has none.
+    """
+    def setUp( self ) :
+        self.passphrase = 'TestBatchFiles'
+        self.temp_dir   = tempfile.TemporaryDirectory()
+        self.plain_texts = {}
+        os.mkdir( os.path.join( self.temp_dir.name, 'sub' ) )
+        for name in ( 'a.txt', os.path.join( 'sub', 'b.txt' ) ) :
+            full_name = os.path.join( self.temp_dir.name, name )
+            self.plain_texts[ full_name ] = ( name * 7 ).encode()
+            with open( full_name, 'wb' ) as plain_file :
+                plain_file.write( self.plain_texts[ full_name ] )
+
+    def tearDown( self ) :
+        self.temp_dir.cleanup()
+
+    def test_round_trip( self ) :
+        """
+        every file encrypted, removed, decrypted back, and a file that
+        isn't really an .evocrypt reported without stopping the rest.
+        """
+        results = crypt_directory( 'encrypt', self.temp_dir.name,
+                                   self.passphrase, 'laptop', 1, 64, 2,
+                                   '0x1234abcd' )
+        self.assertEqual( [ result[ 0 ] for result in results ],
+                          sorted( self.plain_texts ) )
+        for file_name, output_name, error in results :
+            self.assertIsNone( error )
+            self.assertEqual( output_name,
+                              file_name + '_1_0x1234abcd.evocrypt' )
+            os.remove( file_name )
+
+        bad_name = os.path.join( self.temp_dir.name,
+                                 'bad.txt_1_0x1234abcd.evocrypt' )
+        with open( bad_name, 'wb' ) as bad_file :
+            bad_file.write( b'EVOCRYPT' + bytes( 300 ) )
+
+        results = crypt_directory( 'decrypt', self.temp_dir.name,
+                                   self.passphrase, 'laptop', 1, n_workers=2 )
+        self.assertEqual( len( results ), 3 )
+        for file_name, output_name, error in results :
+            if file_name == bad_name :
+                self.assertIsNone( output_name )
+                self.assertIn( 'corrupted', error )
+            else :
+                self.assertIsNone( error )
+                self.assertEqual( open( output_name, 'rb' ).read(),
+                                  self.plain_texts[ output_name ] )
+
+        old_stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        try :
+            self.assertEqual( report_batch( results ), 1 )
+        finally :
+            sys.stdout = old_stdout
+
+
 if __name__ == '__main__':
 # nothing I do allows accessing ../ python files from test/
 # they show up on the search line, but it doesn't help. There is some
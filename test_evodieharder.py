@@ -0,0 +1,284 @@
+#!/usr/bin/python3
+"""
+Tests of the evodieharder.py scheduler, with a stand-in for dieharder.
+"""
+
+import io
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+from evodieharder import Job, run_jobs, make_jobs, parse_dieharder_output, \
+                         summarize_jobs, write_summary
+
+# Writes a dieharder-like table of the file named after -f, fails the
+# first time when there is a marker file, sleeps when there is a sleep
+# file.
+STUB_DIEHARDER = """
+import os, sys, time
+file_name = sys.argv[ sys.argv.index( '-f' ) + 1 ]
+directory = os.path.dirname( file_name )
+marker    = os.path.join( directory, 'fail_once' )
+if os.path.exists( marker ) :
+    os.remove( marker )
+    sys.exit( 1 )
+if os.path.exists( os.path.join( directory, 'sleep' ) ) :
+    time.sleep( 60 )
+size = os.path.getsize( file_name )
+print( '#=============================================================#' )
+print( '        test_name   |ntup| tsamples |psamples|  p-value |Assessment' )
+print( '#=============================================================#' )
+print( '   diehard_birthdays|   0|       100|     100|0.50000000|  PASSED' )
+print( '      diehard_operm5|   0|   1000000|     100|0.00500000|   WEAK' )
+print( '   file_size_%d|   0|        1|       1|0.00000001|  FAILED' % size )
+"""
+
+DIEHARDER_OUTPUT = """
+#=============================================================================#
+#            dieharder version 3.31.1 Copyright 2003 Robert G. Brown          #
+#=============================================================================#
+   rng_name    |           filename             |rands/second|
+ file_input_raw|                  lcg_crypto.bin|  3.65e+07  |
+#=============================================================================#
+        test_name   |ntup| tsamples |psamples|  p-value |Assessment
+#=============================================================================#
+   diehard_birthdays|   0|       100|     100|0.91234567|  PASSED
+      diehard_operm5|   0|   1000000|     100|0.00312345|   WEAK
+  diehard_rank_32x32|   0|     40000|     100|0.00000012|  FAILED
+"""
+
+class TestScheduler( unittest.TestCase ) :
+    """
+    Jobs run, are retried, time out and are skipped as they should.
+    """
+    def setUp( self ) :
+        self.directory = tempfile.mkdtemp()
+        self.stub_name = os.path.join( self.directory, 'stub_dieharder.py' )
+        with open( self.stub_name, 'w' ) as stub_file :
+            stub_file.write( STUB_DIEHARDER )
+        self.dieharder_command = [ sys.executable, self.stub_name ]
+
+    def tearDown( self ) :
+        shutil.rmtree( self.directory )
+
+    def python_job( self, name, statement, **kwargs ) :
+        """
+        A job running one python statement.
+        """
+        return Job( name, [ sys.executable, '-c', statement ], **kwargs )
+
+    def test_parse( self ) :
+        """
+        The result lines of dieharder's table and nothing else.
+        """
+        print( "test_parse" )
+
+        results = parse_dieharder_output( DIEHARDER_OUTPUT )
+        self.assertEqual( [ result[ 'test_name' ] for result in results ],
+                          [ 'diehard_birthdays', 'diehard_operm5',
+                            'diehard_rank_32x32' ] )
+        self.assertEqual( [ result[ 'assessment' ] for result in results ],
+                          [ 'PASSED', 'WEAK', 'FAILED' ] )
+        self.assertEqual( results[ 0 ][ 'p_value' ], 0.91234567 )
+        self.assertEqual( results[ 1 ][ 'tsamples' ], '1000000' )
+
+    def test_dependencies( self ) :
+        """
+        A job waits for the jobs it depends on, and is skipped when one
+        of them fails.
+        """
+        print( "test_dependencies" )
+
+        order_name = os.path.join( self.directory, 'order' )
+        append     = "open( %r, 'a' ).write( '%%s\\n' )" % order_name
+        jobs = [ self.python_job( 'second', append % 'second',
+                                  depends=[ 'first' ] ),
+                 self.python_job( 'first', 'import time; time.sleep( 0.5 ); '
+                                  + append % 'first' ),
+                 self.python_job( 'broken', 'raise SystemExit( 3 )' ),
+                 self.python_job( 'after_broken', 'pass',
+                                  depends=[ 'broken' ] ),
+                 self.python_job( 'after_that', 'pass',
+                                  depends=[ 'after_broken' ] ) ]
+        run_jobs( jobs, 2, io.StringIO() )
+
+        states = { job.name : job.state for job in jobs }
+        self.assertEqual( states, { 'second'       : 'passed',
+                                    'first'        : 'passed',
+                                    'broken'       : 'failed',
+                                    'after_broken' : 'skipped',
+                                    'after_that'   : 'skipped' } )
+        self.assertEqual( jobs[ 2 ].message, 'exit status 3' )
+        with open( order_name ) as order_file :
+            self.assertEqual( order_file.read().split(),
+                              [ 'first', 'second' ] )
+
+    def test_retry_and_timeout( self ) :
+        """
+        A failed job runs again, up to retries times, and a job past its
+        timeout is killed.
+        """
+        print( "test_retry_and_timeout" )
+
+        marker = os.path.join( self.directory, 'marker' )
+        fail_once = "import os, sys\n" \
+                    "if not os.path.exists( %r ) :\n" \
+                    "    open( %r, 'w' ).close()\n" \
+                    "    sys.exit( 1 )\n" % ( marker, marker )
+        jobs = [ self.python_job( 'fail_once', fail_once, retries=1 ),
+                 self.python_job( 'fail_always', 'raise SystemExit( 1 )',
+                                  retries=2 ),
+                 self.python_job( 'sleeper', 'import time; time.sleep( 60 )',
+                                  timeout=0.5 ) ]
+        run_jobs( jobs, 3, io.StringIO() )
+
+        self.assertEqual( [ ( job.state, job.attempts ) for job in jobs ],
+                          [ ( 'passed', 2 ), ( 'failed', 3 ),
+                            ( 'failed', 1 ) ] )
+        self.assertEqual( jobs[ 2 ].message, 'timed out after 0.5 seconds' )
+        self.assertLess( jobs[ 2 ].seconds, 30 )
+
+    def test_stdout_limit( self ) :
+        """
+        A job writing forever is stopped after stdout_limit bytes.
+        """
+        print( "test_stdout_limit" )
+
+        out_name = os.path.join( self.directory, 'forever.bin' )
+        jobs = [ self.python_job( 'forever',
+                                  "import sys\n"
+                                  "while True :\n"
+                                  "    sys.stdout.buffer.write( b'x' * 999 )",
+                                  stdout_name=out_name, stdout_limit=5000 ) ]
+        run_jobs( jobs, 1, io.StringIO() )
+
+        self.assertEqual( jobs[ 0 ].state, 'passed' )
+        self.assertEqual( os.path.getsize( out_name ), 5000 )
+
+    def test_short_output( self ) :
+        """
+        A job that ends before writing all it should have failed, on
+        stdout or in its own file, even with exit status 0.
+        """
+        print( "test_short_output" )
+
+        out_name  = os.path.join( self.directory, 'short.bin' )
+        file_name = os.path.join( self.directory, 'own.bin' )
+        jobs = [ self.python_job( 'short',
+                                  "import sys\n"
+                                  "sys.stdout.buffer.write( b'x' * 38 )",
+                                  stdout_name=out_name, stdout_limit=5000 ),
+                 self.python_job( 'own_file',
+                                  "open( %r, 'wb' ).write( b'x' * 10 )" %
+                                  file_name,
+                                  output_name=file_name, output_size=100 ),
+                 self.python_job( 'no_file', 'pass',
+                                  output_name=file_name + '.not',
+                                  output_size=100 ),
+                 self.python_job( 'long_file',
+                                  "open( %r, 'wb' ).write( b'x' * 120 )" %
+                                  file_name,
+                                  output_name=file_name, output_size=100 ) ]
+        # the long file after the short one is checked
+        run_jobs( jobs[ : 3 ], 2, io.StringIO() )
+        run_jobs( jobs[ 3 : ], 1, io.StringIO() )
+
+        self.assertEqual( [ job.state for job in jobs ],
+                          [ 'failed', 'failed', 'failed', 'passed' ] )
+        self.assertEqual( [ job.message for job in jobs ],
+                          [ 'short output, 38 of 5000 bytes',
+                            'short output, 10 of 100 bytes',
+                            'short output, 0 of 100 bytes', '' ] )
+
+    def test_summary( self ) :
+        """
+        One generator file fanned out to dieharder tests, a retry of a
+        dieharder test, and the summary files.
+        """
+        print( "test_summary" )
+
+        open( os.path.join( self.directory, 'fail_once' ), 'w' ).close()
+        jobs = make_jobs( [ 'lcg' ], [ '0', '2' ], 'TestSummary', 4096,
+                          self.directory, self.dieharder_command,
+                          timeout=120, retries=1 )
+        self.assertEqual( [ job.name for job in jobs ],
+                          [ 'generate lcg', 'dieharder lcg 0',
+                            'dieharder lcg 2' ] )
+        run_jobs( jobs, 2, io.StringIO() )
+
+        self.assertEqual( [ job.state for job in jobs ],
+                          [ 'passed', 'passed', 'passed' ] )
+        self.assertEqual( sum( job.attempts for job in jobs ), 4 )
+        file_name = os.path.join( self.directory, 'prng_lcg.bin' )
+        self.assertEqual( os.path.getsize( file_name ), 4096 )
+
+        rows = summarize_jobs( jobs )
+        self.assertEqual( len( rows ), 6 )
+        self.assertEqual( [ row[ 'assessment' ] for row in rows ],
+                          [ 'PASSED', 'WEAK', 'FAILED' ] * 2 )
+        self.assertEqual( rows[ 2 ][ 'test_name' ], 'file_size_4096' )
+
+        base_name = os.path.join( self.directory, 'summary' )
+        write_summary( rows, base_name )
+        with open( base_name + '.json' ) as json_file :
+            self.assertEqual( json.load( json_file ), rows )
+        with open( base_name + '.csv' ) as csv_file :
+            lines = csv_file.read().splitlines()
+        self.assertEqual( len( lines ), 7 )
+        self.assertTrue( lines[ 0 ].startswith( 'generator,dieharder,state' ) )
+
+    def test_corpus( self ) :
+        """
+        With a corpus, dieharder reads the corpus file, and a second run
+        finds it there.
+        """
+        print( "test_corpus" )
+
+        corpus_dir = os.path.join( self.directory, 'corpus' )
+        for _ in range( 2 ) :
+            jobs = make_jobs( [ 'lcg' ], [ '0' ], 'TestCorpus', 1024,
+                              self.directory, self.dieharder_command,
+                              timeout=120, corpus_dir=corpus_dir )
+            run_jobs( jobs, 2, io.StringIO() )
+            self.assertEqual( [ job.state for job in jobs ],
+                              [ 'passed', 'passed' ] )
+
+            file_name = jobs[ 1 ].command[ -1 ]
+            self.assertEqual( os.path.dirname( file_name ), corpus_dir )
+            self.assertEqual( summarize_jobs( jobs )[ 2 ][ 'test_name' ],
+                              'file_size_1024' )
+
+        self.assertEqual( len( [ name for name in os.listdir( corpus_dir )
+                                 if name.endswith( '.bin' ) ] ), 1 )
+        self.assertFalse( os.path.exists( os.path.join( self.directory,
+                                                        'prng_lcg.bin' ) ) )
+        # generated by the first run only
+        with open( os.path.join( self.directory,
+                                 'prng_lcg.generate.stderr' ) ) as the_file :
+            self.assertEqual( the_file.read().count( 'emitted' ), 1 )
+
+    def test_summary_of_failures( self ) :
+        """
+        A dieharder job that timed out still has its row.
+        """
+        print( "test_summary_of_failures" )
+
+        open( os.path.join( self.directory, 'sleep' ), 'w' ).close()
+        jobs = make_jobs( [ 'lcg' ], [ 'all' ], 'TestSummary', 512,
+                          self.directory, self.dieharder_command,
+                          timeout=5 )
+        self.assertIn( '-a', jobs[ 1 ].command )
+        run_jobs( jobs, 2, io.StringIO() )
+
+        rows = summarize_jobs( jobs )
+        self.assertEqual( len( rows ), 1 )
+        self.assertEqual( rows[ 0 ][ 'state' ], 'failed' )
+        self.assertEqual( rows[ 0 ][ 'p_value' ], None )
+        self.assertIn( 'timed out', rows[ 0 ][ 'message' ] )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/python3
+"""
+Tests of the evoemit.py code.
+"""
+
+import io
+import sys
+import unittest
+from array import array
+
+from evornt   import RNT
+from evoemit  import make_generator, fill_block, emit
+
+class TestEmit( unittest.TestCase ) :
+    """
+    What emit() writes has to be exactly what the generators return.
+    """
+    def make_pair( self, name ) :
+        """
+        Two identically seeded generators called name.
+        """
+        pair = []
+        for _ in range( 2 ) :
+            the_rnt = RNT( 4096, 'TestEmitGenerators', 'desktop', 1 )
+            pair.append( make_generator( name, the_rnt, 128, 9, 1, 7 ) )
+
+        return pair
+
+    def test_words( self ) :
+        """
+        64-bit values, in blocks that don't divide the byte count, and
+        a last value cut short.
+        """
+        print( "test_words" )
+
+        emitted, expected = self.make_pair( 'lcg' )
+
+        out_file = io.BytesIO()
+        report   = io.StringIO()
+        self.assertEqual( emit( emitted, out_file, 100, 64, 24, 0, report ),
+                          100 )
+
+        words = array( 'Q', [ expected.next( 64, 1 ) for _ in range( 13 ) ] )
+        self.assertEqual( out_file.getvalue(), words.tobytes()[ : 100 ] )
+        self.assertIn( "emitted 100 of 100 bytes", report.getvalue() )
+
+    def test_keystream( self ) :
+        """
+        8 bits from a crypto PRNG is its keystream, next( 8, 1 ).
+        """
+        print( "test_keystream" )
+
+        emitted, expected = self.make_pair( 'lcg_crypto' )
+
+        out_file = io.BytesIO()
+        emit( emitted, out_file, 50, 8, 16, 10, io.StringIO() )
+        self.assertEqual( out_file.getvalue(),
+                          bytes( [ expected.next( 8, 1 )
+                                   for _ in range( 50 ) ] ) )
+
+    def test_bytes_without_keystream( self ) :
+        """
+        8 bits from a generator without keystream_into().
+        """
+        print( "test_bytes_without_keystream" )
+
+        emitted, expected = self.make_pair( 'hash' )
+        self.assertEqual( fill_block( emitted, 10, 8 ),
+                          bytes( [ expected.next( 8, 1 )
+                                   for _ in range( 10 ) ] ) )
+
+    def test_unknown( self ) :
+        """
+        Unknown generators and widths exit.
+        """
+        print( "test_unknown" )
+
+        the_rnt = RNT( 4096, 'TestEmitGenerators', 'desktop', 1 )
+        old_stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        try :
+            with self.assertRaises( SystemExit ) :
+                make_generator( 'no_such_prng', the_rnt, 128, 9, 1, 7 )
+            with self.assertRaises( SystemExit ) :
+                fill_block( make_generator( 'lcg', the_rnt, 128, 9, 1, 7 ),
+                            16, 32 )
+        finally :
+            sys.stdout = old_stdout
+
+
+if __name__ == '__main__':
+    unittest.main()
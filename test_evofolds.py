@@ -113,7 +113,42 @@ class TestEvofolds( unittest.TestCase ) :
 #                else :
 #                        print( i, sum_of_folded_values[ i ], 
 #                               count_of_folded_values[ i ], 0 )
-        
+
+    def test_fold_many( self ) :
+        """
+        fold_many is fold_it on each value, and leaves the round robin
+        where fold_it would have.
+        """
+        the_values = [ random.getrandbits( random.choice( [ 8, 64, 130,
+                                                            700 ] ) )
+                       for _ in range( 1000 ) ]
+
+        one_at_a_time = FoldInteger( )
+        expected = [ one_at_a_time.fold_it( the_value, 64 )
+                     for the_value in the_values ]
+
+        self.assertEqual( self.the_fold.fold_many( the_values, 64 ), expected )
+        self.assertEqual( self.the_fold.next_fold_index,
+                          one_at_a_time.next_fold_index )
+
+    def test_fold_xor0_long( self ) :
+        """
+        The halving in fold_xor0 is the same as xoring each N-bit value.
+        """
+        for bit_width in [ 1, 5, 8, 63, 64, 65, 128 ] :
+            for n_bits in [ 100, 1000, 20000 ] :
+                the_value = random.getrandbits( n_bits )
+
+                expected = 0
+                the_rest = the_value
+                while the_rest :
+                    expected ^= the_rest & ( ( 1 << bit_width ) - 1 )
+                    the_rest >>= bit_width
+
+                self.assertEqual( self.the_fold.fold_xor0( the_value,
+                                                           bit_width ),
+                                  expected )
+
 if __name__ == '__main__':
 
     import os
@@ -10,8 +10,8 @@ from the commandline for the module.
 import sys
 import unittest
 import random
-from   evornt    import RNT
-from   evohashes import HASH_FUNCTIONS
+from   evornt    import RNT, restore_rnt
+from   evohashes import HASHES, HASH_FUNCTIONS
 
 def count_set_bits( the_integer ) :
     """ destructively counts the set bits in an integer """
@@ -623,6 +623,159 @@ class TestEvoHashes( unittest.TestCase ) :
 
         self.assertTrue( ret_value == True, average_bits_changed )
 
+class TestFoldTouched( unittest.TestCase ) :
+    """
+    Folding only the touched slots must be the same as folding them all.
+    """
+
+    def test_fold_touched( self ) :
+        """
+        Two copies of each hash from identical RNTs, one folding the
+        whole vector after each update, given the same updates.
+        """
+        print( "test_fold_touched" )
+
+        rnt_a = RNT( 4096, 'TestFoldTouched', 'desktop', 1 )
+        rnt_b = restore_rnt( rnt_a.snapshot() )
+
+        for hash_function in HASH_FUNCTIONS :
+            hash_a = hash_function( rnt_a, 128, 19 )
+            hash_b = hash_function( rnt_b, 128, 19 )
+            hash_b.fold_touched = lambda first_index, n_touched, \
+                                         the_hash=hash_b : \
+                hash_function.fold_touched( the_hash, 0, the_hash.hash_depth )
+
+            # short updates walk around the end of the vector
+            updates = [ 1, 0x5a, 'x', 0x1234, 'some text', 2**127 + 1,
+                        3**200 ] + [ i * 0x9e3779b9 for i in range( 1, 40 ) ]
+            for the_update in updates :
+                hash_a.update( the_update )
+                hash_b.update( the_update )
+
+                self.assertEqual( hash_a.integer_vector, hash_b.integer_vector )
+                self.assertEqual( hash_a.the_fold.next_fold_index,
+                                  hash_b.the_fold.next_fold_index )
+                self.assertEqual( hash_a.next( 64, 2 ), hash_b.next( 64, 2 ) )
+
+class TestRunningDigest( unittest.TestCase ) :
+    """
+    The incrementally kept digest is the xor of the whole vector.
+    """
+
+    def test_running_digest( self ) :
+        """
+        After every kind of update, intdigest is the xor of the vector
+        and digest_bytes is the same value, integer_width bits wide.
+        """
+        print( "test_running_digest" )
+
+        the_rnt = RNT( 4096, 'TestRunningDigest', 'desktop', 1 )
+        for hash_function in HASH_FUNCTIONS :
+            the_hash = hash_function( the_rnt, 100, 19 )
+
+            updates = [ 1, 0x5a, 'x', 0x1200, 'some text', 2**127 + 1,
+                        3**200 ] + [ i * 0x9e3779b9 for i in range( 1, 40 ) ]
+            for the_update in updates :
+                the_hash.update( the_update )
+
+                expected = 0
+                for the_integer in the_hash.integer_vector :
+                    expected ^= the_integer
+
+                self.assertEqual( the_hash.intdigest(), expected )
+                self.assertEqual( the_hash.hexdigest(), hex( expected ) )
+                self.assertEqual( the_hash.digest_bytes(),
+                                  expected.to_bytes( 13, 'big' ) )
+
+                the_hash.next( 64, 1 )
+
+class TestBytesUpdate( unittest.TestCase ) :
+    """
+    bytes, bytearray and memoryview updates, and update_many.
+    """
+
+    def test_bytes_update( self ) :
+        """
+        Bytes mix exactly as the same characters in a str.
+        """
+        print( "test_bytes_update" )
+
+        rnt_a = RNT( 4096, 'TestBytesUpdate', 'desktop', 1 )
+        rnt_b = restore_rnt( rnt_a.snapshot() )
+
+        for hash_function in HASH_FUNCTIONS :
+            hash_a = hash_function( rnt_a, 128, 19 )
+            hash_b = hash_function( rnt_b, 128, 19 )
+
+            the_text = 'some text, \xff and \x80 ' * 3
+            the_bytes = the_text.encode( 'latin-1' )
+            for the_update in [ the_bytes, bytearray( the_bytes ),
+                                memoryview( the_bytes ) ] :
+                hash_a.update( the_text )
+                hash_b.update( the_update )
+                self.assertEqual( hash_a.integer_vector, hash_b.integer_vector )
+                self.assertEqual( hash_a.intdigest(), hash_b.intdigest() )
+
+        # a zero byte draws from the rnt as the int updates do
+        for hash_function in HASH_FUNCTIONS :
+            the_hash = hash_function( rnt_a, 128, 19 )
+            the_hash.update( b'\x00\x01\x00' )
+            self.assertTrue( the_hash.intdigest() < 1 << 128 )
+
+    def test_update_many( self ) :
+        """
+        update_many is repeatable and leaves the vector folded.
+        """
+        print( "test_update_many" )
+
+        rnt_a = RNT( 4096, 'TestBytesUpdate', 'desktop', 1 )
+        rnt_b = restore_rnt( rnt_a.snapshot() )
+
+        the_updates = [ i * 0x9e3779b97f4a7c15 for i in range( 1, 200 ) ]
+        for hash_function in HASH_FUNCTIONS :
+            hash_a = hash_function( rnt_a, 64, 19 )
+            hash_b = hash_function( rnt_b, 64, 19 )
+
+            hash_a.update_many( the_updates )
+            hash_b.update_many( iter( the_updates ) )
+
+            self.assertEqual( hash_a.integer_vector, hash_b.integer_vector )
+            for the_integer in hash_a.integer_vector :
+                self.assertTrue( the_integer < 1 << 64 )
+
+            expected = 0
+            for the_integer in hash_a.integer_vector :
+                expected ^= the_integer
+            self.assertEqual( hash_a.intdigest(), expected )
+
+class TestHashesRegistry( unittest.TestCase ) :
+    """
+    HASHES hands out the shared registry's order, and steps the caller's
+    Wichmann-Hill as scrambling the registry does, which every keystream
+    depends on.
+    """
+
+    def test_registry( self ) :
+        """
+        The registry's order round robin, the registry untouched, and the
+        RNT left where scramble_list() of the registry leaves a twin.
+        """
+        print( "test_registry" )
+
+        rnt_a = RNT( 4096, 'TestHashesRegistry', 'desktop', 1 )
+        rnt_b = restore_rnt( rnt_a.snapshot() )
+        registry = list( HASH_FUNCTIONS )
+
+        hashes = HASHES( rnt_a, 64, 19 )
+        self.assertNotEqual( rnt_a.wichmann.seeds, rnt_b.wichmann.seeds )
+        rnt_b.scramble_list( HASH_FUNCTIONS )
+        self.assertEqual( rnt_a.draw_state(), rnt_b.draw_state() )
+
+        for i in range( len( HASH_FUNCTIONS ) + 1 ) :
+            self.assertIsInstance( hashes.next(),
+                                   registry[ i % len( registry ) ] )
+        self.assertEqual( HASH_FUNCTIONS, registry )
+
 if __name__ == '__main__':
     sys.path.insert( 0, '/home/lew/EvoCrypt' )
 
@@ -6,7 +6,9 @@ Tests my modest modifications to the prime.py code.
 import sys
 import random
 from evoprimes import rabin_miller, is_prime, generate_large_prime, \
-                      get_next_higher_prime, get_next_lower_prime
+                      get_next_higher_prime, get_next_lower_prime, \
+                      prime_search, rabin_miller_rounds, PRIME_CACHE, \
+                      candidate_witnesses
 
 import unittest
 
@@ -52,6 +54,86 @@ class TestEvoPrimes( unittest.TestCase ) :
                 " higher_prime = " + hex( higher_prime ) )
                 print( hex( lower_prime ), hex( the_prime), hex( higher_prime ))
  
+class TestPrimeSearch( unittest.TestCase ) :
+    """
+    The sieve windows, the deterministic witnesses and the cache.
+    """
+
+    def test_strong_pseudoprimes( self ) :
+        """
+        Composites that pass Rabin-Miller for the first few prime bases,
+        no factor below 10000, so only the witnesses can catch them.
+        """
+        print( "test_strong_pseudoprimes" )
+
+        # 149491 * 747451 * 34233211, strong to every base up to 23
+        self.assertFalse( rabin_miller( 3825123056546413051 ) )
+        self.assertFalse( is_prime( 3825123056546413051 ) )
+
+        self.assertTrue( is_prime( ( 1 << 61 ) - 1 ) )
+        self.assertTrue( is_prime( ( 1 << 89 ) - 1 ) )
+        self.assertFalse( is_prime( ( ( 1 << 61 ) - 1 ) * 10007 ) )
+
+        self.assertTrue( rabin_miller_rounds( 128 ) >
+                         rabin_miller_rounds( 1024 ) )
+
+    def test_sieve_search( self ) :
+        """
+        The sieved search finds what testing every odd candidate finds.
+        """
+        print( "test_sieve_search" )
+
+        the_random = random.Random( 13 )
+        for bit_width in [ 15, 40, 64, 65, 127, 256, 600 ] :
+            for _ in range( 5 ) :
+                n = the_random.getrandbits( bit_width ) | ( 1 << 14 ) | 1
+
+                for step in [ 2, -2 ] :
+                    expected = n
+                    while not is_prime( expected ) :
+                        expected += step
+
+                    self.assertEqual( prime_search( n, step ), expected )
+
+    def test_cache( self ) :
+        """
+        Repeated searches come from the cache, as the same prime.
+        """
+        print( "test_cache" )
+
+        begin = ( 1 << 200 ) + 12345
+        the_prime = get_next_higher_prime( begin )
+        self.assertIn( ( begin, 2 ), PRIME_CACHE )
+        self.assertEqual( get_next_higher_prime( begin ), the_prime )
+        self.assertEqual( get_next_lower_prime( the_prime ), the_prime )
+
+    def test_witness_source( self ) :
+        """
+        The default witnesses come from the candidate, the global random
+        module is left alone. An explicit source finds the same primes.
+        """
+        print( "test_witness_source" )
+
+        the_prime = ( 1 << 127 ) - 1
+
+        the_witnesses = candidate_witnesses( the_prime, 20 )
+        self.assertEqual( the_witnesses, candidate_witnesses( the_prime, 20 ) )
+        for a in the_witnesses :
+            self.assertTrue( 2 <= a <= the_prime - 2 )
+
+        random.seed( 7 )
+        the_state = random.getstate()
+        self.assertTrue( rabin_miller( the_prime ) )
+        begin = ( 1 << 300 ) + 99
+        higher_prime = get_next_higher_prime( begin )
+        self.assertEqual( random.getstate(), the_state )
+
+        self.assertTrue( rabin_miller( the_prime,
+                                       witness_source=random.Random( 3 ) ) )
+        self.assertEqual( get_next_higher_prime( begin, random.Random( 3 ) ),
+                          higher_prime )
+        self.assertEqual( random.getstate(), the_state )
+
 if __name__ == '__main__':
 #    sys.path.append( '../' )
     sys.path.insert( 0, '/home/lew/EvoCrypt' )
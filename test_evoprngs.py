@@ -10,8 +10,9 @@ import random
 
 from evoprimes import get_next_higher_prime
 from evofolds  import FoldInteger
-from evornt    import RNT
-from evoprngs  import LCG, byte_rate, PRNGs
+from evornt    import RNT, restore_rnt
+from evoprngs  import LCG, byte_rate, PRNGs, set_lcg_seeding, \
+                      LCG_SEEDING_LEGACY, LCG_SEEDING_CHAINED, PRNG_FUNCTIONS
 
 def count_zeros( the_list ) :
     """
@@ -235,6 +236,80 @@ class TestEvoPrngs( unittest.TestCase ) :
 
         self.assertTrue( return_value )
 
+class TestLcgSeeding( unittest.TestCase ) :
+    """
+    The LCG seeding versions.
+    """
+
+    def tearDown( self ) :
+        set_lcg_seeding( LCG_SEEDING_LEGACY )
+
+    def make_lcg( self, the_rnt ) :
+        """
+        One LCG, all the constants fixed.
+        """
+        return LCG( the_rnt, 128, 31, 1, 0x9fffffffffffffc5,
+                    0x1000000000000f, 7 )
+
+    def test_seeding( self ) :
+        """
+        CHAINED is repeatable, different from LEGACY, and is recorded in
+        the LCG. LEGACY stays the default.
+        """
+        print( "test_seeding" )
+
+        the_rnt = RNT( 4096, 'TestLcgSeeding', 'desktop', 1 )
+        the_snapshot = the_rnt.snapshot()
+
+        legacy_lcg = self.make_lcg( restore_rnt( the_snapshot ) )
+        self.assertEqual( legacy_lcg.seeding_version, LCG_SEEDING_LEGACY )
+
+        set_lcg_seeding( LCG_SEEDING_CHAINED )
+        chained_lcg_0 = self.make_lcg( restore_rnt( the_snapshot ) )
+        chained_lcg_1 = self.make_lcg( restore_rnt( the_snapshot ) )
+        self.assertEqual( chained_lcg_0.seeding_version, LCG_SEEDING_CHAINED )
+
+        self.assertEqual( chained_lcg_0.integer_vector,
+                          chained_lcg_1.integer_vector )
+        self.assertNotEqual( chained_lcg_0.integer_vector,
+                             legacy_lcg.integer_vector )
+
+        # the same first element, the schedules differ after that
+        self.assertEqual( chained_lcg_0.integer_vector[ 0 ],
+                          legacy_lcg.integer_vector[ 0 ] )
+
+        for the_integer in chained_lcg_0.integer_vector :
+            self.assertTrue( 0 <= the_integer < 1 << 128 )
+
+        self.assertEqual( len( set( chained_lcg_0.integer_vector ) ), 31 )
+
+class TestPrngRegistry( unittest.TestCase ) :
+    """
+    PRNGs takes its order from the shared registry.
+    """
+
+    def test_registry( self ) :
+        """
+        Every PRNGs hands out the registry's order, round robin, and
+        reordering one instance's list does not touch the registry.
+        """
+        print( "test_registry" )
+
+        the_rnt = RNT( 4096, 'TestPrngRegistry', 'desktop', 1 )
+
+        prngs_0 = PRNGs()
+        prngs_1 = PRNGs()
+        self.assertEqual( prngs_0.prng_functions, PRNG_FUNCTIONS )
+
+        prngs_1.prng_functions.reverse()
+        self.assertEqual( prngs_0.prng_functions, PRNG_FUNCTIONS )
+
+        for i in range( len( PRNG_FUNCTIONS ) + 1 ) :
+            this_prng = prngs_0.next( the_rnt, 64, 7, 1, 0x9fffffffffffffc5,
+                                      0x1000000000000f, 3 )
+            self.assertIsInstance( this_prng,
+                            PRNG_FUNCTIONS[ i % len( PRNG_FUNCTIONS ) ] )
+
 if __name__ == '__main__':
 #    sys.path.append( '../' )
     sys.path.insert( 0, '/home/lew/EvoCrypt' )
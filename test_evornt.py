@@ -4,8 +4,14 @@ unit tests of evornt
 """
 
 import sys
+import os
+import shutil
+import tempfile
 import unittest
 
+from evornt   import RNT, restore_rnt, make_rnt, set_rnt_cache, \
+                     rnt_cache_file_name, RNT_BIT_STRING_CONTIGUOUS
+
 def count_duplicates( the_list ) :
     """
     A weak check for randomness, are any values the same?
@@ -208,6 +214,141 @@ class TestEvoRNT( unittest.TestCase ) :
         the_rnt = RNT( 4096, 'this is a passphrase', 'desktop', 2 )
         self.assertTrue( the_rnt.password_hash != 0, "password has was zero" )
 
+class TestRNTSnapshot( unittest.TestCase ) :
+    """
+    Unit test cases for RNT snapshots and the RNT cache
+    """
+
+    def setUp( self ) :
+        self.the_rnt = RNT( 4096, 'TestRNTSnapshot', 'desktop', 2 )
+        self.cache_dir = os.path.join( tempfile.mkdtemp(), 'rnt_cache' )
+
+    def tearDown( self ) :
+        set_rnt_cache( None )
+        shutil.rmtree( os.path.dirname( self.cache_dir ) )
+
+    def draw( self, the_rnt ) :
+        """
+        Enough of everything the RNT produces to see they are the same.
+        """
+        return [ the_rnt.password_hash ] + \
+               [ the_rnt.randint( 64 ) for _ in range( 100 ) ] + \
+               [ the_rnt.next_random_value( i * 99, 64 )
+                 for i in range( 20 ) ] + \
+               [ the_rnt.bit_string_from_randoms( i * 37, 100 )
+                 for i in range( 20 ) ] + \
+               [ the_rnt.hash.intdigest() ]
+
+    def test_snapshot( self ) :
+        """
+        A restored RNT continues exactly where the original was.
+        """
+        print( "test_snapshot" )
+
+        the_snapshot = self.the_rnt.snapshot()
+        restored_rnt = restore_rnt( the_snapshot )
+
+        self.assertEqual( restored_rnt.snapshot(), the_snapshot )
+        self.assertEqual( self.draw( restored_rnt ), self.draw( self.the_rnt ) )
+
+        # and a snapshot taken later, mid stream
+        restored_rnt = restore_rnt( self.the_rnt.snapshot() )
+        self.assertEqual( self.draw( restored_rnt ), self.draw( self.the_rnt ) )
+
+    def test_bad_snapshot( self ) :
+        """
+        Damaged snapshots are refused.
+        """
+        print( "test_bad_snapshot" )
+
+        the_snapshot = bytearray( self.the_rnt.snapshot() )
+        the_snapshot[ 100 ] ^= 1
+        self.assertRaises( ValueError, restore_rnt, the_snapshot )
+        self.assertRaises( ValueError, restore_rnt, b'not a snapshot' )
+
+    def test_rnt_cache( self ) :
+        """
+        The cache is private, and an RNT from it is the same as a new one.
+        """
+        print( "test_rnt_cache" )
+
+        set_rnt_cache( self.cache_dir )
+        first_rnt  = make_rnt( 4096, 'TestRNTSnapshot', 'desktop', 2 )
+        cache_file_name = rnt_cache_file_name( self.cache_dir, 4096,
+                                               'TestRNTSnapshot', 'desktop', 2 )
+
+        self.assertEqual( os.stat( self.cache_dir ).st_mode & 0o777, 0o700 )
+        self.assertEqual( os.stat( cache_file_name ).st_mode & 0o777, 0o600 )
+
+        expected = self.draw( self.the_rnt )
+        second_rnt = make_rnt( 4096, 'TestRNTSnapshot', 'desktop', 2 )
+        self.assertEqual( self.draw( first_rnt ), expected )
+        self.assertEqual( self.draw( second_rnt ), expected )
+
+        # anyone else can read it, not used and not fatal
+        os.chmod( cache_file_name, 0o644 )
+        third_rnt = make_rnt( 4096, 'TestRNTSnapshot', 'desktop', 2 )
+        self.assertEqual( third_rnt.password_hash, self.the_rnt.password_hash )
+
+class TestBitStrings( unittest.TestCase ) :
+    """
+    Unit test cases for the bytes backed bit_string_from_randoms
+    """
+
+    def setUp( self ) :
+        self.the_rnt = RNT( 4096, 'TestBitStrings', 'desktop', 1 )
+
+        # the whole table as one integer, the reference bit string
+        self.all_bits = 0
+        for the_word in self.the_rnt.rnt :
+            self.all_bits = ( self.all_bits << 64 ) | the_word
+        self.total_bits = 64 * len( self.the_rnt.rnt )
+
+    def reference( self, rnt_bit_index, field_width ) :
+        """
+        The field straight out of the one big integer.
+        """
+        rnt_bit_index %= self.the_rnt.rnt_bit_size
+        return ( self.all_bits >> ( self.total_bits - rnt_bit_index
+                                    - field_width ) ) & \
+               ( ( 1 << field_width ) - 1 )
+
+    def test_legacy( self ) :
+        """
+        The default is bit for bit the original, skipped words and all.
+        """
+        print( "test_legacy" )
+
+        for rnt_bit_index in range( 0, 40000, 97 ) :
+            for field_width in [ 1, 8, 32, 64, 65, 127, 128, 256, 1024 ] :
+                self.assertEqual(
+                    self.the_rnt.bit_string_from_randoms( rnt_bit_index,
+                                                          field_width ),
+                    self.the_rnt.legacy_bit_string(
+                        rnt_bit_index % self.the_rnt.rnt_bit_size,
+                        field_width ) )
+
+    def test_contiguous( self ) :
+        """
+        The CONTIGUOUS version reads the bits that are really there.
+        """
+        print( "test_contiguous" )
+
+        self.the_rnt.bit_string_version = RNT_BIT_STRING_CONTIGUOUS
+        for rnt_bit_index in range( 0, 40000, 97 ) :
+            for field_width in [ 1, 8, 32, 64, 65, 127, 128, 256, 1024 ] :
+                self.assertEqual(
+                    self.the_rnt.bit_string_from_randoms( rnt_bit_index,
+                                                          field_width ),
+                    self.reference( rnt_bit_index, field_width ) )
+
+        # and it survives a snapshot
+        restored_rnt = restore_rnt( self.the_rnt.snapshot() )
+        self.assertEqual( restored_rnt.bit_string_version,
+                          RNT_BIT_STRING_CONTIGUOUS )
+        self.assertEqual( restored_rnt.bit_string_from_randoms( 32, 256 ),
+                          self.reference( 32, 256 ) )
+
 if __name__ == '__main__':
 #    sys.path.append( '../' )
     sys.path.insert( 0, '/home/lew/EvoCrypt' )
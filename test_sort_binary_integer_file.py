@@ -0,0 +1,271 @@
+#!/usr/bin/python3
+"""
+Tests of the sort_binary_integer_file.py code.
+"""
+
+import io
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from sort_binary_integer_file import extract_dups_and_special_values, \
+                                     report_dups_and_special_values, \
+                                     duplicate_distances, distance_histogram, \
+                                     verify_duplicate_values, \
+                                     verify_out_of_order_values, \
+                                     verify_special_values, stable_order, \
+                                     sort_numpy_array, map_binary_file, \
+                                     sort_out_of_core
+
+class TestScan( unittest.TestCase ) :
+    """
+    The scan of a sorted array finds what the loop over it found.
+    """
+    def test_dups_and_special_values( self ) :
+        """
+        Duplicates, with their counts, out of order values, and 0 and
+        all ffs at the array's width.
+        """
+        print( "test_dups_and_special_values" )
+
+        all_fs = 0xFFFFFFFFFFFFFFFF
+        the_array = numpy.array( [ 0, 0, 5, 7, 7, 7, 9, 8, 12, all_fs ],
+                                 dtype=numpy.uint64 )
+        the_scan = extract_dups_and_special_values( the_array )
+
+        self.assertEqual( the_scan[ 'duplicate_indices' ].tolist(),
+                          [ 0, 3, 4 ] )
+        self.assertEqual( the_scan[ 'duplicate_values' ].tolist(), [ 0, 7 ] )
+        self.assertEqual( the_scan[ 'duplicate_counts' ].tolist(), [ 2, 3 ] )
+        self.assertEqual( the_scan[ 'out_of_order_indices' ].tolist(), [ 6 ] )
+        self.assertEqual( the_scan[ 'special_indices' ].tolist(),
+                          [ 0, 1, 9 ] )
+        self.assertEqual( the_scan[ 'special_values' ].tolist(),
+                          [ 0, 0, all_fs ] )
+
+        old_stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        try :
+            report_dups_and_special_values( the_array, the_scan )
+            the_report = sys.stdout.getvalue()
+        finally :
+            sys.stdout = old_stdout
+        self.assertIn( "dup  0x7 3 times", the_report )
+        self.assertIn( "out_of_order at  6 0x9 0x8", the_report )
+
+    def test_width( self ) :
+        """
+        All ffs is at integer_width, not the width of the array.
+        """
+        print( "test_width" )
+
+        the_array = numpy.array( [ 1, 0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF ],
+                                 dtype=numpy.uint64 )
+        self.assertEqual( extract_dups_and_special_values(
+                              the_array, 32 )[ 'special_indices' ].tolist(),
+                          [ 1 ] )
+
+        the_array = numpy.array( [ 1, 0xFFFFFFFF ], dtype=numpy.uint32 )
+        self.assertEqual( extract_dups_and_special_values(
+                              the_array )[ 'special_indices' ].tolist(),
+                          [ 1 ] )
+
+    def test_clean( self ) :
+        """
+        Random values, no duplicates, nothing special.
+        """
+        print( "test_clean" )
+
+        the_generator = numpy.random.default_rng( 20180623 )
+        the_array = numpy.unique( the_generator.integers(
+                                      1, 1 << 62, 100000,
+                                      dtype=numpy.uint64 ) )
+        the_scan = extract_dups_and_special_values( the_array )
+        for the_result in the_scan.values() :
+            self.assertEqual( the_result.size, 0 )
+
+class TestDuplicateDistances( unittest.TestCase ) :
+    """
+    Where the duplicates are in the unsorted array, and how far apart.
+    """
+    def test_cycle( self ) :
+        """
+        A generator that repeats every 5 values, after 3 that don't.
+        """
+        print( "test_cycle" )
+
+        the_array = numpy.array( [ 100, 200, 300 ] +
+                                 [ 11, 12, 13, 14, 15 ] * 4,
+                                 dtype=numpy.uint64 )
+        the_analysis = duplicate_distances( the_array )
+
+        self.assertEqual( the_analysis[ 'distances' ].size, 15 )
+        self.assertEqual( set( the_analysis[ 'distances' ].tolist() ), { 5 } )
+        self.assertEqual( the_analysis[ 'values' ][ : 3 ].tolist(),
+                          [ 11, 11, 11 ] )
+        self.assertEqual( the_analysis[ 'first_indices' ][ : 3 ].tolist(),
+                          [ 3, 8, 13 ] )
+        self.assertEqual( the_analysis[ 'next_indices' ][ : 3 ].tolist(),
+                          [ 8, 13, 18 ] )
+
+        # the sort's order and sorted array, passed in, are the same
+        old_stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        try :
+            the_order, the_sorted = sort_numpy_array( the_array )
+        finally :
+            sys.stdout = old_stdout
+        self.assertEqual( the_sorted.tolist(), sorted( the_array.tolist() ) )
+        the_shared = duplicate_distances( the_array, the_order, the_sorted )
+        for the_key, the_result in the_analysis.items() :
+            self.assertEqual( the_shared[ the_key ].tolist(),
+                              the_result.tolist() )
+
+        the_distances, the_counts = distance_histogram(
+                      numpy.array( [ 7, 5, 5, 9, 5, 7 ], dtype=numpy.int64 ) )
+        self.assertEqual( the_distances.tolist(), [ 5, 7, 9 ] )
+        self.assertEqual( the_counts.tolist(), [ 3, 2, 1 ] )
+
+    def test_verify( self ) :
+        """
+        Reported values that aren't in the unsorted array are found out,
+        for all three lists of tuples.
+        """
+        print( "test_verify" )
+
+        the_array = numpy.array( [ 9, 0, 4, 0, 4, 1, 4 ], dtype=numpy.uint64 )
+        the_order = stable_order( the_array )
+
+        old_stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        try :
+            unfound, the_tuples, the_diffs = verify_duplicate_values(
+                   the_array, [ ( 0, 0 ), ( 2, 4 ), ( 5, 6 ) ], the_order )
+            the_report = sys.stdout.getvalue()
+        finally :
+            sys.stdout = old_stdout
+
+        self.assertEqual( unfound, [ 6 ] )
+        self.assertEqual( the_tuples, [ ( 0, 1, 3, 2 ), ( 4, 2, 4, 2 ),
+                                        ( 4, 4, 6, 2 ) ] )
+        self.assertEqual( the_diffs, [ 2, 2, 2 ] )
+        self.assertIn( "distance  2 3 times", the_report )
+
+        # 1 is after 9, 9 isn't after 4's first, 7 isn't there
+        self.assertEqual( verify_out_of_order_values(
+                              the_array, [ ( 0, 9, 1 ), ( 1, 4, 9 ),
+                                           ( 2, 7, 4 ) ], the_order ),
+                          ( [ 7 ], [ 9 ] ) )
+        self.assertEqual( verify_out_of_order_values( the_array, [] ),
+                          ( [], [] ) )
+
+        self.assertEqual( verify_special_values(
+                              the_array, [ ( 0, 0 ), ( 1, 0 ), ( 2, 0 ),
+                                           ( 3, 0xFFFFFFFFFFFFFFFF ) ],
+                              the_order ),
+                          [ 0, 0xFFFFFFFFFFFFFFFF ] )
+
+class TestLoadAndSort( unittest.TestCase ) :
+    """
+    Files of any width and byte order, sorted in memory or not.
+    """
+    def setUp( self ) :
+        self.directory = tempfile.mkdtemp()
+        self.old_stdout = sys.stdout
+        sys.stdout = io.StringIO()
+
+    def tearDown( self ) :
+        sys.stdout = self.old_stdout
+        shutil.rmtree( self.directory )
+
+    def write_file( self, the_array, the_name ) :
+        """
+        the_array's bytes to the_name in the test directory.
+        """
+        file_name = os.path.join( self.directory, the_name )
+        the_array.tofile( file_name )
+        return file_name
+
+    def test_map( self ) :
+        """
+        Every width, both byte orders, a partial integer at the end.
+        """
+        the_values = numpy.arange( 1, 101, dtype=numpy.uint64 ) * 0x0101
+        for integer_width in [ 8, 16, 32, 64 ] :
+            for byte_order, code in [ ( 'little', '<' ), ( 'big', '>' ) ] :
+                the_dtype = numpy.dtype( code + 'u' +
+                                         str( integer_width // 8 ) )
+                file_name = self.write_file( the_values.astype( the_dtype ),
+                                             'map.bin' )
+                with open( file_name, 'ab' ) as the_file :
+                    the_file.write( b'\x01' * ( integer_width // 8 - 1 ) )
+
+                the_map = map_binary_file( file_name, integer_width,
+                                           byte_order )
+                self.assertIsInstance( the_map, numpy.memmap )
+                self.assertEqual( the_map.tolist(),
+                                  the_values.astype( the_dtype ).tolist() )
+                del the_map
+
+        empty_name = self.write_file( numpy.empty( 0, dtype=numpy.uint8 ),
+                                      'empty.bin' )
+        self.assertEqual( map_binary_file( empty_name, 64 ).size, 0 )
+
+        with self.assertRaises( SystemExit ) :
+            map_binary_file( empty_name, 24 )
+
+    def test_in_core_output( self ) :
+        """
+        The in-memory sort gathers straight into the .npy output, native
+        order, from big-endian input.
+        """
+        the_generator = numpy.random.default_rng( 20180701 )
+        the_values = the_generator.integers( 0, 500, 1003,
+                                             dtype=numpy.uint64 )
+        file_name = self.write_file( the_values.astype( '>u8' ), 'big.bin' )
+        the_map = map_binary_file( file_name, 64, 'big' )
+
+        output_name = os.path.join( self.directory, 'sorted' )
+        the_order, the_sorted = sort_numpy_array( the_map, output_name )
+        self.assertIsInstance( the_sorted, numpy.memmap )
+        self.assertEqual( the_order.tolist(),
+                          stable_order( the_values ).tolist() )
+
+        the_output = numpy.load( output_name + '.npy' )
+        self.assertTrue( the_output.dtype.isnative )
+        self.assertEqual( the_output.tolist(),
+                          numpy.sort( the_values ).tolist() )
+        del the_map, the_sorted
+
+    def test_out_of_core( self ) :
+        """
+        Chunks that don't divide the file, duplicates across chunks, and
+        big-endian input, the same as sorting it all at once.
+        """
+        the_generator = numpy.random.default_rng( 20180627 )
+        the_values = the_generator.integers( 0, 5000, 10007,
+                                             dtype=numpy.uint64 )
+        file_name = self.write_file( the_values.astype( '>u8' ), 'big.bin' )
+        the_map = map_binary_file( file_name, 64, 'big' )
+
+        for chunk_integers in [ 1000, 3333, 20000 ] :
+            output_name = os.path.join( self.directory,
+                                        'sorted_' + str( chunk_integers ) )
+            the_sorted = sort_out_of_core( the_map, output_name,
+                                           chunk_integers )
+            self.assertEqual( the_sorted.tolist(),
+                              numpy.sort( the_values ).tolist() )
+            self.assertEqual( numpy.load( output_name + '.npy' ).tolist(),
+                              numpy.sort( the_values ).tolist() )
+
+        self.assertEqual( sorted( os.listdir( self.directory ) ),
+                          [ 'big.bin', 'sorted_1000.npy', 'sorted_20000.npy',
+                            'sorted_3333.npy' ] )
+
+
+if __name__ == '__main__':
+    unittest.main()